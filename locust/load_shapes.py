@@ -0,0 +1,161 @@
+"""
+Arrival-rate schedules of the open-model load test, see locustfile_open.py.
+
+A schedule is written as a mode followed by its parameters, rates in requests per
+second and durations in seconds:
+
+    constant:rate=100,duration=60
+    step:start=10,step=10,steps=6,step_duration=30
+    spike:base=20,peak=200,duration=120,spike_at=60,spike_duration=10
+    ramp:start=10,step=10,step_duration=20,max=1000
+
+Every mode reduces to a list of stages of constant rate. A ramp is a step schedule
+that is stopped at the first stage that breaks the SLO, to find the highest rate the
+API sustains.
+"""
+from typing import NamedTuple, Optional
+
+MODES = {
+    "constant": ("rate", "duration"),
+    "step": ("start", "step", "steps", "step_duration"),
+    "spike": ("base", "peak", "duration", "spike_at", "spike_duration"),
+    "ramp": ("start", "step", "step_duration", "max"),
+}
+
+
+class Stage(NamedTuple):
+    start: float
+    duration: float
+    rate: float
+
+    @property
+    def end(self) -> float:
+        return self.start + self.duration
+
+
+class ArrivalSchedule:
+    """
+    A sequence of stages, each sending requests at a constant rate.
+
+    Attributes:
+        mode (str): The mode the schedule was parsed from.
+        stages (list[Stage]): The stages in the order they run.
+        duration (float): The total duration in seconds.
+        saturation (bool): Whether to stop at the first stage that breaks the SLO.
+    """
+
+    def __init__(self, mode: str, stages: list, saturation: bool = False):
+        self.mode = mode
+        self.saturation = saturation
+        self.stages = []
+        start = 0.0
+        for duration, rate in stages:
+            if duration > 0:
+                self.stages.append(Stage(start, float(duration), float(rate)))
+                start += duration
+        self.duration = start
+
+    def stage_at(self, elapsed: float) -> Optional[int]:
+        """
+        Returns the index of the stage running at a point of the schedule.
+
+        Parameters:
+            elapsed (float): The seconds since the schedule started.
+
+        Returns:
+            int | None: The index of the stage, or None once the schedule is over.
+        """
+        for index, stage in enumerate(self.stages):
+            if elapsed < stage.end:
+                return index
+        return None
+
+    def rate_at(self, elapsed: float) -> Optional[float]:
+        """
+        Returns the target arrival rate at a point of the schedule.
+
+        Parameters:
+            elapsed (float): The seconds since the schedule started.
+
+        Returns:
+            float | None: The requests per second, or None once the schedule is over.
+        """
+        index = self.stage_at(elapsed)
+        return self.stages[index].rate if index is not None else None
+
+    def describe(self) -> str:
+        return ", ".join(
+            f"{stage.rate:g}/s for {stage.duration:g}s" for stage in self.stages
+        )
+
+
+def parse_arrival(spec: str) -> ArrivalSchedule:
+    """
+    Parses an arrival schedule from its command line form.
+
+    Parameters:
+        spec (str): The mode and its parameters, such as "constant:rate=100,duration=60".
+
+    Returns:
+        ArrivalSchedule: The schedule.
+
+    Raises:
+        ValueError: If the mode is unknown or a parameter is missing, unknown or invalid.
+    """
+    mode, _, arguments = spec.partition(":")
+    if mode not in MODES:
+        raise ValueError(f"Unknown arrival mode {mode!r}, expected one of {', '.join(MODES)}")
+    params = {}
+    for argument in filter(None, arguments.split(",")):
+        name, _, value = argument.partition("=")
+        try:
+            params[name.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid value {value!r} for {name!r} in {spec!r}") from None
+    missing = set(MODES[mode]) - set(params)
+    unknown = set(params) - set(MODES[mode])
+    if missing or unknown:
+        got = ", ".join(sorted(params)) or "nothing"
+        raise ValueError(f"The {mode} mode takes {', '.join(MODES[mode])}, got {got}")
+    if any(value < 0 for value in params.values()):
+        raise ValueError(f"The parameters of {spec!r} cannot be negative")
+
+    schedule = _build(mode, params, spec)
+    if not schedule.stages:
+        raise ValueError(f"The schedule {spec!r} has no stage with a positive duration")
+    return schedule
+
+
+def _build(mode: str, params: dict, spec: str) -> ArrivalSchedule:
+    if mode == "constant":
+        return ArrivalSchedule(mode, [(params["duration"], params["rate"])])
+    if mode == "step":
+        return ArrivalSchedule(
+            mode,
+            [
+                (params["step_duration"], params["start"] + params["step"] * index)
+                for index in range(int(params["steps"]))
+            ],
+        )
+    if mode == "spike":
+        spike_end = params["spike_at"] + params["spike_duration"]
+        if spike_end > params["duration"]:
+            raise ValueError(f"The spike of {spec!r} ends after the schedule")
+        return ArrivalSchedule(
+            mode,
+            [
+                (params["spike_at"], params["base"]),
+                (params["spike_duration"], params["peak"]),
+                (params["duration"] - spike_end, params["base"]),
+            ],
+        )
+    if params["step"] <= 0:
+        raise ValueError(f"The ramp of {spec!r} needs a positive step")
+    rates = []
+    rate = params["start"]
+    while rate <= params["max"]:
+        rates.append(rate)
+        rate += params["step"]
+    return ArrivalSchedule(
+        mode, [(params["step_duration"], rate) for rate in rates], saturation=True
+    )
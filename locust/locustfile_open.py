@@ -0,0 +1,256 @@
+"""
+Open-model load test of the todo API.
+
+Requests arrive on a schedule, whether or not the previous ones have been answered,
+like traffic from many independent clients. A closed model with a fixed number of
+users slows down as the API slows down, which hides queueing from the latency numbers
+(coordinated omission). The task mix, id pools and SLO report are the ones of
+locustfile_python.py:
+
+    locust -f locustfile_open.py --host http://web:8000 -u 1 -t 10m \
+        --arrival ramp:start=10,step=10,step_duration=20,max=1000 \
+        --max-vus 200 --slo slo.json --results-json results/ramp.json
+
+See load_shapes.py for the arrival modes. Each arrival runs one task on a virtual
+user that is free at that moment, at most --max-vus at once. Arrivals that find no
+free virtual user are dropped and recorded as failed "ARRIVAL dropped" requests, as
+a dropped arrival means the API fell behind the schedule.
+
+The schedule ends the run, so -t only needs to be longer than the schedule. Every
+stage of the schedule is reported with its own SLO verdict, and a ramp stops at the
+first stage that drops arrivals or misses the SLO and reports the highest rate that
+passed as the maximum sustainable throughput.
+"""
+import logging
+import random
+import time
+
+import gevent
+from gevent.pool import Pool
+from geventhttpclient.client import HTTPClientPool
+from locust import User, constant, events, task
+from locust.exception import StopUser
+from locust.runners import WorkerRunner
+from locust.stats import RequestStats
+
+import locustfile_python as closed
+from load_shapes import parse_arrival
+
+DROPPED = ("ARRIVAL", "dropped")
+
+
+class DroppedArrival(Exception):
+    pass
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument(
+        "--arrival",
+        default="constant:rate=10,duration=60",
+        help="arrival schedule, such as constant:rate=100,duration=60, see load_shapes.py",
+    )
+    parser.add_argument(
+        "--max-vus",
+        type=int,
+        default=100,
+        help="the most requests in flight at once, later arrivals are dropped",
+    )
+
+
+@events.init.add_listener
+def apply_arrival(environment, **kwargs):
+    options = environment.parsed_options
+    environment.arrival_schedule = parse_arrival(
+        options.arrival if options else "constant:rate=10,duration=60"
+    )
+
+
+class ArrivalUser(closed.TodoAPIUser):
+    """
+    A virtual user running one arrival at a time for OpenModelUser.
+
+    It keeps its id pool between arrivals. All virtual users share one connection pool.
+    """
+
+    abstract = True
+
+    def run(self, name: str):
+        closed.TASKS[name](self)
+
+
+class OpenModelUser(User):
+    """
+    Sends the arrivals of the schedule, see the module docstring.
+
+    A single instance drives the whole run, whatever the number of users asked for.
+    """
+
+    fixed_count = 1
+    wait_time = constant(0)
+
+    def on_start(self):
+        options = self.environment.parsed_options
+        self.schedule = self.environment.arrival_schedule
+        self.max_vus = options.max_vus if options else 100
+        ArrivalUser.host = self.host or self.environment.host
+        ArrivalUser.client_pool = HTTPClientPool(concurrency=self.max_vus)
+        weights = self.environment.profile
+        self.task_names = [name for name, weight in weights.items() for _ in range(weight)]
+        self.idle = []
+        self.vus = 0
+        self.stages = []
+        self.stage_stats = RequestStats()
+        self.environment.events.request.add_listener(self.record_request)
+
+    def on_stop(self):
+        self.environment.events.request.remove_listener(self.record_request)
+
+    def record_request(
+        self, request_type, name, response_time, response_length, exception=None, **kwargs
+    ):
+        self.stage_stats.log_request(request_type, name, response_time, response_length)
+        if exception is not None:
+            self.stage_stats.log_error(request_type, name, exception)
+
+    def arrive(self, vu: ArrivalUser):
+        try:
+            vu.run(random.choice(self.task_names))
+        finally:
+            self.idle.append(vu)
+
+    def dispatch(self, pool: Pool) -> int:
+        """
+        Starts one arrival on a free virtual user.
+
+        Returns:
+            int: 1 if the arrival was dropped, else 0.
+        """
+        if pool.full():
+            self.environment.events.request.fire(
+                request_type=DROPPED[0],
+                name=DROPPED[1],
+                response_time=0,
+                response_length=0,
+                exception=DroppedArrival(f"{self.max_vus} requests already in flight"),
+            )
+            return 1
+        if self.idle:
+            vu = self.idle.pop()
+        else:
+            vu = ArrivalUser(self.environment)
+            vu.on_start()
+            self.vus += 1
+        pool.spawn(self.arrive, vu)
+        return 0
+
+    def end_stage(self, index: int, dropped: int, lags: list) -> bool:
+        """
+        Evaluates the requests completed during a stage and starts counting the next one.
+
+        Returns:
+            bool: Whether the stage dropped no arrival and met the SLO.
+        """
+        stage = self.schedule.stages[index]
+        results = closed.evaluate_slo(
+            self.environment, closed.endpoint_stats(self.stage_stats)
+        )
+        lags.sort()
+        record = {
+            "rate": stage.rate,
+            "duration": stage.duration,
+            "requests": self.stage_stats.total.num_requests - dropped,
+            "dropped": dropped,
+            "lag_p99_ms": round(lags[int(len(lags) * 0.99)] * 1000, 1) if lags else 0.0,
+            "p95_ms": self.stage_stats.total.get_response_time_percentile(0.95),
+            "violations": {
+                name: result["violations"]
+                for name, result in results.items()
+                if result["violations"]
+            },
+        }
+        record["passed"] = not dropped and not record["violations"]
+        self.stages.append(record)
+        logging.info(
+            "Stage %d at %g/s: %d requests, %d dropped, p95 %s ms, schedule lag p99 %s ms: %s",
+            index + 1,
+            stage.rate,
+            record["requests"],
+            dropped,
+            record["p95_ms"],
+            record["lag_p99_ms"],
+            "pass" if record["passed"] else "FAIL",
+        )
+        self.stage_stats = RequestStats()
+        return record["passed"]
+
+    @task
+    def run_schedule(self):
+        pool = Pool(self.max_vus)
+        started = time.monotonic()
+        due = 0.0
+        current = 0
+        dropped = 0
+        lags = []
+        while True:
+            index = self.schedule.stage_at(due)
+            if index != current:
+                passed = self.end_stage(current, dropped, lags)
+                dropped, lags = 0, []
+                if index is None or (self.schedule.saturation and not passed):
+                    break
+                current = index
+            stage = self.schedule.stages[index]
+            if stage.rate <= 0:
+                due = stage.end
+                gevent.sleep(max(0.0, started + due - time.monotonic()))
+                continue
+            # Arrivals are due at fixed times, late ones are sent at once to catch up.
+            delay = started + due - time.monotonic()
+            if delay > 0:
+                gevent.sleep(delay)
+            lags.append(max(0.0, -delay))
+            dropped += self.dispatch(pool)
+            due += 1 / stage.rate
+        pool.join()
+        self.environment.arrival = self.summary()
+        # Stop the runner from outside of this user, which the runner kills on quit.
+        gevent.spawn(self.environment.runner.quit)
+        raise StopUser()
+
+    def summary(self) -> dict:
+        summary = {
+            "schedule": self.environment.parsed_options.arrival,
+            "virtual_users": self.vus,
+            "stages": self.stages,
+        }
+        if self.schedule.saturation:
+            sustained = [stage["rate"] for stage in self.stages if stage["passed"]]
+            summary["max_sustainable_rps"] = max(sustained) if sustained else None
+            logging.info(
+                "Maximum sustainable rate: %s",
+                f"{max(sustained):g}/s" if sustained else "none of the stages passed",
+            )
+        return summary
+
+
+@events.test_start.add_listener
+def check_run_time(environment, **kwargs):
+    options = environment.parsed_options
+    if isinstance(environment.runner, WorkerRunner) or options is None:
+        return
+    if options.run_time and options.run_time < environment.arrival_schedule.duration:
+        logging.warning(
+            "The run time of %ss ends the run before the %gs arrival schedule (%s)",
+            options.run_time,
+            environment.arrival_schedule.duration,
+            environment.arrival_schedule.describe(),
+        )
+
+
+@events.quitting.add_listener
+def ramp_exit_code(environment, **kwargs):
+    # A ramp runs until the SLO breaks, so it only fails if no stage met the SLO.
+    arrival = getattr(environment, "arrival", None)
+    if arrival and "max_sustainable_rps" in arrival:
+        environment.process_exit_code = 0 if arrival["max_sustainable_rps"] is not None else 1
@@ -1,199 +1,345 @@
-import time, random
-from locust import FastHttpUser, task, between
-
-TODO_LSIT = [
-    {"title": "Go to the gym - Day 1", "description": "Workout for 1 minutes"},
-    {"title": "Go to the gym - Day 2", "description": "Workout for 2 minutes"},
-    {"title": "Go to the gym - Day 3", "description": "Workout for 3 minutes"},
-    {"title": "Go to the gym - Day 4", "description": "Workout for 4 minutes"},
-    {"title": "Go to the gym - Day 5", "description": "Workout for 5 minutes"},
-    {"title": "Go to the gym - Day 6", "description": "Workout for 6 minutes"},
-    {"title": "Go to the gym - Day 7", "description": "Workout for 7 minutes"},
-    {"title": "Go to the gym - Day 8", "description": "Workout for 8 minutes"},
-    {"title": "Go to the gym - Day 9", "description": "Workout for 9 minutes"},
-    {"title": "Go to the gym - Day 10", "description": "Workout for 10 minutes"},
-    {"title": "Go to the gym - Day 11", "description": "Workout for 11 minutes"},
-    {"title": "Go to the gym - Day 12", "description": "Workout for 12 minutes"},
-    {"title": "Go to the gym - Day 13", "description": "Workout for 13 minutes"},
-    {"title": "Go to the gym - Day 14", "description": "Workout for 14 minutes"},
-    {"title": "Go to the gym - Day 15", "description": "Workout for 15 minutes"},
-    {"title": "Go to the gym - Day 16", "description": "Workout for 16 minutes"},
-    {"title": "Go to the gym - Day 17", "description": "Workout for 17 minutes"},
-    {"title": "Go to the gym - Day 18", "description": "Workout for 18 minutes"},
-    {"title": "Go to the gym - Day 19", "description": "Workout for 19 minutes"},
-    {"title": "Go to the gym - Day 20", "description": "Workout for 20 minutes"},
-    {"title": "Go to the gym - Day 21", "description": "Workout for 21 minutes"},
-    {"title": "Go to the gym - Day 22", "description": "Workout for 22 minutes"},
-    {"title": "Go to the gym - Day 23", "description": "Workout for 23 minutes"},
-    {"title": "Go to the gym - Day 24", "description": "Workout for 24 minutes"},
-    {"title": "Go to the gym - Day 25", "description": "Workout for 25 minutes"},
-    {"title": "Go to the gym - Day 26", "description": "Workout for 26 minutes"},
-    {"title": "Go to the gym - Day 27", "description": "Workout for 27 minutes"},
-    {"title": "Go to the gym - Day 28", "description": "Workout for 28 minutes"},
-    {"title": "Go to the gym - Day 29", "description": "Workout for 29 minutes"},
-    {"title": "Go to the gym - Day 30", "description": "Workout for 30 minutes"},
-    {"title": "Go to the gym - Day 31", "description": "Workout for 31 minutes"},
-    {"title": "Go to the gym - Day 32", "description": "Workout for 32 minutes"},
-    {"title": "Go to the gym - Day 33", "description": "Workout for 33 minutes"},
-    {"title": "Go to the gym - Day 34", "description": "Workout for 34 minutes"},
-    {"title": "Go to the gym - Day 35", "description": "Workout for 35 minutes"},
-    {"title": "Go to the gym - Day 36", "description": "Workout for 36 minutes"},
-    {"title": "Go to the gym - Day 37", "description": "Workout for 37 minutes"},
-    {"title": "Go to the gym - Day 38", "description": "Workout for 38 minutes"},
-    {"title": "Go to the gym - Day 39", "description": "Workout for 39 minutes"},
-    {"title": "Go to the gym - Day 40", "description": "Workout for 40 minutes"},
-    {"title": "Go to the gym - Day 41", "description": "Workout for 41 minutes"},
-    {"title": "Go to the gym - Day 42", "description": "Workout for 42 minutes"},
-    {"title": "Go to the gym - Day 43", "description": "Workout for 43 minutes"},
-    {"title": "Go to the gym - Day 44", "description": "Workout for 44 minutes"},
-    {"title": "Go to the gym - Day 45", "description": "Workout for 45 minutes"},
-    {"title": "Go to the gym - Day 46", "description": "Workout for 46 minutes"},
-    {"title": "Go to the gym - Day 47", "description": "Workout for 47 minutes"},
-    {"title": "Go to the gym - Day 48", "description": "Workout for 48 minutes"},
-    {"title": "Go to the gym - Day 49", "description": "Workout for 49 minutes"},
-    {"title": "Go to the gym - Day 50", "description": "Workout for 50 minutes"},
-    {"title": "Go to the gym - Day 51", "description": "Workout for 51 minutes"},
-    {"title": "Go to the gym - Day 52", "description": "Workout for 52 minutes"},
-    {"title": "Go to the gym - Day 53", "description": "Workout for 53 minutes"},
-    {"title": "Go to the gym - Day 54", "description": "Workout for 54 minutes"},
-    {"title": "Go to the gym - Day 55", "description": "Workout for 55 minutes"},
-    {"title": "Go to the gym - Day 56", "description": "Workout for 56 minutes"},
-    {"title": "Go to the gym - Day 57", "description": "Workout for 57 minutes"},
-    {"title": "Go to the gym - Day 58", "description": "Workout for 58 minutes"},
-    {"title": "Go to the gym - Day 59", "description": "Workout for 59 minutes"},
-    {"title": "Go to the gym - Day 60", "description": "Workout for 60 minutes"},
-    {"title": "Go to the gym - Day 61", "description": "Workout for 61 minutes"},
-    {"title": "Go to the gym - Day 62", "description": "Workout for 62 minutes"},
-    {"title": "Go to the gym - Day 63", "description": "Workout for 63 minutes"},
-    {"title": "Go to the gym - Day 64", "description": "Workout for 64 minutes"},
-    {"title": "Go to the gym - Day 65", "description": "Workout for 65 minutes"},
-    {"title": "Go to the gym - Day 66", "description": "Workout for 66 minutes"},
-    {"title": "Go to the gym - Day 67", "description": "Workout for 67 minutes"},
-    {"title": "Go to the gym - Day 68", "description": "Workout for 68 minutes"},
-    {"title": "Go to the gym - Day 69", "description": "Workout for 69 minutes"},
-    {"title": "Go to the gym - Day 70", "description": "Workout for 70 minutes"},
-    {"title": "Go to the gym - Day 71", "description": "Workout for 71 minutes"},
-    {"title": "Go to the gym - Day 72", "description": "Workout for 72 minutes"},
-    {"title": "Go to the gym - Day 73", "description": "Workout for 73 minutes"},
-    {"title": "Go to the gym - Day 74", "description": "Workout for 74 minutes"},
-    {"title": "Go to the gym - Day 75", "description": "Workout for 75 minutes"},
-    {"title": "Go to the gym - Day 76", "description": "Workout for 76 minutes"},
-    {"title": "Go to the gym - Day 77", "description": "Workout for 77 minutes"},
-    {"title": "Go to the gym - Day 78", "description": "Workout for 78 minutes"},
-    {"title": "Go to the gym - Day 79", "description": "Workout for 79 minutes"},
-    {"title": "Go to the gym - Day 80", "description": "Workout for 80 minutes"},
-    {"title": "Go to the gym - Day 81", "description": "Workout for 81 minutes"},
-    {"title": "Go to the gym - Day 82", "description": "Workout for 82 minutes"},
-    {"title": "Go to the gym - Day 83", "description": "Workout for 83 minutes"},
-    {"title": "Go to the gym - Day 84", "description": "Workout for 84 minutes"},
-    {"title": "Go to the gym - Day 85", "description": "Workout for 85 minutes"},
-    {"title": "Go to the gym - Day 86", "description": "Workout for 86 minutes"},
-    {"title": "Go to the gym - Day 87", "description": "Workout for 87 minutes"},
-    {"title": "Go to the gym - Day 88", "description": "Workout for 88 minutes"},
-    {"title": "Go to the gym - Day 89", "description": "Workout for 89 minutes"},
-    {"title": "Go to the gym - Day 90", "description": "Workout for 90 minutes"},
-    {"title": "Go to the gym - Day 91", "description": "Workout for 91 minutes"},
-    {"title": "Go to the gym - Day 92", "description": "Workout for 92 minutes"},
-    {"title": "Go to the gym - Day 93", "description": "Workout for 93 minutes"},
-    {"title": "Go to the gym - Day 94", "description": "Workout for 94 minutes"},
-    {"title": "Go to the gym - Day 95", "description": "Workout for 95 minutes"},
-    {"title": "Go to the gym - Day 96", "description": "Workout for 96 minutes"},
-    {"title": "Go to the gym - Day 97", "description": "Workout for 97 minutes"},
-    {"title": "Go to the gym - Day 98", "description": "Workout for 98 minutes"},
-    {"title": "Go to the gym - Day 99", "description": "Workout for 99 minutes"},
-    {"title": "Go to the gym - Day 100", "description": "Workout for 100 minutes"},
+"""
+Load test of the todo API.
+
+The host, think time, task mix and result export are configured on the command line
+or in locust.conf:
+
+    locust -f locustfile_python.py --host http://web:8000 \
+        --task-profile profiles/default.json --think-time 0 0 \
+        --csv results/run --results-json results/run.json --slo slo.json
+
+The run ends with the p50/p95/p99 latency of every endpoint, checked against the SLO
+targets when --slo is given, and exits with 1 if a target is missed.
+
+Each simulated user keeps the ids of the todos it created in its own pool, so users
+never read, update or delete each other's todos and a 404 is a real failure.
+"""
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+
+from locust import FastHttpUser, events
+from locust.runners import WorkerRunner
+
+import slo as service_levels
+
+TODO_LIST = [
+    {"title": f"Go to the gym - Day {day}", "description": f"Workout for {day} minutes"}
+    for day in range(1, 101)
 ]
+SEARCH_TERMS = ["gym", "workout", "day", "minutes"]
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+DEFAULT_PROFILE = os.path.join(PROFILE_DIR, "default.json")
+WRONG_STATUS_CODE = "Wrong status code {}"
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument(
+        "--task-profile",
+        default=DEFAULT_PROFILE,
+        help="JSON file with the weight of every task",
+    )
+    parser.add_argument(
+        "--think-time",
+        nargs=2,
+        type=float,
+        default=[0.0, 0.0],
+        metavar=("MIN", "MAX"),
+        help="seconds a user waits between tasks, 0 0 to saturate the service",
+    )
+    parser.add_argument(
+        "--id-pool-size",
+        type=int,
+        default=100,
+        help="the number of created todo ids each user remembers",
+    )
+    parser.add_argument(
+        "--results-json",
+        default="",
+        help="file to write the per-endpoint statistics of the run to",
+    )
+    parser.add_argument(
+        "--slo",
+        default="",
+        help="JSON file with the latency and error rate targets of the endpoints",
+    )
+
 
-BASE_URL = "http://web:8000/api"
-WRONG_STATUS_CODE = "Wrong Status code!"
+def load_profile(path: str) -> dict:
+    """
+    Reads the weight of every task from a profile file.
 
-created_todos: list[int] = []
+    Parameters:
+        path (str): The JSON profile, {"tasks": {"<task name>": <weight>, ...}}.
 
+    Returns:
+        dict: The weights by task name.
 
-def check_created_todos(todos):
-    if len(todos) > 0:
-        return random.choice(todos)
-    else:
-        return False
+    Raises:
+        ValueError: If the profile names a task that does not exist or has invalid weights.
+    """
+    with open(path) as file:
+        weights = json.load(file)["tasks"]
+    unknown = set(weights) - set(TASKS)
+    if unknown:
+        raise ValueError(f"Unknown tasks in {path}: {', '.join(sorted(unknown))}")
+    if not all(isinstance(weight, int) and weight >= 0 for weight in weights.values()):
+        raise ValueError(f"The weights in {path} must be whole numbers")
+    if not any(weights.values()):
+        raise ValueError(f"No task of {path} has a positive weight")
+    return weights
 
 
 class TodoAPIUser(FastHttpUser):
-    wait_time = between(3, 5)
+    def on_start(self):
+        options = self.environment.parsed_options
+        self.think_time = options.think_time if options else [0.0, 0.0]
+        pool_size = options.id_pool_size if options else 100
+        self.todo_ids = deque(maxlen=pool_size)
+
+    def wait_time(self):
+        return random.uniform(*self.think_time)
+
+    def call(self, method: str, path: str, name: str, expected=(200,), **kwargs):
+        """
+        Sends a request recorded under a fixed stats name and checks its status code.
+
+        Returns:
+            The response, or None if it failed.
+        """
+        with self.rest(method, path, name=name, **kwargs) as resp:
+            if resp.status_code not in expected:
+                resp.failure(WRONG_STATUS_CODE.format(resp.status_code))
+                return None
+            return resp
+
+    def own_todo(self):
+        """
+        Returns the id of a todo this user created, creating one if the pool is empty.
+        """
+        if not self.todo_ids:
+            self.new_todo()
+        return random.choice(self.todo_ids) if self.todo_ids else None
 
-    @task(7)
     def new_todo(self):
-        with self.rest(
-            "POST", f"{BASE_URL}/new_todo", json=random.choice(TODO_LSIT)
-        ) as resp:
-            if resp.js is not None:
-                created_todos.append(resp.json()["id"])
-            elif resp.status_code != 201 and resp.status_code != 404:
-                resp.success(WRONG_STATUS_CODE)
-
-    @task(3)
+        resp = self.call(
+            "POST",
+            "/api/new_todo",
+            "POST /api/new_todo",
+            expected=(201,),
+            json=random.choice(TODO_LIST),
+        )
+        if resp is not None and resp.js is not None:
+            self.todo_ids.append(resp.js["id"])
+
+    def new_todos(self):
+        resp = self.call(
+            "POST",
+            "/api/new_todos",
+            "POST /api/new_todos",
+            expected=(201,),
+            json=random.sample(TODO_LIST, 10),
+        )
+        if resp is not None and resp.js is not None:
+            self.todo_ids.extend(todo["id"] for todo in resp.js)
+
     def list_todos(self):
-        with self.rest("GET", f"{BASE_URL}") as resp:
-            if resp.js is None:
-                pass
-            elif resp.status_code != 200 and resp.status_code != 404:
-                resp.success(WRONG_STATUS_CODE)
-
-    @task(2)
-    def get_single_todo(self):
-        random_todo_id = check_created_todos(created_todos)
-        if random_todo_id:
-            with self.rest(
+        self.call("GET", "/api", "GET /api", params={"limit": 100})
+
+    def list_pages(self):
+        resp = self.call(
+            "GET", "/api", "GET /api?after=", params={"limit": 50, "after": ""}
+        )
+        cursor = resp.js["next_cursor"] if resp is not None and resp.js else None
+        if cursor:
+            self.call(
+                "GET", "/api", "GET /api?after=", params={"limit": 50, "after": cursor}
+            )
+
+    def list_open_todos(self):
+        self.call(
+            "GET",
+            "/api",
+            "GET /api?is_done=false",
+            params={"is_done": "false", "limit": 100, "total": "true"},
+        )
+
+    def search_todos(self):
+        self.call(
+            "GET",
+            "/api/search",
+            "GET /api/search",
+            params={"q": random.choice(SEARCH_TERMS)},
+        )
+
+    def get_todo(self):
+        todo_id = self.own_todo()
+        if todo_id is not None:
+            self.call("GET", f"/api/todo/{todo_id}", "GET /api/todo/{id}")
+
+    def revalidate_todo(self):
+        todo_id = self.own_todo()
+        if todo_id is None:
+            return
+        resp = self.call("GET", f"/api/todo/{todo_id}", "GET /api/todo/{id}")
+        if resp is not None and "etag" in resp.headers:
+            self.call(
                 "GET",
-                f"{BASE_URL}/todo/{random_todo_id}",
-            ) as resp:
-                if resp.js is None:
-                    pass
-                elif resp.status_code != 200 and resp.status_code != 404:
-                    resp.success(WRONG_STATUS_CODE)
-        else:
-            with self.rest(
-                "POST", f"{BASE_URL}/new_todo", json=random.choice(TODO_LSIT)
-            ) as resp:
-                if resp.js is not None:
-                    created_todos.append(resp.json()["id"])
-                elif resp.status_code != 201 and resp.status_code != 404:
-                    resp.success(WRONG_STATUS_CODE)
-
-    @task(2)
+                f"/api/todo/{todo_id}",
+                "GET /api/todo/{id} If-None-Match",
+                expected=(200, 304),
+                headers={"If-None-Match": resp.headers["etag"]},
+            )
+
     def mark_as_done(self):
-        random_todo_id = check_created_todos(created_todos)
-        if random_todo_id:
-            with self.rest(
-                "PUT",
-                f"{BASE_URL}/{random_todo_id}",
-            ) as resp:
-                if resp.js is None:
-                    pass
-                elif resp.status_code != 200 and resp.status_code != 404:
-                    resp.success(WRONG_STATUS_CODE)
-        else:
-            with self.rest(
-                "POST", f"{BASE_URL}/new_todo", json=random.choice(TODO_LSIT)
-            ) as resp:
-                if resp.js is not None:
-                    created_todos.append(resp.json()["id"])
-                elif resp.status_code != 201 and resp.status_code != 404:
-                    resp.success(WRONG_STATUS_CODE)
-
-    @task(1)
+        todo_id = self.own_todo()
+        if todo_id is not None:
+            self.call("PUT", f"/api/{todo_id}", "PUT /api/{id}")
+
     def delete_todo(self):
-        random_todo_id = check_created_todos(created_todos)
-        if random_todo_id:
-            with self.rest("DELETE", f"{BASE_URL}/delete/{random_todo_id}") as resp:
-                if resp.js is not None:
-                    created_todos.remove(random_todo_id)
-                elif resp.status_code != 200 and resp.status_code != 404:
-                    resp.success(WRONG_STATUS_CODE)
-        else:
-            with self.rest(
-                "POST", f"{BASE_URL}/new_todo", json=random.choice(TODO_LSIT)
-            ) as resp:
-                if resp.js is not None:
-                    created_todos.append(resp.json()["id"])
-                elif resp.status_code != 201 and resp.status_code != 404:
-                    resp.success(WRONG_STATUS_CODE)
+        todo_id = self.own_todo()
+        if todo_id is not None:
+            self.todo_ids.remove(todo_id)
+            self.call("DELETE", f"/api/delete/{todo_id}", "DELETE /api/delete/{id}")
+
+
+TASKS = {
+    name: getattr(TodoAPIUser, name)
+    for name in (
+        "new_todo",
+        "new_todos",
+        "list_todos",
+        "list_pages",
+        "list_open_todos",
+        "search_todos",
+        "get_todo",
+        "revalidate_todo",
+        "mark_as_done",
+        "delete_todo",
+    )
+}
+
+# Every task once until the profile replaces the list when the test starts.
+TodoAPIUser.tasks = list(TASKS.values())
+
+
+@events.init.add_listener
+def apply_profile(environment, **kwargs):
+    options = environment.parsed_options
+    weights = load_profile(options.task_profile if options else DEFAULT_PROFILE)
+    TodoAPIUser.tasks = [
+        TASKS[name] for name, weight in weights.items() for _ in range(weight)
+    ]
+    environment.profile = weights
+    environment.slo = service_levels.load_slo(options.slo) if options and options.slo else None
+
+
+def endpoint_stats(stats) -> dict:
+    """
+    Collects the counts, throughput and percentiles of every endpoint.
+
+    Parameters:
+        stats (RequestStats): The statistics of a run, or of a part of it.
+
+    Returns:
+        dict: The statistics by endpoint name.
+    """
+    endpoints = {}
+    for entry in sorted(stats.entries.values(), key=lambda e: e.name):
+        endpoints[entry.name] = {
+            "requests": entry.num_requests,
+            "failures": entry.num_failures,
+            "rps": round(entry.total_rps, 2),
+            "avg_ms": round(entry.avg_response_time, 2),
+            "p50_ms": entry.get_response_time_percentile(0.5),
+            "p95_ms": entry.get_response_time_percentile(0.95),
+            "p99_ms": entry.get_response_time_percentile(0.99),
+            "max_ms": entry.max_response_time,
+        }
+    return endpoints
+
+
+def evaluate_slo(environment, endpoints: dict) -> dict:
+    """
+    Checks endpoint statistics against the SLO of the run, without targets if none was given.
+    """
+    slo = getattr(environment, "slo", None) or {"default": {}, "endpoints": {}}
+    return service_levels.evaluate(endpoints, slo)
+
+
+def stats_summary(environment) -> dict:
+    """
+    Collects the per-endpoint statistics of a run in a form that can be diffed between runs.
+
+    Parameters:
+        environment (Environment): The Locust environment of the run.
+
+    Returns:
+        dict: The settings of the run and the counts, throughput and percentiles per endpoint.
+    """
+    options = environment.parsed_options
+    stats = environment.stats
+    endpoints = endpoint_stats(stats)
+    results = evaluate_slo(environment, endpoints)
+    total = stats.total
+    return {
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": environment.host,
+        "users": options.num_users if options else None,
+        "think_time": options.think_time if options else None,
+        "profile": getattr(environment, "profile", None),
+        "arrival": getattr(environment, "arrival", None),
+        "total": {
+            "requests": total.num_requests,
+            "failures": total.num_failures,
+            "rps": round(total.total_rps, 2),
+            "p50_ms": total.get_response_time_percentile(0.5),
+            "p95_ms": total.get_response_time_percentile(0.95),
+            "p99_ms": total.get_response_time_percentile(0.99),
+        },
+        "endpoints": endpoints,
+        "slo": {
+            "passed": service_levels.passed(results),
+            "violations": {
+                name: result["violations"]
+                for name, result in results.items()
+                if result["violations"]
+            },
+        },
+    }
+
+
+@events.quitting.add_listener
+def report_slo(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    results = evaluate_slo(environment, endpoint_stats(environment.stats))
+    if not results:
+        return
+    logging.info(
+        "Latency by endpoint (measured / target):\n%s",
+        service_levels.format_report(results),
+    )
+    # Listeners of other locustfiles run first and may already have decided the exit code.
+    if not service_levels.passed(results) and environment.process_exit_code is None:
+        environment.process_exit_code = 1
+
+
+@events.quitting.add_listener
+def export_results(environment, **kwargs):
+    options = environment.parsed_options
+    if options is None or not options.results_json:
+        return
+    # In a distributed run only the master holds the statistics of all workers.
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    directory = os.path.dirname(options.results_json)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(options.results_json, "w") as file:
+        json.dump(stats_summary(environment), file, indent=2)
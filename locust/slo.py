@@ -0,0 +1,116 @@
+"""
+Service level objectives of the load tests.
+
+The targets are read from a JSON file, with defaults for every endpoint and overrides
+per endpoint under the stats name used by the locustfiles:
+
+    {
+        "default": {"p95_ms": 100, "p99_ms": 250, "error_rate": 0.001},
+        "endpoints": {"GET /api/search": {"p95_ms": 200}}
+    }
+
+Targets that are left out are not checked.
+"""
+import json
+
+TARGETS = ("p50_ms", "p95_ms", "p99_ms", "error_rate")
+
+
+def load_slo(path: str) -> dict:
+    """
+    Reads the SLO targets from a file.
+
+    Parameters:
+        path (str): The JSON file, see the module docstring.
+
+    Returns:
+        dict: The default targets and the targets per endpoint.
+
+    Raises:
+        ValueError: If a target is unknown or not a non-negative number.
+    """
+    with open(path) as file:
+        slo = json.load(file)
+    slo = {"default": slo.get("default", {}), "endpoints": slo.get("endpoints", {})}
+    for targets in [slo["default"], *slo["endpoints"].values()]:
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise ValueError(f"Unknown targets in {path}: {', '.join(sorted(unknown))}")
+        if not all(
+            isinstance(value, (int, float)) and value >= 0 for value in targets.values()
+        ):
+            raise ValueError(f"The targets in {path} must be non-negative numbers")
+    return slo
+
+
+def targets_for(slo: dict, name: str) -> dict:
+    return {**slo["default"], **slo["endpoints"].get(name, {})}
+
+
+def evaluate(endpoints: dict, slo: dict) -> dict:
+    """
+    Checks the latency percentiles and error rate of every endpoint against its targets.
+
+    Parameters:
+        endpoints (dict): The statistics by endpoint name, as in the results of the locustfiles.
+        slo (dict): The targets, as returned by load_slo.
+
+    Returns:
+        dict: The measured values, targets and violations by endpoint name.
+    """
+    results = {}
+    for name, stats in endpoints.items():
+        measured = {
+            "requests": stats["requests"],
+            "error_rate": stats["failures"] / stats["requests"] if stats["requests"] else 0.0,
+            "p50_ms": stats["p50_ms"],
+            "p95_ms": stats["p95_ms"],
+            "p99_ms": stats["p99_ms"],
+        }
+        targets = targets_for(slo, name)
+        measured["targets"] = targets
+        measured["violations"] = [
+            target for target, limit in targets.items() if measured[target] > limit
+        ]
+        results[name] = measured
+    return results
+
+
+def passed(results: dict) -> bool:
+    return not any(result["violations"] for result in results.values())
+
+
+def format_report(results: dict) -> str:
+    """
+    Formats the evaluated endpoints as a table, with the targets next to the measured values.
+
+    Parameters:
+        results (dict): The evaluated endpoints, as returned by evaluate.
+
+    Returns:
+        str: The table, ending with the overall verdict.
+    """
+
+    def cell(result, target):
+        value = result[target]
+        text = f"{value:.2%}" if target == "error_rate" else f"{value:.0f}"
+        if target in result["targets"]:
+            limit = result["targets"][target]
+            text += f" / {limit:.2%}" if target == "error_rate" else f" / {limit:g}"
+            if target in result["violations"]:
+                text += " !"
+        return text
+
+    width = max([len(name) for name in results] + [len("Endpoint")])
+    lines = [
+        f"{'Endpoint':<{width}} {'Requests':>9} {'p50 ms':>12} {'p95 ms':>12} "
+        f"{'p99 ms':>12} {'Errors':>16}  Result"
+    ]
+    for name, result in sorted(results.items()):
+        lines.append(
+            f"{name:<{width}} {result['requests']:>9} {cell(result, 'p50_ms'):>12} "
+            f"{cell(result, 'p95_ms'):>12} {cell(result, 'p99_ms'):>12} "
+            f"{cell(result, 'error_rate'):>16}  {'FAIL' if result['violations'] else 'pass'}"
+        )
+    lines.append(f"SLO {'passed' if passed(results) else 'FAILED'}")
+    return "\n".join(lines)
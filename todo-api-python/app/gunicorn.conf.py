@@ -0,0 +1,123 @@
+"""
+Production server settings, for gunicorn with uvicorn workers:
+
+    gunicorn -c app/gunicorn.conf.py app.main:app
+
+WEB_CONCURRENCY worker processes are started, by default one per CPU the container
+may use. The app is imported once in the master and the workers are forked from it,
+so they start quickly and share the memory of the imported code.
+
+The connections the database accepts (DB_MAX_CONNECTIONS, minus
+DB_RESERVED_CONNECTIONS) are split between the workers, and the threadpool and
+connection pool of every worker are sized to its share, see tuning.plan_server.
+THREADPOOL_SIZE, DB_POOL_SIZE and DB_MAX_OVERFLOW override the sizes of the plan, and
+a warning is logged when they differ from it. With more than one worker the todo cache
+is turned off, as the workers would not see each other's writes.
+
+Workers are replaced after MAX_REQUESTS requests, with some jitter so they do not
+restart at the same time, and a worker that dies is replaced at once. SIGHUP replaces
+all workers gracefully: each finishes its requests within GRACEFUL_TIMEOUT seconds.
+As the app is preloaded, new code only takes effect after a restart of the master.
+
+The master migrates the schema once before it starts the workers, see schema.migrate.
+Set MIGRATE_ON_START=false when a deployment step runs the migration instead:
+
+    cd app && python -m sql_app.schema
+
+With WARMUP_ENABLED=true, every worker fills its connection pools and runs the hot
+queries before GET /ready succeeds, see warmup.Warmup.
+
+Every worker process keeps its own metrics and stats. With more than one worker, each
+writes its metrics to METRICS_MULTIPROC_DIR, a new temporary directory unless set, and
+GET /metrics adds up those of all workers, including the counters of exited ones. The
+series of the other workers are up to METRICS_WRITE_SECONDS old. The /internal
+endpoints, /ready and the slow-query log are not added up: they describe the worker
+that served the request, whose "pid" they include.
+"""
+import glob
+import os
+import sys
+import tempfile
+
+path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(path)
+
+from sql_app.tuning import (
+    apply_worker_environment,
+    available_cpus,
+    default_workers,
+    plan_server,
+)
+
+plan = plan_server(
+    workers=int(os.getenv("WEB_CONCURRENCY", "0")) or default_workers(available_cpus()),
+    max_connections=int(os.getenv("DB_MAX_CONNECTIONS", "100")),
+    reserved_connections=int(os.getenv("DB_RESERVED_CONNECTIONS", "10")),
+    threads=int(os.getenv("THREADPOOL_SIZE", "0")) or None,
+)
+
+# Read by sql_app.database and sql_app.cache when the app is imported below.
+overrides = apply_worker_environment(plan, os.environ)
+if plan.workers > 1 and not os.getenv("METRICS_MULTIPROC_DIR"):
+    os.environ["METRICS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="todo-api-metrics-")
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = plan.workers
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+accesslog = os.getenv("ACCESS_LOG") or None
+
+MIGRATE_ON_START = os.getenv("MIGRATE_ON_START", "True").lower() in ("true", "1", "t")
+
+
+def when_ready(server):
+    server.log.info(
+        "%d workers with %d threads and %d database connections each, "
+        "at most %d connections per database server",
+        plan.workers,
+        plan.threads,
+        plan.pool_size + plan.max_overflow,
+        plan.connections,
+    )
+    for message in overrides:
+        server.log.warning(message)
+
+
+def on_starting(server):
+    if METRICS_MULTIPROC_DIR:
+        # The metrics of an earlier run of the server would be added to those of this one.
+        for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, "*.json")):
+            os.remove(path)
+    if not MIGRATE_ON_START:
+        return
+    from sql_app.database import dispose_engines
+    from sql_app.schema import migrate_databases
+
+    migrated = migrate_databases()
+    if migrated:
+        server.log.info("Migrated the schema of %s", ", ".join(migrated))
+    # The master serves no requests, so it does not keep the connections of the migration.
+    dispose_engines()
+
+
+def post_fork(server, worker):
+    # The engines were created in the master, whose connections the worker must not share.
+    from sql_app.database import dispose_engines
+    from sql_app.metrics import registry
+
+    dispose_engines(close=False)
+    # The statements of the migration were counted in the master, not by this worker.
+    registry.clear()
+
+
+def child_exit(server, worker):
+    if METRICS_MULTIPROC_DIR:
+        from sql_app.metrics import registry
+
+        registry.collect_exited(METRICS_MULTIPROC_DIR, worker.pid)
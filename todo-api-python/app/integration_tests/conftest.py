@@ -0,0 +1,82 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.main import app
+from sql_app import models
+from sql_app.cache import todo_cache
+from sql_app.database import get_db
+
+
+@pytest.fixture(scope="function")
+def todos():
+    """The todos the test database starts with. Test modules override it to seed their own."""
+    return []
+
+
+@pytest.fixture(scope="function")
+def engine(todos):
+    """An in-memory SQLite database holding the todos, shared by every session of a test."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    models.Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all(todos)
+        db.commit()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def session_local(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="function")
+def session(session_local):
+    db = session_local()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="function")
+def override_get_db(session_local):
+    """Serves the requests of the app from the test database, with an empty todo cache."""
+
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    todo_cache.clear()
+    yield
+    app.dependency_overrides.clear()
+    todo_cache.clear()
+
+
+@pytest.fixture(scope="function")
+def client(override_get_db):
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="function")
+def statements(engine):
+    """The SQL statements sent to the database after the fixture is requested."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.main import async_router
+from sql_app import async_crud, models, schemas
+from sql_app.cache import todo_cache
+from sql_app.coalescer import async_status_updates
+from sql_app.database import get_async_db, to_async_url
+
+
+@pytest.fixture(scope="function")
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'todos.db'}"
+    engine = create_engine(url)
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(models.ToDo(title="Test Todo", description="Test Description"))
+    db.commit()
+    db.close()
+    engine.dispose()
+    return url
+
+
+@pytest.fixture(scope="function")
+def client(database_url):
+    async_engine = create_async_engine(to_async_url(database_url), poolclass=NullPool)
+    session_local = sessionmaker(
+        async_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    async def override_get_async_db():
+        async with session_local() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(async_router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    todo_cache.clear()
+    with TestClient(app) as c:
+        yield c
+
+
+def test_to_async_url():
+    assert to_async_url("postgresql://u:p@db/todos") == "postgresql+asyncpg://u:p@db/todos"
+    assert to_async_url("sqlite:///todos.db") == "sqlite+aiosqlite:///todos.db"
+
+
+def test_create_and_get_todo(client):
+    response = client.post(
+        "/api/new_todo", json={"title": "New Todo", "description": "New Description"}
+    )
+    assert response.status_code == 201
+    created = response.json()
+
+    response = client.get(f"/api/todo/{created['id']}")
+    assert response.status_code == 200
+    assert response.json() == created
+
+
+def test_create_todos(client):
+    todo_data = [
+        {"title": "Test Todo 1", "description": "Test Description 1"},
+        {"title": "Test Todo 2", "description": "Test Description 2"},
+    ]
+    response = client.post("/api/new_todos", json=todo_data)
+    assert response.status_code == 201
+    assert [todo["title"] for todo in response.json()] == ["Test Todo 1", "Test Todo 2"]
+
+
+def test_get_todos_list_and_cursor(client):
+    response = client.get("/api")
+    assert response.status_code == 200
+    assert [todo["title"] for todo in response.json()] == ["Test Todo"]
+
+    response = client.get("/api", params={"after": ""})
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+
+
+def test_get_todos_filters(client):
+    client.put("/api/1")
+    response = client.get("/api?is_done=true&title_prefix=Test&total=true")
+    assert [todo["id"] for todo in response.json()] == [1]
+    assert response.headers["x-total-count"] == "1"
+    assert client.get("/api?is_done=false").json() == []
+
+
+def test_search(client):
+    response = client.get("/api/search", params={"q": "test todo"})
+    assert [todo["id"] for todo in response.json()] == [1]
+    assert client.get("/api/search", params={"q": "missing"}).json() == []
+
+
+def test_insert_todos_isolates_a_row_the_driver_rejects(database_url):
+    async_engine = create_async_engine(to_async_url(database_url), poolclass=NullPool)
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def reject_nul_characters(conn, cursor, statement, parameters, context, executemany):
+        if any(isinstance(value, str) and "\x00" in value for value in parameters):
+            raise ValueError("A string literal cannot contain NUL (0x00) characters.")
+
+    todos = [schemas.ToDoCreate(title=title, description="") for title in ("a", "b\x00", "c")]
+
+    async def insert():
+        async with AsyncSession(async_engine, expire_on_commit=False) as db:
+            return await async_crud.insert_todos(db, todos)
+
+    created = asyncio.run(insert())
+    asyncio.run(async_engine.dispose())
+    assert created[0].title == "a"
+    assert isinstance(created[1], ValueError)
+    assert created[2].title == "c"
+
+
+def test_mark_as_done_and_delete(client):
+    response = client.put("/api/1")
+    assert response.status_code == 200
+    assert response.json()["is_done"] is True
+
+    response = client.delete("/api/delete/1")
+    assert response.status_code == 200
+    assert client.get("/api/todo/1").status_code == 404
+
+
+def test_mark_as_done_coalesced(client, monkeypatch):
+    monkeypatch.setattr(async_status_updates, "enabled", True)
+    response = client.put("/api/1")
+    assert response.status_code == 200
+    assert response.json()["is_done"] is True
+    assert client.put("/api/999").status_code == 404
+
+
+def test_conditional_get(client):
+    etag = client.get("/api/todo/1").headers["etag"]
+    assert client.get("/api/todo/1", headers={"If-None-Match": etag}).status_code == 304
+
+    list_etag = client.get("/api").headers["etag"]
+    assert client.get("/api", headers={"If-None-Match": list_etag}).status_code == 304
+
+    client.put("/api/1")
+    assert client.get("/api/todo/1", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/api", headers={"If-None-Match": list_etag}).status_code == 200
+
+
+def test_not_found(client):
+    assert client.put("/api/999").status_code == 404
+    assert client.delete("/api/delete/999").status_code == 404
+
+
+def test_export(client):
+    response = client.get("/api/export")
+    assert response.status_code == 200
+    assert response.text.splitlines() == [
+        '{"id":1,"title":"Test Todo","description":"Test Description","is_done":false}'
+    ]
@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, exc
+from app.main import app
+from sql_app import crud, models, schemas
+from sql_app.coalescer import status_updates, todo_inserts
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [
+        models.ToDo(title=f"Todo {index}", description="Description") for index in range(4)
+    ]
+
+
+@pytest.fixture(scope="function")
+def reject_bad_titles(engine):
+    """Makes the database refuse todos titled "bad", like a constraint violation."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TRIGGER reject_bad_title BEFORE INSERT ON todos "
+            "WHEN NEW.title = 'bad' BEGIN SELECT RAISE(ABORT, 'bad title'); END"
+        )
+
+
+def reject_nul_characters(conn, cursor, statement, parameters, context, executemany):
+    """Fails like psycopg2 on a string with a NUL character, before reaching the database."""
+    values = parameters.values() if isinstance(parameters, dict) else parameters
+    if any(isinstance(value, str) and "\x00" in value for value in values):
+        raise ValueError("A string literal cannot contain NUL (0x00) characters.")
+
+
+@pytest.fixture(scope="function")
+def reject_nul_titles(engine):
+    event.listen(engine, "before_cursor_execute", reject_nul_characters)
+    yield
+    event.remove(engine, "before_cursor_execute", reject_nul_characters)
+
+
+def run_concurrently(call, arguments):
+    results = {}
+
+    def run(argument):
+        results[argument] = call(argument)
+
+    threads = [threading.Thread(target=run, args=(argument,)) for argument in arguments]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+@pytest.fixture(scope="function")
+def client(override_get_db, monkeypatch):
+    monkeypatch.setattr(status_updates, "enabled", True)
+    monkeypatch.setattr(status_updates, "window", 0.5)
+    monkeypatch.setattr(status_updates, "max_batch", 3)
+    monkeypatch.setattr(todo_inserts, "enabled", True)
+    monkeypatch.setattr(todo_inserts, "window", 0.5)
+    monkeypatch.setattr(todo_inserts, "max_batch", 3)
+    # A rejected row fails its request with a 500 instead of raising in the test thread.
+    with TestClient(app, raise_server_exceptions=False) as c:
+        yield c
+
+
+def test_update_todos_status_in_one_transaction(session, statements):
+    updated = crud.update_todos_status(session, {2: True, 1: True, 3: False, 99: True})
+    assert sorted(updated) == [1, 2, 3]
+    assert updated[1].is_done and updated[2].is_done and not updated[3].is_done
+    assert crud.get_todo_version(session, 1) == 2
+    updates = [statement for statement in statements if statement.startswith("UPDATE")]
+    assert len(updates) == 2
+
+
+def test_concurrent_requests_are_committed_together(client, statements):
+    responses = run_concurrently(lambda todo_id: client.put(f"/api/{todo_id}"), (1, 2, 99))
+    assert responses[1].status_code == 200
+    assert responses[1].json()["id"] == 1
+    assert responses[1].json()["is_done"] is True
+    assert responses[2].json()["id"] == 2
+    assert responses[99].status_code == 404
+    assert len([statement for statement in statements if statement.startswith("UPDATE")]) == 1
+    stats = client.get("/internal/coalescer").json()["status_updates"]
+    assert stats["largest_batch"] >= 3
+
+
+def test_insert_todos_in_one_statement(session, statements):
+    todos = [schemas.ToDoCreate(title=f"New {index}", description="") for index in range(3)]
+    created = crud.insert_todos(session, todos)
+    assert [row.title for row in created] == ["New 0", "New 1", "New 2"]
+    assert all(row.version == 1 for row in created)
+    assert len([statement for statement in statements if statement.startswith("INSERT")]) == 1
+
+
+def test_insert_todos_isolates_a_bad_row(session, reject_bad_titles):
+    todos = [schemas.ToDoCreate(title=title, description="") for title in ("a", "bad", "b")]
+    created = crud.insert_todos(session, todos)
+    assert created[0].title == "a"
+    assert isinstance(created[1], exc.IntegrityError)
+    assert created[2].title == "b"
+    titles = [todo.title for todo in session.query(models.ToDo).order_by(models.ToDo.id)]
+    assert titles[-2:] == ["a", "b"]
+
+
+def test_insert_todos_isolates_a_row_the_driver_rejects(session, reject_nul_titles):
+    todos = [schemas.ToDoCreate(title=title, description="") for title in ("a", "b\x00", "c")]
+    created = crud.insert_todos(session, todos)
+    assert created[0].title == "a"
+    assert isinstance(created[1], ValueError)
+    assert created[2].title == "c"
+    titles = [todo.title for todo in session.query(models.ToDo).order_by(models.ToDo.id)]
+    assert titles[-2:] == ["a", "c"]
+
+
+def test_concurrent_creates_are_committed_together(client, statements):
+    responses = run_concurrently(
+        lambda title: client.post("/api/new_todo", json={"title": title, "description": ""}),
+        ("a", "b", "c"),
+    )
+    assert all(response.status_code == 201 for response in responses.values())
+    ids = {response.json()["id"] for response in responses.values()}
+    assert len(ids) == 3
+    assert responses["a"].json()["title"] == "a"
+    assert client.get(f"/api/todo/{responses['b'].json()['id']}").json()["title"] == "b"
+    assert len([statement for statement in statements if statement.startswith("INSERT")]) == 1
+
+
+def test_bad_create_fails_alone(client, reject_bad_titles):
+    responses = run_concurrently(
+        lambda title: client.post("/api/new_todo", json={"title": title, "description": ""}),
+        ("a", "bad", "b"),
+    )
+    assert responses["a"].status_code == 201
+    assert responses["b"].status_code == 201
+    assert responses["bad"].status_code == 500
@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from sql_app import schemas
+from sql_app.cache import todo_cache
+from sql_app.database import get_read_repository, get_repository
+from sql_app.memory import InMemoryRepository, TodoStore
+
+
+@pytest.fixture(scope="function")
+def client():
+    store = TodoStore()
+    repository = InMemoryRepository(store)
+    repository.create_todos(
+        [
+            schemas.ToDoCreate(title=f"Todo {i}", description="Water the plants")
+            for i in range(100)
+        ]
+    )
+
+    def override_get_repository():
+        yield InMemoryRepository(store)
+
+    app.dependency_overrides[get_repository] = override_get_repository
+    app.dependency_overrides[get_read_repository] = override_get_repository
+    todo_cache.clear()
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+    todo_cache.clear()
+
+
+def test_list_page_is_compressed(client):
+    plain = client.get("/api", headers={"Accept-Encoding": "identity"})
+    response = client.get("/api", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert int(response.headers["Content-Length"]) < len(plain.content) / 4
+    assert response.json() == plain.json()
+
+
+def test_compressed_list_still_revalidates(client):
+    response = client.get("/api", headers={"Accept-Encoding": "gzip"})
+    etag = response.headers["ETag"]
+    assert etag.startswith("W/")
+    revalidated = client.get(
+        "/api", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_export_stream_is_compressed(client):
+    response = client.get("/api/export", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 100
+
+
+def test_single_todo_is_not_compressed(client):
+    response = client.get("/api/todo/1", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
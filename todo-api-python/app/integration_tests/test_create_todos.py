@@ -0,0 +1,67 @@
+import pytest
+from sql_app import crud, models, schemas
+
+
+@pytest.fixture(scope="function")
+def shuffled_returning(session, monkeypatch):
+    """Returns the rows of every INSERT in reverse, as Postgres is free to."""
+    execute = session.execute
+
+    def shuffled_execute(statement, *args, **kwargs):
+        result = execute(statement, *args, **kwargs)
+        if getattr(statement, "is_insert", False):
+            return list(result)[::-1]
+        return result
+
+    monkeypatch.setattr(session, "execute", shuffled_execute)
+
+
+def test_create_todos_in_chunks(session):
+    todos = [
+        schemas.ToDoCreate(title=f"Test Todo {i}", description=f"Test Description {i}")
+        for i in range(5)
+    ]
+    result = crud.create_todos(session, todos, chunk_size=2)
+    assert [todo.title for todo in result] == [todo.title for todo in todos]
+    assert len({todo.id for todo in result}) == 5
+    assert not any(todo.is_done for todo in result)
+    assert session.query(models.ToDo).count() == 5
+
+
+def test_create_todos_match_returned_rows_to_their_todos(session, shuffled_returning):
+    todos = [schemas.ToDoCreate(title=f"Todo {i}", description="") for i in range(5)]
+    created = crud.create_todos(session, todos, chunk_size=3)
+    assert [todo.title for todo in created] == [todo.title for todo in todos]
+    inserted = crud.insert_todos(session, todos)
+    assert [todo.title for todo in inserted] == [todo.title for todo in todos]
+    for todo in created + inserted:
+        assert crud.get_todo(session, todo.id).title == todo.title
+
+
+def test_create_todos_endpoint(client):
+    todo_data = [
+        {"title": "Test Todo 1", "description": "Test Description 1"},
+        {"title": "Test Todo 2", "description": "Test Description 2"},
+    ]
+    response = client.post("/api/new_todos", json=todo_data)
+    assert response.status_code == 201
+    created = response.json()
+    assert [todo["title"] for todo in created] == ["Test Todo 1", "Test Todo 2"]
+    assert all(not todo["is_done"] for todo in created)
+
+
+def test_create_todos_empty_batch(client):
+    response = client.post("/api/new_todos", json=[])
+    assert response.status_code == 201
+    assert response.json() == []
+
+
+def test_create_todos_batch_too_large(client, monkeypatch):
+    monkeypatch.setattr("app.main.MAX_BATCH_SIZE", 1)
+    todo_data = [
+        {"title": "Test Todo 1", "description": "Test Description 1"},
+        {"title": "Test Todo 2", "description": "Test Description 2"},
+    ]
+    response = client.post("/api/new_todos", json=todo_data)
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Batch too large"}
@@ -0,0 +1,37 @@
+import json
+import pytest
+from sql_app import crud, models
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [
+        models.ToDo(title=f"Test Todo {i}", description=f"Description {i}") for i in range(25)
+    ]
+
+
+def test_stream_todos_in_batches(session_local):
+    db = session_local()
+    batches = list(crud.stream_todos(db, batch_size=10))
+    db.close()
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [row.id for batch in batches for row in batch] == list(range(1, 26))
+
+
+def test_export_endpoint_streams_ndjson(client):
+    with client.stream("GET", "/api/export", params={"batch_size": 10}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [line for line in response.iter_lines() if line]
+    todos = [json.loads(line) for line in lines]
+    assert len(todos) == 25
+    assert todos[0] == {
+        "id": 1,
+        "title": "Test Todo 0",
+        "description": "Description 0",
+        "is_done": False,
+    }
+
+
+def test_export_rejects_invalid_batch_size(client):
+    assert client.get("/api/export", params={"batch_size": 0}).status_code == 422
@@ -0,0 +1,66 @@
+import pytest
+from sql_app import crud, models
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [
+        models.ToDo(title=f"Shop {i}", description="Groceries", is_done=i % 2 == 0)
+        for i in range(4)
+    ] + [
+        models.ToDo(title="Gym", description="Workout", is_done=False),
+        models.ToDo(title="Shop_%", description="Wildcards", is_done=False),
+    ]
+
+
+def test_get_todos_filters(session):
+    open_todos = crud.get_todos(session, is_done=False)
+    assert [todo.title for todo in open_todos] == ["Shop 1", "Shop 3", "Gym", "Shop_%"]
+
+    done_shopping = crud.get_todos(session, is_done=True, title_prefix="Shop")
+    assert [todo.title for todo in done_shopping] == ["Shop 0", "Shop 2"]
+
+
+def test_title_prefix_escapes_wildcards(session):
+    todos = crud.get_todos(session, title_prefix="Shop_")
+    assert [todo.title for todo in todos] == ["Shop_%"]
+
+
+def test_count_todos(session):
+    assert crud.count_todos(session) == 6
+    assert crud.count_todos(session, is_done=False) == 4
+    assert crud.count_todos(session, is_done=False, title_prefix="Shop") == 3
+
+
+def test_filtered_cursor_pages(session):
+    first = crud.get_todos(session, limit=2, after_id=0, is_done=False)
+    second = crud.get_todos(session, limit=2, after_id=first[-1].id, is_done=False)
+    assert [todo.title for todo in first + second] == [
+        "Shop 1",
+        "Shop 3",
+        "Gym",
+        "Shop_%",
+    ]
+
+
+def test_api_filters_and_total(client):
+    response = client.get("/api/?is_done=false&title_prefix=Shop&limit=2&total=true")
+    assert response.status_code == 200
+    assert [todo["title"] for todo in response.json()] == ["Shop 1", "Shop 3"]
+    assert response.headers["x-total-count"] == "3"
+
+
+def test_api_total_is_opt_in(client):
+    response = client.get("/api/?is_done=true")
+    assert [todo["is_done"] for todo in response.json()] == [True, True]
+    assert "x-total-count" not in response.headers
+
+
+def test_api_filtered_cursor_pages(client):
+    titles = []
+    after = ""
+    while after is not None:
+        page = client.get(f"/api/?is_done=false&limit=3&after={after}").json()
+        titles.extend(todo["title"] for todo in page["items"])
+        after = page["next_cursor"]
+    assert titles == ["Shop 1", "Shop 3", "Gym", "Shop_%"]
@@ -0,0 +1,55 @@
+import json
+import pathlib
+from sql_app import models
+from sql_app.importer import import_chunks
+
+TODOS_LIST = pathlib.Path(__file__).parents[3] / "todos_list.json"
+
+
+def count_todos(session_local) -> int:
+    db = session_local()
+    try:
+        return db.query(models.ToDo).count()
+    finally:
+        db.close()
+
+
+def test_import_chunks_in_batches(session_local):
+    document = TODOS_LIST.read_bytes()
+    chunks = (document[i : i + 256] for i in range(0, len(document), 256))
+    db = session_local()
+    report = import_chunks(db, chunks, batch_size=30)
+    db.close()
+    assert report["imported"] == 100
+    assert count_todos(session_local) == 100
+
+
+def test_import_endpoint_json_array(client, session_local):
+    response = client.post(
+        "/api/import", params={"batch_size": 7}, content=TODOS_LIST.read_bytes()
+    )
+    assert response.status_code == 201
+    assert response.json()["imported"] == 100
+    assert "rows_per_second" in response.json()
+    assert client.get("/api/todo/100").json()["title"] == "Go to the gym - Day 100"
+
+
+def test_import_endpoint_ndjson(client, session_local):
+    body = "\n".join(
+        json.dumps({"title": f"Todo {i}", "description": "From NDJSON"}) for i in range(3)
+    )
+    response = client.post(
+        "/api/import",
+        content=body.encode(),
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert response.status_code == 201
+    assert response.json()["imported"] == 3
+
+
+def test_import_endpoint_rolls_back_invalid_body(client, session_local):
+    body = b'[{"title": "a", "description": "b"}, {"title": "missing description"}]'
+    response = client.post("/api/import", params={"batch_size": 1}, content=body)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Item 1 is not a valid todo"}
+    assert count_todos(session_local) == 0
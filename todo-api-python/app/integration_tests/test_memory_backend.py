@@ -0,0 +1,74 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from sql_app.cache import todo_cache
+from sql_app.database import get_read_repository, get_repository
+from sql_app.memory import InMemoryRepository, TodoStore
+
+
+@pytest.fixture(scope="function")
+def client():
+    store = TodoStore()
+
+    def override_get_repository():
+        yield InMemoryRepository(store)
+
+    app.dependency_overrides[get_repository] = override_get_repository
+    app.dependency_overrides[get_read_repository] = override_get_repository
+    todo_cache.clear()
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+    todo_cache.clear()
+
+
+def create(client, title):
+    response = client.post("/api/new_todo", json={"title": title, "description": "D"})
+    assert response.status_code == 201
+    return response.json()
+
+
+def test_crud_round_trip(client):
+    todo = create(client, "Buy milk")
+    assert todo == {"id": 1, "title": "Buy milk", "description": "D", "is_done": False}
+    assert client.get("/api/todo/1").json() == todo
+    assert client.put("/api/1").json()["is_done"] is True
+    assert client.delete("/api/delete/1").json()["is_done"] is True
+    assert client.get("/api/todo/1").status_code == 404
+    assert client.put("/api/1").status_code == 404
+
+
+def test_lists_filters_and_cursor_pages(client):
+    for index in range(5):
+        create(client, f"Todo {index}")
+    client.put("/api/2")
+    response = client.get("/api", params={"is_done": False, "total": True})
+    assert response.headers["X-Total-Count"] == "4"
+    assert [todo["id"] for todo in response.json()] == [1, 3, 4, 5]
+    page = client.get("/api", params={"after": "", "limit": 3}).json()
+    assert [todo["id"] for todo in page["items"]] == [1, 2, 3]
+    assert client.get("/api", params={"after": page["next_cursor"]}).json()[
+        "next_cursor"
+    ] is None
+
+
+def test_list_etag(client):
+    create(client, "First")
+    etag = client.get("/api").headers["ETag"]
+    assert client.get("/api", headers={"If-None-Match": etag}).status_code == 304
+    create(client, "Second")
+    assert client.get("/api", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_import_and_export(client):
+    body = '[{"title": "A", "description": "x"}, {"title": "B", "description": "y"}]'
+    assert client.post("/api/import", content=body).json()["imported"] == 2
+    assert client.post("/api/import", content='[{"title": "C"}').status_code == 422
+    assert len(client.get("/api/export").text.splitlines()) == 2
+
+
+def test_search(client):
+    create(client, "Water the garden")
+    create(client, "Call mum")
+    found = client.get("/api/search", params={"q": "garden"}).json()
+    assert [todo["title"] for todo in found] == ["Water the garden"]
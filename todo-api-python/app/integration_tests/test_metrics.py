@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from sql_app.metrics import instrument_engine, registry
+
+
+@pytest.fixture(scope="function")
+def client(engine, override_get_db):
+    instrument_engine(engine)
+    registry.clear()
+    with TestClient(app) as c:
+        yield c
+    registry.clear()
+
+
+def samples(client) -> dict:
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    return dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+
+
+def test_requests_are_labelled_with_the_route_template(client):
+    client.get("/api/todo/1")
+    client.get("/api/todo/2")
+    client.get("/does/not/exist")
+
+    metrics = samples(client)
+
+    route = 'method="GET",route="/api/todo/{todo_id}"'
+    assert metrics[f"http_request_duration_seconds_count{{{route}}}"] == "2"
+    assert metrics[f'http_requests_total{{{route},status="404"}}'] == "2"
+    assert metrics['http_requests_total{method="GET",route="unmatched",status="404"}'] == "1"
+    assert not any("/api/todo/1" in name for name in metrics)
+
+
+def test_sql_statements_are_counted_per_request(client):
+    client.post("/api/new_todos", json=[{"title": "a", "description": "b"}] * 3)
+    client.get("/api/", params={"limit": 10})
+
+    metrics = samples(client)
+
+    route = 'method="GET",route="/api"'
+    # The table version for the ETag, then the page of todos.
+    assert metrics[f"http_request_db_statements_sum{{{route}}}"] == "2.0"
+    assert metrics[f'http_request_db_statements_bucket{{{route},le="1.0"}}'] == "0"
+    assert metrics[f'http_request_db_statements_bucket{{{route},le="2.0"}}'] == "1"
+    assert float(metrics[f"http_request_db_duration_seconds_sum{{{route}}}"]) > 0
+
+
+def test_in_flight_gauge_returns_to_zero(client):
+    client.post("/api/new_todo", json={"title": "a", "description": "b"})
+
+    metrics = samples(client)
+
+    assert metrics['http_requests_in_flight{method="POST"}'] == "0"
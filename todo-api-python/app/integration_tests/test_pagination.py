@@ -0,0 +1,52 @@
+import pytest
+from sql_app import crud, models
+from sql_app.pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [
+        models.ToDo(title=f"Test Todo {i}", description=f"Test Description {i}")
+        for i in range(5)
+    ]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+
+
+def test_decode_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_get_todos_after_id(session):
+    result = crud.get_todos(session, limit=2, after_id=2)
+    assert [todo.id for todo in result] == [3, 4]
+
+
+def test_get_todos_keeps_offset_contract(client):
+    response = client.get("/api?skip=1&limit=2")
+    assert response.status_code == 200
+    assert [todo["title"] for todo in response.json()] == [
+        "Test Todo 1",
+        "Test Todo 2",
+    ]
+
+
+def test_get_todos_cursor_walks_all_pages(client):
+    titles = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get("/api", params={"after": cursor, "limit": 2})
+        assert response.status_code == 200
+        page = response.json()
+        titles.extend(todo["title"] for todo in page["items"])
+        cursor = page["next_cursor"]
+    assert titles == [f"Test Todo {i}" for i in range(5)]
+
+
+def test_get_todos_invalid_cursor(client):
+    response = client.get("/api", params={"after": "bogus"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
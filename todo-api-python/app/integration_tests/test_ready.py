@@ -0,0 +1,58 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.main as main
+from sql_app import database
+from sql_app.schema import migrate
+from sql_app.warmup import HOT_QUERIES, Warmup
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'todos.db'}", pool_size=2)
+    migrate(engine)
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    yield engine
+    engine.dispose()
+
+
+def wait_until_ready(client, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            return response.json()
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+        time.sleep(0.01)
+    raise AssertionError("never became ready")
+
+
+def test_ready_without_warmup(monkeypatch):
+    monkeypatch.setattr(main, "warmup", Warmup(enabled=False))
+    with TestClient(main.app) as client:
+        assert client.get("/ready").json()["ready"] is True
+
+
+def test_ready_after_warmup(engine, monkeypatch):
+    monkeypatch.setattr(main, "warmup", Warmup(enabled=True))
+    with TestClient(main.app) as client:
+        stats = wait_until_ready(client)
+    assert stats["error"] is None
+    assert stats["connections"] == 2
+    assert stats["queries"] == len(HOT_QUERIES)
+    assert engine.pool.checkedin() == 2
+
+
+def test_not_ready_before_warmup(monkeypatch):
+    monkeypatch.setattr(main, "warmup", Warmup(enabled=True))
+    client = TestClient(main.app)
+    # Without the startup event the warmup never runs.
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
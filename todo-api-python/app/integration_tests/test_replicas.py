@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sql_app import models
+from sql_app.cache import todo_cache
+from sql_app.database import replica_set
+from sql_app.replicas import LAST_WRITE_COOKIE, Replica
+
+
+def seeded_engine(url: str, title: str, **kwargs):
+    engine = create_engine(url, **kwargs)
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(models.ToDo(title=title, description="Description"))
+    db.commit()
+    db.close()
+    return engine
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [models.ToDo(title="from primary", description="Description")]
+
+
+@pytest.fixture(scope="function")
+def replicas(tmp_path, monkeypatch):
+    """Two SQLite files standing in for replicas, each holding a todo named after it."""
+    engines = [
+        seeded_engine(f"sqlite:///{tmp_path / name}.db", f"from {name}")
+        for name in ("replica-a", "replica-b")
+    ]
+    replicas = [
+        Replica(name, sessionmaker(bind=engine), engine)
+        for name, engine in zip(("replica-a", "replica-b"), engines)
+    ]
+    monkeypatch.setattr(replica_set, "replicas", replicas)
+    monkeypatch.setattr(replica_set, "strategy", "round_robin")
+    monkeypatch.setattr(replica_set, "_next", 0)
+    monkeypatch.setattr(replica_set, "fallbacks", 0)
+    yield replicas
+    for engine in engines:
+        engine.dispose()
+
+
+def titles(client, path="/api/todo/1"):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.json()["title"]
+
+
+def test_reads_use_the_primary_without_replicas(client):
+    assert titles(client) == "from primary"
+    assert LAST_WRITE_COOKIE not in client.put("/api/1").cookies
+
+
+def test_reads_are_spread_round_robin(client, replicas):
+    assert [titles(client) for _ in range(4)] == [
+        "from replica-a",
+        "from replica-b",
+        "from replica-a",
+        "from replica-b",
+    ]
+    assert client.get("/api").json()[0]["title"] in ("from replica-a", "from replica-b")
+    stats = client.get("/internal/replicas").json()
+    assert [replica["reads"] for replica in stats["replicas"]] == [3, 2]
+    assert all(replica["in_flight"] == 0 for replica in stats["replicas"])
+
+
+def test_writes_go_to_the_primary_and_are_read_back(client, replicas):
+    response = client.put("/api/1")
+    assert response.status_code == 200
+    assert LAST_WRITE_COOKIE in response.cookies
+    # Within the read-your-writes window the client reads its write from the primary.
+    response = client.get("/api/todo/1")
+    assert response.json() == {
+        "id": 1,
+        "title": "from primary",
+        "description": "Description",
+        "is_done": True,
+    }
+
+
+def test_unhealthy_replica_falls_back(client, replicas, tmp_path):
+    down = Replica(
+        "down",
+        sessionmaker(bind=create_engine(f"sqlite:///{tmp_path / 'missing' / 'down.db'}")),
+    )
+    replica_set.replicas = [down]
+    assert titles(client) == "from primary"
+    assert titles(client) == "from primary"
+    stats = client.get("/internal/replicas").json()
+    assert stats["replicas"][0]["healthy"] is False
+    assert stats["replicas"][0]["failures"] == 1
+    assert stats["fallbacks"] == 2
+
+
+def test_replica_reads_do_not_fill_the_cache(client, replicas):
+    titles(client)
+    assert todo_cache.stats()["size"] == 0
@@ -0,0 +1,63 @@
+import pytest
+from sql_app import crud, models
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [
+        models.ToDo(title="Go running", description="Five laps in the park"),
+        models.ToDo(title="Buy milk", description="Run to the shop before it closes"),
+        models.ToDo(title="Run run run", description="Marathon training"),
+        models.ToDo(title="Read a book", description=None),
+    ]
+
+
+def test_search_is_ranked_and_stemmed(session):
+    todos = crud.search_todos(session, "run")
+    assert [todo.title for todo in todos][0] == "Run run run"
+    assert {todo.title for todo in todos} == {"Go running", "Buy milk", "Run run run"}
+
+
+def test_search_requires_all_words(session):
+    todos = crud.search_todos(session, "run park")
+    assert [todo.title for todo in todos] == ["Go running"]
+
+
+def test_search_paginates(session):
+    everything = crud.search_todos(session, "run")
+    pages = crud.search_todos(session, "run", limit=2) + crud.search_todos(
+        session, "run", skip=2, limit=2
+    )
+    assert [todo.id for todo in pages] == [todo.id for todo in everything]
+
+
+def test_search_treats_query_syntax_as_text(session):
+    assert crud.search_todos(session, 'milk AND "NEAR(*') == []
+    assert [todo.title for todo in crud.search_todos(session, "milk -")] == ["Buy milk"]
+    assert crud.search_todos(session, "   ") == []
+
+
+def test_search_follows_updates_and_deletes(session):
+    todo = session.get(models.ToDo, 4)
+    todo.title = "Read about running"
+    session.commit()
+    assert 4 in [todo.id for todo in crud.search_todos(session, "running")]
+
+    crud.delete_todo(session, 1)
+    assert 1 not in [todo.id for todo in crud.search_todos(session, "run")]
+
+
+def test_search_endpoint(client):
+    client.post("/api/new_todo", json={"title": "Running shoes", "description": "Buy"})
+
+    response = client.get("/api/search", params={"q": "shoes"})
+    assert response.status_code == 200
+    assert [todo["title"] for todo in response.json()] == ["Running shoes"]
+
+    response = client.get("/api/search", params={"q": "run", "limit": 1, "skip": 1})
+    assert len(response.json()) == 1
+
+
+def test_search_endpoint_validates_query(client):
+    assert client.get("/api/search").status_code == 422
+    assert client.get("/api/search", params={"q": ""}).status_code == 422
@@ -0,0 +1,157 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.main import app
+from sql_app import schemas
+from sql_app.cache import todo_cache
+from sql_app.database import get_read_repository, get_repository
+from sql_app.sharding import Shard, ShardedRepository, ShardSet, first_id, shard_of
+
+
+@pytest.fixture(scope="function")
+def shards(tmp_path):
+    """Three SQLite files standing in for the shards."""
+    engines = [
+        create_engine(f"sqlite:///{tmp_path / f'shard-{index}'}.db") for index in range(3)
+    ]
+    shard_set = ShardSet(
+        [
+            Shard(f"shard-{index}", sessionmaker(autoflush=False, bind=engine), engine)
+            for index, engine in enumerate(engines)
+        ]
+    )
+    shard_set.prepare()
+    yield shard_set
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def client(shards):
+    def override_get_repository():
+        repository = ShardedRepository(shards)
+        try:
+            yield repository
+        finally:
+            repository.close()
+
+    app.dependency_overrides[get_repository] = override_get_repository
+    app.dependency_overrides[get_read_repository] = override_get_repository
+    todo_cache.clear()
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+    todo_cache.clear()
+
+
+def create(client, count, prefix="Todo"):
+    return [
+        client.post(
+            "/api/new_todo", json={"title": f"{prefix} {index}", "description": "D"}
+        ).json()
+        for index in range(count)
+    ]
+
+
+def test_creates_spread_over_the_shards(client, shards):
+    todos = create(client, 6)
+    assert [shard_of(todo["id"]) for todo in todos] == [0, 1, 2, 0, 1, 2]
+    assert todos[1]["id"] == first_id(1)
+    assert [shard["writes"] for shard in shards.stats()["shards"]] == [2, 2, 2]
+
+
+def test_reads_and_writes_are_routed_by_id(client):
+    todo = create(client, 2)[1]
+    assert client.get(f"/api/todo/{todo['id']}").json() == todo
+    assert client.put(f"/api/{todo['id']}").json()["is_done"] is True
+    todo_cache.clear()
+    assert client.get(f"/api/todo/{todo['id']}").json()["is_done"] is True
+    assert client.delete(f"/api/delete/{todo['id']}").status_code == 200
+    assert client.get(f"/api/todo/{todo['id']}").status_code == 404
+    # An ID encoding a shard that does not exist.
+    assert client.get(f"/api/todo/{first_id(7)}").status_code == 404
+
+
+def test_list_merges_the_shards_in_id_order(client):
+    ids = sorted(todo["id"] for todo in create(client, 7))
+    assert [todo["id"] for todo in client.get("/api").json()] == ids
+    page = client.get("/api", params={"skip": 2, "limit": 3}).json()
+    assert [todo["id"] for todo in page] == ids[2:5]
+
+
+def test_cursor_pages_walk_all_shards(client):
+    ids = sorted(todo["id"] for todo in create(client, 7))
+    seen = []
+    after = ""
+    while after is not None:
+        page = client.get("/api", params={"after": after, "limit": 3}).json()
+        seen.extend(todo["id"] for todo in page["items"])
+        after = page["next_cursor"]
+    assert seen == ids
+
+
+def test_filters_and_total_span_the_shards(client):
+    todos = create(client, 5)
+    for todo in todos[:3]:
+        client.put(f"/api/{todo['id']}")
+    response = client.get("/api", params={"is_done": True, "total": True})
+    assert response.headers["X-Total-Count"] == "3"
+    assert [todo["id"] for todo in response.json()] == sorted(
+        todo["id"] for todo in todos[:3]
+    )
+
+
+def test_list_etag_changes_with_any_shard(client):
+    create(client, 1)
+    etag = client.get("/api").headers["ETag"]
+    assert client.get("/api", headers={"If-None-Match": etag}).status_code == 304
+    # The second todo is written to the second shard.
+    create(client, 1)
+    assert client.get("/api", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_batch_create_stays_on_one_shard(client):
+    response = client.post(
+        "/api/new_todos",
+        json=[{"title": f"Batch {index}", "description": "D"} for index in range(4)],
+    )
+    assert response.status_code == 201
+    assert {shard_of(todo["id"]) for todo in response.json()} == {0}
+
+
+def test_search_and_export_cover_all_shards(client):
+    create(client, 3, prefix="Groceries")
+    create(client, 2, prefix="Laundry")
+    found = client.get("/api/search", params={"q": "groceries"}).json()
+    assert sorted(todo["title"] for todo in found) == [
+        "Groceries 0",
+        "Groceries 1",
+        "Groceries 2",
+    ]
+    lines = client.get("/api/export").text.splitlines()
+    assert len(lines) == 5
+
+
+def test_import_stays_on_one_shard(client):
+    create(client, 1)
+    body = "\n".join(
+        f'{{"title": "Imported {index}", "description": "D"}}' for index in range(3)
+    )
+    assert client.post("/api/import", content=body).status_code == 201
+    imported = client.get("/api", params={"title_prefix": "Imported"}).json()
+    assert {shard_of(todo["id"]) for todo in imported} == {1}
+    assert len(imported) == 3
+
+
+def test_batched_updates_are_grouped_by_shard(shards):
+    repository = ShardedRepository(shards)
+    todos = [
+        repository.create_todo(schemas.ToDoCreate(title=f"Todo {index}", description="D"))
+        for index in range(3)
+    ]
+    updated = repository.update_todos_status(
+        {**{todo.id: True for todo in todos}, first_id(9): True}
+    )
+    assert sorted(updated) == [todo.id for todo in todos]
+    assert all(todo.is_done for todo in updated.values())
@@ -0,0 +1,90 @@
+import pytest
+from sqlalchemy import text
+from sql_app import models
+from sql_app.database import slow_query_log
+from sql_app.slow_queries import SlowQueryLog, instrument_slow_queries
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [models.ToDo(title="Test Todo", description="Test Description")]
+
+
+@pytest.fixture(scope="function")
+def log(engine):
+    log = SlowQueryLog(threshold=0, sample_rate=1.0, size=5)
+    instrument_slow_queries(engine, log)
+    return log
+
+
+def test_records_statements_over_the_threshold(engine, log):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT id FROM todos WHERE id = :id"), {"id": 1})
+
+    entry = log.entries()[0]
+    assert entry["statement"] == "SELECT id FROM todos WHERE id = ?"
+    assert entry["parameters"] == ["int"]
+    assert entry["duration_ms"] >= 0
+    assert entry["route"] is None
+
+
+def test_ignores_statements_under_the_threshold(engine):
+    log = SlowQueryLog(threshold=60)
+    instrument_slow_queries(engine, log)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+    assert log.entries() == []
+
+
+def test_captures_plans_of_sampled_reads(engine, log):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT id FROM todos WHERE id = :id"), {"id": 1})
+        conn.execute(text("UPDATE todos SET title = 'x' WHERE id = 1"))
+        conn.commit()
+    log.wait()
+
+    update, select = log.entries()[:2]
+    assert update["plan"] is None
+    assert any("todos" in line for line in select["plan"])
+    # The EXPLAIN statements themselves are not recorded.
+    assert not any(entry["statement"].startswith("EXPLAIN") for entry in log.entries())
+
+
+def test_ring_buffer_is_bounded(engine, log):
+    log.sample_rate = 0
+    with engine.connect() as conn:
+        for i in range(10):
+            conn.execute(text(f"SELECT {i}"))
+
+    entries = log.entries()
+    assert len(entries) == 5
+    assert entries[0]["statement"] == "SELECT 9"
+
+
+def test_executemany_shape(engine, log):
+    with engine.begin() as conn:
+        conn.execute(
+            models.ToDo.__table__.insert(),
+            [{"title": "a", "description": "b"}, {"title": "c", "description": "d"}],
+        )
+
+    insert = next(e for e in log.entries() if e["statement"].startswith("INSERT"))
+    assert insert["parameters"] == {"rows": 2, "row": ["str", "str", "int", "int"]}
+    assert insert["plan"] is None
+
+
+def test_route_is_recorded_and_served(engine, client):
+    threshold = slow_query_log.threshold
+    slow_query_log.threshold = 0
+    instrument_slow_queries(engine, slow_query_log)
+    try:
+        client.get("/api/todo/1")
+        response = client.get("/internal/slow_queries")
+    finally:
+        slow_query_log.threshold = threshold
+        slow_query_log.clear()
+
+    assert response.status_code == 200
+    routes = {entry["route"] for entry in response.json()["entries"]}
+    assert "/api/todo/{todo_id}" in routes
@@ -0,0 +1,37 @@
+import pytest
+from sql_app import models
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [models.ToDo(title="Test Todo", description="Test Description")]
+
+
+def test_get_todo_is_served_from_cache(client, statements):
+    first = client.get("/api/todo/1")
+    second = client.get("/api/todo/1")
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+    assert len(statements) == 1
+    assert client.get("/internal/cache").json()["hits"] == 1
+
+
+def test_mark_as_done_updates_cache(client):
+    client.get("/api/todo/1")
+    client.put("/api/1")
+    assert client.get("/api/todo/1").json()["is_done"] is True
+
+
+def test_delete_invalidates_cache(client):
+    client.get("/api/todo/1")
+    client.delete("/api/delete/1")
+    assert client.get("/api/todo/1").status_code == 404
+
+
+def test_created_todo_is_cached(client, statements):
+    response = client.post(
+        "/api/new_todo", json={"title": "New Todo", "description": "New Description"}
+    )
+    statements.clear()
+    assert client.get(f"/api/todo/{response.json()['id']}").json() == response.json()
+    assert statements == []
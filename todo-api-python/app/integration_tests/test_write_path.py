@@ -0,0 +1,57 @@
+import pytest
+from sql_app import crud, models
+
+
+@pytest.fixture(scope="function")
+def todos():
+    return [models.ToDo(title="Test Todo", description="Test Description")]
+
+
+def test_update_todo_status_single_round_trip(session, statements):
+    result = crud.update_todo_status(session, 1, is_done=True)
+    assert result.is_done
+    assert result.title == "Test Todo"
+    assert len(statements) == 1
+
+
+def test_update_todo_status_not_found(session, statements):
+    assert crud.update_todo_status(session, 999, is_done=True) is None
+    assert len(statements) == 1
+
+
+def test_delete_todo_single_round_trip(session, statements):
+    result = crud.delete_todo(session, 1)
+    assert result.title == "Test Todo"
+    assert len(statements) == 1
+    assert session.query(models.ToDo).count() == 0
+
+
+def test_delete_todo_not_found(session, statements):
+    assert crud.delete_todo(session, 999) is None
+    assert len(statements) == 1
+
+
+def test_mark_as_done_endpoint(client, statements):
+    response = client.put("/api/1")
+    assert response.status_code == 200
+    assert response.json()["is_done"] is True
+    assert len(statements) == 1
+
+
+def test_mark_as_done_not_found(client):
+    response = client.put("/api/999")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Todo not found"}
+
+
+def test_delete_endpoint(client, statements):
+    response = client.delete("/api/delete/1")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Test Todo"
+    assert len(statements) == 1
+
+
+def test_delete_endpoint_not_found(client):
+    response = client.delete("/api/delete/999")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "Todo not found"}
@@ -4,129 +4,800 @@ import sys
 path = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(path)
 
-from fastapi import Depends, FastAPI, HTTPException
-from sqlalchemy.orm import Session
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from typing import Optional, Union
+
+from anyio import to_thread
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from fastapi import status
 
-from sql_app import crud, models, schemas
-from sql_app.database import engine, get_db
+from sql_app import async_crud, crud, importer, schemas
+from sql_app.cache import todo_cache
+from sql_app.compression import CompressionMiddleware
+from sql_app.coalescer import (
+    async_status_updates,
+    async_todo_inserts,
+    status_updates,
+    todo_inserts,
+)
+from sql_app.etag import etag_matches, list_etag, not_modified, todo_etag
+from sql_app.metrics import (
+    METRICS_MULTIPROC_DIR,
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsMiddleware,
+    instrument_engine,
+    registry,
+)
+from sql_app.pagination import decode_cursor, encode_cursor
+from sql_app.replicas import ReadYourWritesMiddleware, reads_from_replica
+from sql_app.repository import TodoRepository
+from sql_app.schema import migrate_databases
+from sql_app.serializers import (
+    FastJSONResponse,
+    serialize_ndjson,
+    serialize_todo,
+    serialize_todos,
+    todo_to_dict,
+)
+from sql_app.database import (
+    SQLALCHEMY_BACKEND,
+    STORAGE_BACKEND,
+    THREADPOOL_SIZE,
+    USE_ASYNC_DB,
+    async_engine,
+    engine,
+    get_async_db,
+    get_async_read_db,
+    get_db,
+    get_pool_stats,
+    get_read_repository,
+    get_repository,
+    get_slow_queries,
+    replica_set,
+    shard_set,
+    slow_query_log,
+    warm_up,
+)
+from sql_app.warmup import warmup
+
+
+async def track_route(request: Request):
+    """
+    Makes the route template of the request known to the slow-query log.
+
+    Runs as an async dependency, so the value is set in the context of the request and
+    copied into the threadpool along with it.
+    """
+    route = request.scope.get("route")
+    slow_query_log.route.set(getattr(route, "path", None))
+
+
+app = FastAPI(dependencies=[Depends(track_route)])
+
 
-app = FastAPI()
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ReadYourWritesMiddleware, replica_set=replica_set)
+app.add_middleware(MetricsMiddleware)
+router = APIRouter()
+async_router = APIRouter()
+
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+for replica in replica_set.replicas:
+    instrument_engine(getattr(replica.engine, "sync_engine", replica.engine))
+for shard in shard_set.shards:
+    instrument_engine(shard.engine)
 
 TODO_NOT_FOUND = "Todo not found"
+INVALID_CURSOR = "Invalid cursor"
+BATCH_TOO_LARGE = "Batch too large"
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def parse_cursor(after: str) -> int:
+    """
+    Turns the `after` query parameter into the ID the next page starts after.
+
+    Parameters:
+        after (str): The cursor of the previous page, or an empty string for the first page.
+
+    Returns:
+        int: The ID after which the page starts.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    try:
+        return decode_cursor(after) if after else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail=INVALID_CURSOR)
+
+
+def make_page(todos: list, limit: int) -> dict:
+    """
+    Builds a cursor page from todos fetched with one row more than the page limit.
+
+    Parameters:
+        todos (list): Up to limit + 1 todo items in ascending ID order.
+        limit (int): The page size requested by the client.
+
+    Returns:
+        dict: The page with its `items` and `next_cursor`.
+    """
+    has_more = 0 < limit < len(todos)
+    next_cursor = encode_cursor(todos[limit - 1].id) if has_more else None
+    items = [todo_to_dict(todo) for todo in todos[:limit]]
+    return {"items": items, "next_cursor": next_cursor}
 
 
-@app.post("/api/new_todo", response_model=schemas.ToDo)
-def create_todo(todo: schemas.ToDoCreate, db: Session = Depends(get_db)):
+@router.post("/api/new_todo", response_model=schemas.ToDo)
+def create_todo(
+    todo: schemas.ToDoCreate, repository: TodoRepository = Depends(get_repository)
+):
     """
     Creates a new todo item.
 
     Parameters:
     - todo: schemas.ToDoCreate: The todo item to be created.
-    - db: Session = Depends(get_db): The database session.
+    - repository: TodoRepository = Depends(get_repository): The storage of the todos.
 
     Returns:
-    - JSONResponse: The response indicating successful creation of the todo item.
+    - FastJSONResponse: The response indicating successful creation of the todo item.
     """
-    return JSONResponse(
+    if todo_inserts.enabled:
+        db_todo = todo_inserts.submit(repository, todo)
+    else:
+        db_todo = repository.create_todo(todo=todo)
+    content = serialize_todo(db_todo)
+    todo_cache.set(db_todo.id, (todo_etag(db_todo.id, db_todo.version), content))
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content=content)
+
+
+@router.post("/api/new_todos", response_model=list[schemas.ToDo])
+def create_todos(
+    todos: list[schemas.ToDoCreate],
+    repository: TodoRepository = Depends(get_repository),
+):
+    """
+    Creates several todo items in one transaction.
+
+    Parameters:
+    - todos: list[schemas.ToDoCreate]: The todo items to be created.
+    - repository: TodoRepository = Depends(get_repository): The storage of the todos.
+
+    Returns:
+    - FastJSONResponse: The response containing the created todo items.
+
+    Raises:
+    - HTTPException: If more than MAX_BATCH_SIZE todo items are sent.
+    """
+    if len(todos) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=BATCH_TOO_LARGE,
+        )
+    return FastJSONResponse(
         status_code=status.HTTP_201_CREATED,
-        content=jsonable_encoder(crud.create_todo(db=db, todo=todo)),
+        content=serialize_todos(repository.create_todos(todos=todos)),
     )
 
 
-@app.get("/api", response_model=list[schemas.ToDo])
-def get_todos(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.get("/api", response_model=Union[list[schemas.ToDo], schemas.ToDoPage])
+def get_todos(
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    title_prefix: Optional[str] = None,
+    total: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    repository: TodoRepository = Depends(get_read_repository),
+):
     """
     Retrieves a list of todos from the database based on the specified skip and limit parameters.
 
+    When the `after` parameter is present, cursor-based pagination is used instead and a
+    page object with `items` and `next_cursor` is returned. Pass an empty `after` to
+    request the first page, then the `next_cursor` of each page to request the next one.
+
+    The `is_done` and `title_prefix` filters apply in both modes. With `total`, the number
+    of todos matching the filters is returned in the X-Total-Count header.
+
+    The ETag of the response is derived from the modification counter of the todos
+    table, so a matching If-None-Match is answered with 304 after a single tiny query.
+
     Parameters:
         skip (int): The number of todos to skip. Defaults to 0.
         limit (int): The maximum number of todos to retrieve. Defaults to 100.
-        db (Session, optional): The database session. Defaults to Depends(get_db).
+        after (str, optional): Cursor of the previous page. Defaults to None.
+        is_done (bool, optional): Only return todos with this status. Defaults to None.
+        title_prefix (str, optional): Only return todos whose title starts with this string. Defaults to None.
+        total (bool): Whether to count the matching todos. Defaults to False.
+        if_none_match (str, optional): The If-None-Match header. Defaults to None.
+        repository (TodoRepository, optional): The storage of the todos. Defaults to Depends(get_read_repository).
+
+    Returns:
+        FastJSONResponse: The response containing the list of todos, or a page of todos in cursor mode.
+
+    Raises:
+        HTTPException: If the cursor is malformed.
+    """
+    # The counter is read before the todos, so the ETag can only ever be older than the data.
+    etag = list_etag(repository.get_table_version())
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    filters = {"is_done": is_done, "title_prefix": title_prefix}
+    headers = {"ETag": etag}
+    if total:
+        headers[TOTAL_COUNT_HEADER] = str(repository.count_todos(**filters))
+
+    if after is None:
+        todos = repository.get_todos(skip=skip, limit=limit, **filters)
+        return FastJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content=serialize_todos(todos),
+            headers=headers,
+        )
+
+    # Fetch one extra row to know whether another page follows without a second query.
+    todos = repository.get_todos(limit=limit + 1, after_id=parse_cursor(after), **filters)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=make_page(todos, limit),
+        headers=headers,
+    )
+
+
+@router.get("/api/search", response_model=list[schemas.ToDo])
+def search_todos(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    repository: TodoRepository = Depends(get_read_repository),
+):
+    """
+    Searches todos by the words of their title and description.
+
+    Parameters:
+        q (str): The words to search for. All of them must match.
+        skip (int): The number of results to skip. Defaults to 0.
+        limit (int): The maximum number of results to retrieve. Defaults to 20.
+        repository (TodoRepository, optional): The storage of the todos. Defaults to Depends(get_read_repository).
+
+    Returns:
+        FastJSONResponse: The matching todos, most relevant first.
+    """
+    todos = repository.search_todos(q, skip=skip, limit=limit)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=serialize_todos(todos)
+    )
+
+
+@router.get("/api/export")
+def export_todos(
+    batch_size: int = Query(crud.EXPORT_BATCH_SIZE, ge=1, le=10000),
+    repository: TodoRepository = Depends(get_read_repository),
+):
+    """
+    Streams all todos as newline-delimited JSON, ordered by ID.
+
+    Rows are read in batches through a server-side cursor and each batch is written as
+    one chunk. The next batch is only fetched once the previous chunk has been handed to
+    the server, so a slow client slows down the export instead of filling memory.
+
+    Parameters:
+        batch_size (int): The number of todos read and written per chunk. Defaults to 1000.
+        repository (TodoRepository, optional): The storage of the todos. Defaults to Depends(get_read_repository).
 
     Returns:
-        JSONResponse: The response containing the list of todos.
+        StreamingResponse: The NDJSON stream of all todos.
+    """
+
+    def export_lines():
+        for batch in repository.stream_todos(batch_size=batch_size):
+            yield serialize_ndjson(batch)
+
+    return StreamingResponse(export_lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.post("/api/import", status_code=status.HTTP_201_CREATED)
+async def import_todos(
+    request: Request,
+    batch_size: int = Query(importer.IMPORT_BATCH_SIZE, ge=1, le=100000),
+    repository: TodoRepository = Depends(get_repository),
+):
+    """
+    Imports todos from a JSON array or NDJSON request body in one transaction.
+
+    The body is parsed incrementally while it is received and written in batches, with
+    COPY on Postgres. The handler itself is async so that it can read the body as a
+    stream; the blocking database calls are handed to the threadpool.
+
+    Parameters:
+        request (Request): The request whose body holds the todos.
+        batch_size (int): The number of rows written per batch. Defaults to 5000.
+        repository (TodoRepository, optional): The storage of the todos. Defaults to Depends(get_repository).
+
+    Returns:
+        dict: The number of imported todos, the duration and rows per second.
 
     Raises:
-        None
+        HTTPException: If the body is not a valid list of todos. Nothing is imported then.
     """
-    todos = crud.get_todos(db, skip=skip, limit=limit)
-    return JSONResponse(status_code=status.HTTP_200_OK, content=jsonable_encoder(todos))
 
+    async def load(rows):
+        await run_in_threadpool(repository.load_batch, rows)
+
+    async def commit():
+        await run_in_threadpool(repository.commit)
+
+    async def rollback():
+        await run_in_threadpool(repository.rollback)
 
-@app.get("/api/todo/{todo_id}", response_model=schemas.ToDo)
-def get_todo(todo_id: int, db: Session = Depends(get_db)):
+    try:
+        return await importer.import_body(
+            request.stream(), load, commit, rollback, batch_size=batch_size
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@router.get("/api/todo/{todo_id}", response_model=schemas.ToDo)
+def get_todo(
+    todo_id: int,
+    if_none_match: Optional[str] = Header(None),
+    repository: TodoRepository = Depends(get_read_repository),
+):
     """
     Retrieves a todo item from the database based on the specified todo_id.
 
+    Answers 304 when If-None-Match carries the current ETag, which is checked against
+    the cache or, on a cache miss, against the version column alone.
+
     Parameters:
         - todo_id (int): The ID of the todo item to retrieve.
-        - db (Session, optional): The database session. Defaults to Depends(get_db).
+        - if_none_match (str, optional): The If-None-Match header. Defaults to None.
+        - repository (TodoRepository, optional): The storage of the todos. Defaults to Depends(get_read_repository).
 
     Returns:
-        - JSONResponse: The response containing the retrieved todo item.
+        - FastJSONResponse: The response containing the retrieved todo item.
 
     Raises:
         - HTTPException: If the todo item with the specified ID is not found.
     """
-    db_todo = crud.get_todo(db, todo_id=todo_id)
-    if db_todo is None:
-        raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
-    return JSONResponse(
-        status_code=status.HTTP_200_OK, content=jsonable_encoder(db_todo)
+    cached = todo_cache.get(todo_id)
+    if cached is None and if_none_match:
+        version = repository.get_todo_version(todo_id=todo_id)
+        if version is not None and etag_matches(
+            if_none_match, todo_etag(todo_id, version)
+        ):
+            return not_modified(todo_etag(todo_id, version))
+    if cached is None:
+        token = todo_cache.token()
+        db_todo = repository.get_todo(todo_id=todo_id)
+        if db_todo is None:
+            raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
+        cached = (todo_etag(db_todo.id, db_todo.version), serialize_todo(db_todo))
+        # A lagging replica could put back a todo that a write just invalidated.
+        if not repository.reads_from_replica:
+            todo_cache.fill(todo_id, cached, token)
+    etag, content = cached
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=content, headers={"ETag": etag}
     )
 
 
-@app.put("/api/{todo_id}", response_model=schemas.ToDo)
-def mark_as_done(todo_id: int, db: Session = Depends(get_db)):
+@router.put("/api/{todo_id}", response_model=schemas.ToDo)
+def mark_as_done(todo_id: int, repository: TodoRepository = Depends(get_repository)):
     """
     Marks a todo item as done in the database.
 
     Parameters:
         - todo_id (int): The ID of the todo item to mark as done.
-        - db (Session, optional): The database session. Defaults to Depends(get_db).
+        - repository (TodoRepository, optional): The storage of the todos. Defaults to Depends(get_repository).
 
     Returns:
-        - JSONResponse: The response indicating successful marking of the todo item as done.
+        - FastJSONResponse: The response indicating successful marking of the todo item as done.
 
     Raises:
         - HTTPException: If the todo item with the specified ID is not found.
     """
-    db_todo = crud.update_todo_status(db, todo_id=todo_id, is_done=True)
+    if status_updates.enabled:
+        db_todo = status_updates.submit(repository, (todo_id, True))
+    else:
+        db_todo = repository.update_todo_status(todo_id=todo_id, is_done=True)
+    todo_cache.invalidate(todo_id)
     if db_todo is None:
         raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
-    return JSONResponse(
-        status_code=status.HTTP_200_OK, content=jsonable_encoder(db_todo)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=serialize_todo(db_todo)
     )
 
 
-@app.delete("/api/delete/{todo_id}", response_model=schemas.ToDo)
-def delete(todo_id: int, db: Session = Depends(get_db)):
+@router.delete("/api/delete/{todo_id}", response_model=schemas.ToDo)
+def delete(todo_id: int, repository: TodoRepository = Depends(get_repository)):
     """
     Delete a todo item from the database.
 
     Parameters:
         - todo_id (int): The ID of the todo item to delete.
-        - db (Session, optional): The database session. Defaults to Depends(get_db).
+        - repository (TodoRepository, optional): The storage of the todos. Defaults to Depends(get_repository).
 
     Returns:
-        - JSONResponse: The response indicating the deleted todo item.
+        - FastJSONResponse: The response indicating the deleted todo item.
 
     Raises:
         - HTTPException: If the todo item with the specified ID is not found.
     """
-    db_todo = crud.delete_todo(db, todo_id=todo_id)
+    db_todo = repository.delete_todo(todo_id=todo_id)
+    todo_cache.invalidate(todo_id)
+    if db_todo is None:
+        raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=serialize_todo(db_todo)
+    )
+
+
+@async_router.post("/api/new_todo", response_model=schemas.ToDo)
+async def create_todo_async(
+    todo: schemas.ToDoCreate, db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Creates a new todo item, see create_todo.
+    """
+    if async_todo_inserts.enabled:
+        db_todo = await async_todo_inserts.submit(db, todo)
+    else:
+        db_todo = await async_crud.create_todo(db=db, todo=todo)
+    content = serialize_todo(db_todo)
+    todo_cache.set(db_todo.id, (todo_etag(db_todo.id, db_todo.version), content))
+    return FastJSONResponse(status_code=status.HTTP_201_CREATED, content=content)
+
+
+@async_router.post("/api/new_todos", response_model=list[schemas.ToDo])
+async def create_todos_async(
+    todos: list[schemas.ToDoCreate], db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Creates several todo items in one transaction, see create_todos.
+    """
+    if len(todos) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=BATCH_TOO_LARGE,
+        )
+    return FastJSONResponse(
+        status_code=status.HTTP_201_CREATED,
+        content=serialize_todos(await async_crud.create_todos(db=db, todos=todos)),
+    )
+
+
+@async_router.get(
+    "/api", response_model=Union[list[schemas.ToDo], schemas.ToDoPage]
+)
+async def get_todos_async(
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    is_done: Optional[bool] = None,
+    title_prefix: Optional[str] = None,
+    total: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Retrieves a list or a cursor page of todos, see get_todos.
+    """
+    etag = list_etag(await async_crud.get_table_version(db))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    filters = {"is_done": is_done, "title_prefix": title_prefix}
+    headers = {"ETag": etag}
+    if total:
+        headers[TOTAL_COUNT_HEADER] = str(await async_crud.count_todos(db, **filters))
+
+    if after is None:
+        todos = await async_crud.get_todos(db, skip=skip, limit=limit, **filters)
+        return FastJSONResponse(
+            status_code=status.HTTP_200_OK,
+            content=serialize_todos(todos),
+            headers=headers,
+        )
+
+    todos = await async_crud.get_todos(
+        db, limit=limit + 1, after_id=parse_cursor(after), **filters
+    )
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK,
+        content=make_page(todos, limit),
+        headers=headers,
+    )
+
+
+@async_router.get("/api/search", response_model=list[schemas.ToDo])
+async def search_todos_async(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Searches todos by the words of their title and description, see search_todos.
+    """
+    todos = await async_crud.search_todos(db, q, skip=skip, limit=limit)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=serialize_todos(todos)
+    )
+
+
+@async_router.get("/api/export")
+async def export_todos_async(
+    batch_size: int = Query(crud.EXPORT_BATCH_SIZE, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Streams all todos as newline-delimited JSON, see export_todos.
+    """
+
+    async def export_lines():
+        async for batch in async_crud.stream_todos(db, batch_size=batch_size):
+            yield serialize_ndjson(batch)
+
+    return StreamingResponse(export_lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@async_router.post("/api/import", status_code=status.HTTP_201_CREATED)
+async def import_todos_async(
+    request: Request,
+    batch_size: int = Query(importer.IMPORT_BATCH_SIZE, ge=1, le=100000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Imports todos from a JSON array or NDJSON request body, see import_todos.
+    """
+
+    async def load(rows):
+        await importer.load_batch_async(db, rows)
+
+    try:
+        return await importer.import_body(
+            request.stream(), load, db.commit, db.rollback, batch_size=batch_size
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+
+@async_router.get("/api/todo/{todo_id}", response_model=schemas.ToDo)
+async def get_todo_async(
+    todo_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Retrieves a todo item by its ID, see get_todo.
+    """
+    cached = todo_cache.get(todo_id)
+    if cached is None and if_none_match:
+        version = await async_crud.get_todo_version(db, todo_id=todo_id)
+        if version is not None and etag_matches(
+            if_none_match, todo_etag(todo_id, version)
+        ):
+            return not_modified(todo_etag(todo_id, version))
+    if cached is None:
+        token = todo_cache.token()
+        db_todo = await async_crud.get_todo(db, todo_id=todo_id)
+        if db_todo is None:
+            raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
+        cached = (todo_etag(db_todo.id, db_todo.version), serialize_todo(db_todo))
+        # A lagging replica could put back a todo that a write just invalidated.
+        if not reads_from_replica(db):
+            todo_cache.fill(todo_id, cached, token)
+    etag, content = cached
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=content, headers={"ETag": etag}
+    )
+
+
+@async_router.put("/api/{todo_id}", response_model=schemas.ToDo)
+async def mark_as_done_async(todo_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Marks a todo item as done, see mark_as_done.
+    """
+    if async_status_updates.enabled:
+        db_todo = await async_status_updates.submit(db, (todo_id, True))
+    else:
+        db_todo = await async_crud.update_todo_status(db, todo_id=todo_id, is_done=True)
+    todo_cache.invalidate(todo_id)
+    if db_todo is None:
+        raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=serialize_todo(db_todo)
+    )
+
+
+@async_router.delete("/api/delete/{todo_id}", response_model=schemas.ToDo)
+async def delete_async(todo_id: int, db: AsyncSession = Depends(get_async_db)):
+    """
+    Delete a todo item, see delete.
+    """
+    db_todo = await async_crud.delete_todo(db, todo_id=todo_id)
+    todo_cache.invalidate(todo_id)
     if db_todo is None:
         raise HTTPException(status_code=404, detail=TODO_NOT_FOUND)
-    return JSONResponse(
-        status_code=status.HTTP_200_OK, content=jsonable_encoder(db_todo)
+    return FastJSONResponse(
+        status_code=status.HTTP_200_OK, content=serialize_todo(db_todo)
+    )
+
+
+@app.on_event("startup")
+async def size_threadpool():
+    """
+    Sets the number of threads running the sync handlers to THREADPOOL_SIZE, if given.
+    """
+    if THREADPOOL_SIZE > 0:
+        to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+
+@app.on_event("startup")
+async def start_warmup():
+    """
+    Starts filling the connection pools and running the hot queries, if WARMUP_ENABLED.
+    """
+    warmup.start(lambda progress: warm_up(progress, use_async=use_async_router))
+
+
+@app.on_event("startup")
+async def start_metrics_writer():
+    """
+    Starts writing the metrics of this worker to METRICS_MULTIPROC_DIR, if set.
+    """
+    if METRICS_MULTIPROC_DIR:
+        registry.start_writing(METRICS_MULTIPROC_DIR)
+
+
+@app.on_event("shutdown")
+async def write_metrics():
+    """
+    Writes the last metrics of this worker to METRICS_MULTIPROC_DIR, if set.
+    """
+    if METRICS_MULTIPROC_DIR:
+        registry.write(METRICS_MULTIPROC_DIR)
+
+
+def of_this_worker(stats: dict) -> dict:
+    """
+    Adds the process ID to the stats of an /internal endpoint.
+
+    Every worker process keeps its own stats, and each request is served by any one of them.
+    """
+    return {"pid": os.getpid(), **stats}
+
+
+@app.get("/ready")
+def ready():
+    """
+    The readiness probe: succeeds once the process has started and, if enabled, warmed up.
+
+    Returns:
+        JSONResponse: The state of the warmup, with status 200 when ready and 503 before.
+    """
+    code = status.HTTP_200_OK if warmup.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return FastJSONResponse(status_code=code, content=warmup.stats())
+
+
+@app.get("/internal/cache")
+def cache_stats():
+    """
+    Returns the counters of the todo cache.
+
+    Returns:
+        dict: The size, capacity and hit/miss/eviction counters of the cache.
+    """
+    return of_this_worker(todo_cache.stats())
+
+
+@app.get("/internal/pool")
+def pool_stats():
+    """
+    Returns the state and telemetry of the database connection pools.
+
+    Returns:
+        dict: Checked-out and overflow connections, checkout wait times and connect latencies
+            of the pool serving requests, and of every pool by role under "engines".
+    """
+    return of_this_worker(get_pool_stats())
+
+
+@app.get("/internal/coalescer")
+def coalescer_stats():
+    """
+    Returns the settings and counters of the coalescers of status updates and inserts.
+
+    Returns:
+        dict: Whether each coalescer is enabled, its window and batch limit and the batches committed.
+    """
+    if USE_ASYNC_DB:
+        return of_this_worker(
+            {
+                "status_updates": async_status_updates.stats(),
+                "inserts": async_todo_inserts.stats(),
+            }
+        )
+    return of_this_worker(
+        {"status_updates": status_updates.stats(), "inserts": todo_inserts.stats()}
+    )
+
+
+@app.get("/internal/replicas")
+def replica_stats():
+    """
+    Returns the read routing settings and the health and load of every read replica.
+
+    Returns:
+        dict: The strategy, read-your-writes window, fallbacks to the primary and per-replica counters.
+    """
+    return of_this_worker(replica_set.stats())
+
+
+@app.get("/internal/shards")
+def shard_stats():
+    """
+    Returns the shards of the todos table and the sessions opened on each.
+
+    Returns:
+        dict: The fan-out limit and the ID range, reads and writes of every shard.
+    """
+    return of_this_worker(shard_set.stats())
+
+
+@app.get("/internal/slow_queries")
+def slow_queries():
+    """
+    Returns the statements that exceeded the slow-query threshold, with sampled plans.
+
+    Returns:
+        dict: The settings of the slow-query log and its entries, most recent first.
+    """
+    return of_this_worker(get_slow_queries())
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Returns the request and database metrics in the Prometheus text format.
+
+    Returns:
+        Response: Per-route latency histograms, in-flight requests and SQL statement counts and times,
+            of all worker processes when METRICS_MULTIPROC_DIR is set.
+    """
+    return Response(
+        content=registry.render(METRICS_MULTIPROC_DIR), media_type=PROMETHEUS_CONTENT_TYPE
     )
 
 
+# Handlers of the sync router run in the threadpool, those of the async router on the event loop.
+# Only the sync router goes through a repository, so it serves the sharded and in-memory backends.
+use_async_router = (
+    USE_ASYNC_DB and STORAGE_BACKEND == SQLALCHEMY_BACKEND and not shard_set.shards
+)
+app.include_router(async_router if use_async_router else router)
+
+
+# A single process for development. In production, run gunicorn with gunicorn.conf.py.
 if __name__ == "__main__":
-    models.Base.metadata.create_all(bind=engine)
+    migrate_databases()
     import uvicorn
 
     uvicorn.run(app, host="127.0.0.1", port=8000)
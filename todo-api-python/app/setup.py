@@ -14,6 +14,12 @@ setup(
         "uvicorn==0.21.1",
         "sqlalchemy==2.0.9",
         "psycopg2-binary==2.9.5",
+        "asyncpg==0.29.0",
+        "aiosqlite==0.19.0",
+        "orjson==3.9.10",
+        "brotli==1.2.0",
+        "zstandard==0.25.0",
+        "gunicorn==26.2.0",
         "wait-for-it==2.2.0",
         "pytest==7.2.2",
         "httpx==0.23.3",
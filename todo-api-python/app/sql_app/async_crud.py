@@ -0,0 +1,348 @@
+from typing import Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, schemas
+
+
+async def get_todo(db: AsyncSession, todo_id: int):
+    """
+    Retrieves a todo item from the database based on the specified todo_id.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        todo_id (int): The ID of the todo item to retrieve.
+
+    Returns:
+        ToDo | None: The todo item with the specified ID, or None if not found.
+    """
+    result = await db.execute(select(models.ToDo).where(models.ToDo.id == todo_id))
+    return result.scalars().first()
+
+
+async def get_todo_version(db: AsyncSession, todo_id: int):
+    """
+    Retrieves only the version of a todo item, see crud.get_todo_version.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        todo_id (int): The ID of the todo item.
+
+    Returns:
+        int | None: The version of the todo item, or None if not found.
+    """
+    result = await db.execute(
+        select(models.ToDo.version).where(models.ToDo.id == todo_id)
+    )
+    return result.scalar()
+
+
+async def get_table_version(db: AsyncSession) -> int:
+    """
+    Retrieves the modification counter of the todos table, see crud.get_table_version.
+
+    Parameters:
+        db (AsyncSession): The database session.
+
+    Returns:
+        int: A number that grows with every write to the todos table.
+    """
+    result = await db.execute(
+        select(func.coalesce(func.sum(models.TodoTableVersion.version), 0))
+    )
+    return result.scalar()
+
+
+async def get_todos(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    is_done: Optional[bool] = None,
+    title_prefix: Optional[str] = None,
+):
+    """
+    Retrieves a list of todos from the database, see crud.get_todos.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        skip (int): The number of todos to skip. Ignored when after_id is given. Defaults to 0.
+        limit (int): The maximum number of todos to retrieve. Defaults to 100.
+        after_id (int | None): Only return todos with an ID greater than this one. Defaults to None.
+        is_done (bool | None): Only return todos with this status. Defaults to None.
+        title_prefix (str | None): Only return todos whose title starts with this string. Defaults to None.
+
+    Returns:
+        list: The list of todos retrieved from the database.
+    """
+    query = (
+        select(models.ToDo)
+        .where(*crud._todo_filters(is_done, title_prefix))
+        .order_by(models.ToDo.id)
+    )
+    if after_id is not None:
+        query = query.where(models.ToDo.id > after_id)
+    else:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+
+async def count_todos(
+    db: AsyncSession, is_done: Optional[bool] = None, title_prefix: Optional[str] = None
+) -> int:
+    """
+    Counts the todos matching the list filters, see crud.count_todos.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        is_done (bool | None): Only count todos with this status. Defaults to None.
+        title_prefix (str | None): Only count todos whose title starts with this string. Defaults to None.
+
+    Returns:
+        int: The number of matching todos.
+    """
+    query = select(func.count()).select_from(models.ToDo).where(
+        *crud._todo_filters(is_done, title_prefix)
+    )
+    result = await db.execute(query)
+    return result.scalar()
+
+
+async def search_todos(db: AsyncSession, text: str, skip: int = 0, limit: int = 20):
+    """
+    Searches todos by the words of their title and description, see crud.search_todos.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        text (str): The words to search for.
+        skip (int): The number of results to skip. Defaults to 0.
+        limit (int): The maximum number of results to retrieve. Defaults to 20.
+
+    Returns:
+        list: The matching todos, ordered by relevance.
+    """
+    if not text.split():
+        return []
+    dialect = db.sync_session.get_bind().dialect.name
+    result = await db.execute(crud._search_statement(dialect, text, skip, limit))
+    return result.scalars().all()
+
+
+async def stream_todos(db: AsyncSession, batch_size: int = crud.EXPORT_BATCH_SIZE):
+    """
+    Streams all todos from the database in batches, see crud.stream_todos.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        batch_size (int): The number of rows fetched per batch. Defaults to 1000.
+
+    Yields:
+        list[Row]: The next batch of todo rows.
+    """
+    table = models.ToDo.__table__
+    statement = (
+        select(table)
+        .order_by(table.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await db.stream(statement)
+    try:
+        async for partition in result.partitions(batch_size):
+            yield partition
+    finally:
+        await result.close()
+
+
+async def create_todo(db: AsyncSession, todo: schemas.ToDoCreate):
+    """
+    Creates a new todo item in the database.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        todo (schemas.ToDoCreate): The todo item to be created.
+
+    Returns:
+        models.ToDo: The newly created todo item.
+    """
+    db_todo = models.ToDo(title=todo.title, description=todo.description, is_done=False)
+    db.add(db_todo)
+    await db.commit()
+    await db.refresh(db_todo)
+    return db_todo
+
+
+async def create_todos(
+    db: AsyncSession,
+    todos: list[schemas.ToDoCreate],
+    chunk_size: int = crud.INSERT_CHUNK_SIZE,
+):
+    """
+    Creates several todo items in the database within a single transaction, see crud.create_todos.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        todos (list[schemas.ToDoCreate]): The todo items to be created.
+        chunk_size (int): The maximum number of rows per INSERT statement. Defaults to 500.
+
+    Returns:
+        list[schemas.ToDo]: The newly created todo items, in the order they were given.
+    """
+    rows = [
+        {"title": todo.title, "description": todo.description, "is_done": False}
+        for todo in todos
+    ]
+    if not crud._supports_returning(db.sync_session, "insert"):
+        db_todos = [models.ToDo(**row) for row in rows]
+        db.add_all(db_todos)
+        await db.flush()
+        created = [
+            schemas.ToDo(
+                id=db_todo.id,
+                title=db_todo.title,
+                description=db_todo.description,
+                is_done=db_todo.is_done,
+            )
+            for db_todo in db_todos
+        ]
+        await db.commit()
+        return created
+
+    created = []
+    for start in range(0, len(rows), chunk_size):
+        statement, parameters = crud._insert_returning(
+            db.sync_session, rows[start : start + chunk_size]
+        )
+        result = await db.execute(statement, parameters)
+        created.extend(crud._to_schema(row) for row in crud._in_given_order(result, parameters))
+    await db.commit()
+    return created
+
+
+async def _insert_rows(db: AsyncSession, rows: list) -> list:
+    """
+    Inserts rows with one multi-row INSERT ... RETURNING, see crud._insert_rows.
+    """
+    table = models.ToDo.__table__
+    if crud._supports_returning(db.sync_session, "insert"):
+        statement, parameters = crud._insert_returning(db.sync_session, rows)
+        return crud._in_given_order(await db.execute(statement, parameters), parameters)
+    db_todos = [models.ToDo(**row) for row in rows]
+    db.add_all(db_todos)
+    await db.flush()
+    return [
+        models.ToDo(**{column.name: getattr(db_todo, column.name) for column in table.c})
+        for db_todo in db_todos
+    ]
+
+
+async def insert_todos(db: AsyncSession, todos: list[schemas.ToDoCreate]) -> list:
+    """
+    Creates the todo items of independent requests, isolating the rows that fail, see crud.insert_todos.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        todos (list[schemas.ToDoCreate]): The todo items to be created.
+
+    Returns:
+        list: For every todo item, in order, the created row or the error that prevented it.
+    """
+    rows = [
+        {"title": todo.title, "description": todo.description, "is_done": False}
+        for todo in todos
+    ]
+    try:
+        created = await _insert_rows(db, rows)
+        await db.commit()
+        return created
+    except crud.ROW_ERRORS as error:
+        await db.rollback()
+        if getattr(error, "connection_invalidated", False) or len(rows) == 1:
+            return [error] * len(rows)
+    results = []
+    for row in rows:
+        try:
+            results.extend(await _insert_rows(db, [row]))
+            await db.commit()
+        except crud.ROW_ERRORS as error:
+            await db.rollback()
+            results.append(error)
+    return results
+
+
+async def update_todo_status(db: AsyncSession, todo_id: int, is_done: bool):
+    """
+    Updates the status of a todo item in the database, see crud.update_todo_status.
+
+    Parameters:
+        - db (AsyncSession): The database session.
+        - todo_id (int): The ID of the todo item to update.
+        - is_done (bool): The new status of the todo item.
+
+    Returns:
+        - schemas.ToDo | None: The updated todo item, or None if not found.
+    """
+    table = models.ToDo.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == todo_id)
+        .values(is_done=is_done, version=table.c.version + 1)
+    )
+    if crud._supports_returning(db.sync_session, "update"):
+        row = (await db.execute(statement.returning(*table.c))).first()
+    elif (await db.execute(statement)).rowcount:
+        row = (await db.execute(select(table).where(table.c.id == todo_id))).first()
+    else:
+        row = None
+    await db.commit()
+    return crud._to_schema(row) if row is not None else None
+
+
+async def update_todos_status(db: AsyncSession, updates: dict) -> dict:
+    """
+    Updates the status of several todo items within a single transaction, see crud.update_todos_status.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        updates (dict[int, bool]): The new status by todo ID.
+
+    Returns:
+        dict[int, schemas.ToDo]: The updated todo items by ID. IDs that were not found are missing.
+    """
+    table = models.ToDo.__table__
+    dialect = db.sync_session.get_bind().dialect.name
+    returning = crud._supports_returning(db.sync_session, "update")
+    updated = {}
+    for statement, todo_ids in crud._status_update_statements(dialect, updates):
+        if returning:
+            rows = await db.execute(statement.returning(*table.c))
+        else:
+            await db.execute(statement)
+            rows = await db.execute(select(table).where(crud._id_in(dialect, todo_ids)))
+        updated.update((row.id, crud._to_schema(row)) for row in rows)
+    await db.commit()
+    return updated
+
+
+async def delete_todo(db: AsyncSession, todo_id: int):
+    """
+    Deletes a todo item from the database, see crud.delete_todo.
+
+    Parameters:
+        - db (AsyncSession): The database session.
+        - todo_id (int): The ID of the todo item to delete.
+
+    Returns:
+        - schemas.ToDo | None: The deleted todo item, or None if not found.
+    """
+    table = models.ToDo.__table__
+    statement = delete(table).where(table.c.id == todo_id)
+    if crud._supports_returning(db.sync_session, "delete"):
+        row = (await db.execute(statement.returning(*table.c))).first()
+    else:
+        row = (await db.execute(select(table).where(table.c.id == todo_id))).first()
+        if row is not None:
+            await db.execute(statement)
+    await db.commit()
+    return crud._to_schema(row) if row is not None else None
@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TodoCache:
+    """
+    A bounded, thread-safe LRU cache with a time-to-live for serialized todo items.
+
+    An entry is the (ETag, JSON body bytes) tuple of the response for one todo item, as
+    built by serialize_todo and todo_etag, so a hit is answered without serializing.
+
+    Entries are evicted when the cache is full (least recently used first) or when they
+    are older than ttl seconds. The TTL bounds how long another worker process can serve
+    a stale todo, as invalidation only reaches the cache of the process handling the write.
+
+    Attributes:
+        maxsize (int): The maximum number of todos kept in the cache.
+        ttl (float): The number of seconds an entry stays valid.
+        enabled (bool): Whether the cache stores and returns entries at all.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that had to go to the database.
+        evictions (int): The number of entries dropped because the cache was full or expired.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0, enabled: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled and maxsize > 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every write so that a read started before it cannot cache stale data.
+        self._generation = 0
+
+    def get(self, todo_id: int) -> Optional[tuple]:
+        """
+        Looks up a serialized todo item.
+
+        Parameters:
+            todo_id (int): The ID of the todo item.
+
+        Returns:
+            tuple[str, bytes] | None: The ETag and JSON body of the todo item, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(todo_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[todo_id]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(todo_id)
+            self.hits += 1
+            return entry[1]
+
+    def token(self) -> int:
+        """
+        Returns a token to pass to fill once the todo item has been read from the database.
+
+        Returns:
+            int: The current write generation.
+        """
+        return self._generation
+
+    def fill(self, todo_id: int, todo: tuple, token: int):
+        """
+        Stores a todo item read from the database, unless a write happened since token was taken.
+
+        Parameters:
+            todo_id (int): The ID of the todo item.
+            todo (tuple[str, bytes]): The ETag and JSON body of the todo item.
+            token (int): The token returned by token before the database read.
+        """
+        with self._lock:
+            if token == self._generation:
+                self._store(todo_id, todo)
+
+    def set(self, todo_id: int, todo: tuple):
+        """
+        Stores the new state of a todo item after a write.
+
+        Parameters:
+            todo_id (int): The ID of the todo item.
+            todo (tuple[str, bytes]): The ETag and JSON body of the todo item.
+        """
+        with self._lock:
+            self._generation += 1
+            self._store(todo_id, todo)
+
+    def invalidate(self, todo_id: int):
+        """
+        Removes a todo item from the cache after a write.
+
+        Parameters:
+            todo_id (int): The ID of the todo item.
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(todo_id, None)
+
+    def _store(self, todo_id: int, todo: tuple):
+        if not self.enabled:
+            return
+        self._entries[todo_id] = (time.monotonic() + self.ttl, todo)
+        self._entries.move_to_end(todo_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Removes all entries and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: The size, capacity and hit/miss/eviction counters of the cache.
+        """
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+todo_cache = TodoCache(
+    maxsize=int(os.getenv("TODO_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("TODO_CACHE_TTL", "30")),
+    enabled=os.getenv("TODO_CACHE_ENABLED", "True").lower() in ("true", "1", "t"),
+)
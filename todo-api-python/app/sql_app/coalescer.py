@@ -0,0 +1,284 @@
+import asyncio
+import os
+import threading
+
+from . import async_crud
+
+UPDATE_COALESCING_ENABLED = os.getenv("UPDATE_COALESCING_ENABLED", "False").lower() in ("true", "1", "t")
+UPDATE_COALESCING_WINDOW_MS = float(os.getenv("UPDATE_COALESCING_WINDOW_MS", "2"))
+UPDATE_COALESCING_MAX_BATCH = int(os.getenv("UPDATE_COALESCING_MAX_BATCH", "100"))
+
+INSERT_BATCHING_ENABLED = os.getenv("INSERT_BATCHING_ENABLED", "False").lower() in ("true", "1", "t")
+INSERT_BATCHING_WINDOW_MS = float(os.getenv("INSERT_BATCHING_WINDOW_MS", "2"))
+INSERT_BATCHING_MAX_BATCH = int(os.getenv("INSERT_BATCHING_MAX_BATCH", "100"))
+
+
+class _Batch:
+    """
+    The items collected for one transaction, and its outcome.
+    """
+
+    def __init__(self, closed, done):
+        self.results = None
+        self.error = None
+        # Set when the batch takes no more items, ending the window early.
+        self.closed = closed
+        # Set when the transaction has finished, with results or an error.
+        self.done = done
+
+    def result(self, key):
+        if self.error is not None:
+            raise self.error
+        return self.results[key]
+
+
+class StatusBatch(_Batch):
+    """
+    Status updates by todo ID, flushed as flush(db, {todo_id: is_done}).
+
+    Each request gets the updated todo, or None if it does not exist.
+    """
+
+    def __init__(self, closed, done):
+        super().__init__(closed, done)
+        self.items = {}
+
+    def add(self, item):
+        todo_id, is_done = item
+        # The same todo set to two different values has to be written in order.
+        if self.items.get(todo_id, is_done) != is_done:
+            return None
+        self.items[todo_id] = is_done
+        return todo_id
+
+    def result(self, key):
+        if self.error is not None:
+            raise self.error
+        return self.results.get(key)
+
+
+class InsertBatch(_Batch):
+    """
+    New todos, flushed as flush(db, [todo, ...]).
+
+    The flush returns the created row or the error of every todo, in order, and each
+    request gets its own row or has its own error raised.
+    """
+
+    def __init__(self, closed, done):
+        super().__init__(closed, done)
+        self.items = []
+
+    def add(self, item):
+        self.items.append(item)
+        return len(self.items) - 1
+
+    def result(self, key):
+        result = super().result(key)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class _Coalescer:
+    """
+    Shared state and counters of the sync and async coalescers.
+
+    Attributes:
+        window (float): The seconds the first item of a batch waits for others to join.
+        max_batch (int): The number of items after which a batch is committed without waiting.
+        enabled (bool): Whether the handlers send their writes through the coalescer.
+        batches (int): The number of transactions committed.
+        items (int): The number of items committed in them.
+        largest_batch (int): The most items committed in one transaction.
+    """
+
+    def __init__(
+        self, flush, batch_type, window: float = 0.002, max_batch: int = 100, enabled: bool = True
+    ):
+        self.flush = flush
+        self.batch_type = batch_type
+        self.window = window
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self._open = None
+
+    def _join(self, item, events):
+        """
+        Adds an item to the open batch, opening a new one if needed.
+
+        Returns:
+            tuple: The batch, the key of the item's result and whether the caller opened
+            the batch and has to commit it.
+        """
+        batch = self._open
+        key = batch.add(item) if batch is not None else None
+        leader = key is None
+        if leader:
+            if batch is not None:
+                self._close(batch)
+            batch = self._open = self.batch_type(*events())
+            key = batch.add(item)
+        if len(batch.items) >= self.max_batch:
+            self._close(batch)
+        return batch, key, leader
+
+    def _close(self, batch: _Batch):
+        if self._open is batch:
+            self._open = None
+        batch.closed.set()
+
+    def _count(self, batch: _Batch):
+        self.batches += 1
+        self.items += len(batch.items)
+        self.largest_batch = max(self.largest_batch, len(batch.items))
+
+    def stats(self) -> dict:
+        """
+        Returns the coalescer settings and counters.
+
+        Returns:
+            dict: The window, batch limit and the number and size of the committed batches.
+        """
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "items": self.items,
+            "largest_batch": self.largest_batch,
+        }
+
+
+class Coalescer(_Coalescer):
+    """
+    Commits the writes of concurrent requests in shared transactions (group commit).
+
+    The first item to arrive opens a batch and waits up to window seconds, or until
+    max_batch items have joined, then commits the whole batch with flush on its own
+    session. The other requests wait for that commit and get their own result back.
+    This trades up to window seconds of latency for one commit, and one fsync, per
+    batch instead of per request.
+
+    Meant for the sync handlers, which run in the threadpool.
+
+    Parameters:
+        flush: The function committing a batch, called as flush(repository, batch.items).
+        batch_type (type): StatusBatch or InsertBatch, how items are collected and answered.
+    """
+
+    def __init__(
+        self, flush, batch_type, window: float = 0.002, max_batch: int = 100, enabled: bool = True
+    ):
+        super().__init__(flush, batch_type, window, max_batch, enabled)
+        self._lock = threading.Lock()
+
+    def submit(self, repository, item):
+        """
+        Writes an item as part of the next batch.
+
+        Parameters:
+            repository (TodoRepository): The repository of the request, used if it commits the batch.
+            item: A (todo_id, is_done) pair for a StatusBatch, a ToDoCreate for an InsertBatch.
+
+        Returns:
+            The result of the item, see the batch type.
+        """
+        with self._lock:
+            batch, key, leader = self._join(
+                item, lambda: (threading.Event(), threading.Event())
+            )
+        if not leader:
+            batch.done.wait()
+            return batch.result(key)
+
+        batch.closed.wait(self.window)
+        with self._lock:
+            self._close(batch)
+        try:
+            batch.results = self.flush(repository, batch.items)
+            with self._lock:
+                self._count(batch)
+        except Exception as exc:
+            batch.error = exc
+        finally:
+            batch.done.set()
+        return batch.result(key)
+
+
+class AsyncCoalescer(_Coalescer):
+    """
+    The Coalescer of the async handlers, which run on the event loop.
+
+    Parameters:
+        flush: The coroutine function committing a batch, awaited as flush(db, batch.items).
+        batch_type (type): StatusBatch or InsertBatch, how items are collected and answered.
+    """
+
+    async def submit(self, db, item):
+        """
+        Writes an item as part of the next batch, see Coalescer.submit.
+
+        Parameters:
+            db (AsyncSession): The session of the request, used if it commits the batch.
+            item: A (todo_id, is_done) pair for a StatusBatch, a ToDoCreate for an InsertBatch.
+
+        Returns:
+            The result of the item, see the batch type.
+        """
+        batch, key, leader = self._join(item, lambda: (asyncio.Event(), asyncio.Event()))
+        if not leader:
+            await batch.done.wait()
+            return batch.result(key)
+
+        try:
+            try:
+                await asyncio.wait_for(batch.closed.wait(), self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._close(batch)
+            batch.results = await self.flush(db, batch.items)
+            self._count(batch)
+        except Exception as exc:
+            batch.error = exc
+        except BaseException:
+            # The other requests of the batch must not wait forever for a cancelled leader.
+            batch.error = RuntimeError("The request committing the batch was cancelled")
+            raise
+        finally:
+            self._close(batch)
+            batch.done.set()
+        return batch.result(key)
+
+
+status_updates = Coalescer(
+    lambda repository, updates: repository.update_todos_status(updates),
+    StatusBatch,
+    window=UPDATE_COALESCING_WINDOW_MS / 1000,
+    max_batch=UPDATE_COALESCING_MAX_BATCH,
+    enabled=UPDATE_COALESCING_ENABLED,
+)
+async_status_updates = AsyncCoalescer(
+    async_crud.update_todos_status,
+    StatusBatch,
+    window=UPDATE_COALESCING_WINDOW_MS / 1000,
+    max_batch=UPDATE_COALESCING_MAX_BATCH,
+    enabled=UPDATE_COALESCING_ENABLED,
+)
+todo_inserts = Coalescer(
+    lambda repository, todos: repository.insert_todos(todos),
+    InsertBatch,
+    window=INSERT_BATCHING_WINDOW_MS / 1000,
+    max_batch=INSERT_BATCHING_MAX_BATCH,
+    enabled=INSERT_BATCHING_ENABLED,
+)
+async_todo_inserts = AsyncCoalescer(
+    async_crud.insert_todos,
+    InsertBatch,
+    window=INSERT_BATCHING_WINDOW_MS / 1000,
+    max_batch=INSERT_BATCHING_MAX_BATCH,
+    enabled=INSERT_BATCHING_ENABLED,
+)
@@ -0,0 +1,349 @@
+import os
+import time
+import zlib
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .metrics import Counter, Histogram, registry
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - without brotli, br is not offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - without zstandard, zstd is not offered
+    zstandard = None
+
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() in ("true", "1", "t")
+# Bodies below this many bytes fit in a packet or two and are sent as they are.
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Bodies and chunks from this many bytes on are compressed in the threadpool, as they
+# would hold up the event loop for a millisecond or more.
+COMPRESSION_THREAD_THRESHOLD = int(os.getenv("COMPRESSION_THREAD_THRESHOLD", "65536"))
+
+# Levels that compress JSON well at a few hundred MB/s, the default of gzip aside.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+RATIO_BUCKETS = (0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75, 1.0)
+
+COMPRESSION_RATIO = registry.register(
+    Histogram(
+        "http_response_compression_ratio",
+        "Compressed size of a response body divided by its uncompressed size.",
+        ("encoding",),
+        buckets=RATIO_BUCKETS,
+    )
+)
+COMPRESSION_CPU = registry.register(
+    Histogram(
+        "http_response_compression_cpu_seconds",
+        "CPU time spent compressing the body of a response.",
+        ("encoding",),
+    )
+)
+UNCOMPRESSED_BYTES = registry.register(
+    Counter(
+        "http_response_uncompressed_bytes_total",
+        "Bytes of response bodies before compression.",
+        ("encoding",),
+    )
+)
+COMPRESSED_BYTES = registry.register(
+    Counter(
+        "http_response_compressed_bytes_total",
+        "Bytes of response bodies after compression.",
+        ("encoding",),
+    )
+)
+
+
+class GzipCompressor:
+    """
+    Compresses a response body into the gzip format.
+
+    Every chunk but the last ends with a sync flush, so the client can decompress what
+    it received so far while the rest of a stream is still being produced.
+    """
+
+    encoding = "gzip"
+
+    def __init__(self, level: int = GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """
+        Compresses the next chunk of the body.
+
+        Parameters:
+            data (bytes): The chunk.
+            final (bool): Whether this is the last chunk, which ends the compressed stream.
+
+        Returns:
+            bytes: The compressed chunk.
+        """
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class BrotliCompressor:
+    """
+    Compresses a response body into the brotli format, see GzipCompressor.
+    """
+
+    encoding = "br"
+
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class ZstdCompressor:
+    """
+    Compresses a response body into the zstd format, see GzipCompressor.
+    """
+
+    encoding = "zstd"
+
+    def __init__(self, level: int = ZSTD_LEVEL):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.compress(data)
+        mode = (
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+        return output + self._compressor.flush(mode)
+
+
+# The compressors whose library is installed, in the order the server prefers them.
+COMPRESSORS = {
+    compressor.encoding: compressor
+    for compressor, available in (
+        (ZstdCompressor, zstandard is not None),
+        (BrotliCompressor, brotli is not None),
+        (GzipCompressor, True),
+    )
+    if available
+}
+
+
+def negotiate(accept_encoding: str, available: tuple = tuple(COMPRESSORS)) -> Optional[str]:
+    """
+    Picks the content coding of a response from the Accept-Encoding header of the request.
+
+    The coding with the highest quality value wins, ties going to the one listed first in
+    available. A coding the client gave q=0 is never used, and * stands for the codings
+    the client does not name.
+
+    Parameters:
+        accept_encoding (str): The value of the Accept-Encoding header.
+        available (tuple[str]): The codings the server can produce, in order of preference.
+
+    Returns:
+        str | None: The coding to use, or None to send the body as it is.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, parameters = item.partition(";")
+        weight = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if coding.strip():
+            weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compressible(content_type: str) -> bool:
+    """
+    Returns whether a media type is text that compresses well, such as JSON and NDJSON.
+    """
+    media_type = content_type.split(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in ("application/json", "application/x-ndjson")
+        or media_type.endswith("+json")
+    )
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with gzip, brotli or zstd.
+
+    The coding is negotiated from the Accept-Encoding header of the request. Only text
+    and JSON bodies of at least minimum_size bytes are compressed: a streaming response
+    is held back until that many bytes arrived, then compressed chunk by chunk, each
+    flushed to the client as it comes. Bodies and chunks of thread_threshold bytes or
+    more are compressed in the threadpool instead of on the event loop.
+
+    Every response the coding could be negotiated for carries Vary: Accept-Encoding,
+    compressed or not: a cache must not serve a small or incompressible body sent as it
+    is, nor one sent to a client accepting no coding, as the answer to other requests. A
+    compressed response also gets a weak ETag, as its bytes differ from those of the
+    uncompressed representation. If-None-Match compares ETags weakly, so clients still
+    get 304 responses.
+
+    Parameters:
+        app (ASGIApp): The application to wrap.
+        enabled (bool): Whether to compress anything. Defaults to COMPRESSION_ENABLED.
+        minimum_size (int): The smallest body to compress. Defaults to COMPRESSION_MINIMUM_SIZE.
+        thread_threshold (int): The smallest body or chunk compressed off the event loop.
+            Defaults to COMPRESSION_THREAD_THRESHOLD.
+    """
+
+    def __init__(
+        self,
+        app,
+        enabled: bool = COMPRESSION_ENABLED,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        thread_threshold: int = COMPRESSION_THREAD_THRESHOLD,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.minimum_size = minimum_size
+        self.thread_threshold = thread_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        compressor_class = None if encoding is None else COMPRESSORS[encoding]
+        responder = _CompressingResponder(self, compressor_class, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    """
+    Compresses the messages of one response on their way to the client.
+
+    Without a compressor_class, the request accepts no coding and the messages are sent as
+    they are, with Vary: Accept-Encoding if the response could have been compressed.
+    """
+
+    def __init__(self, middleware: CompressionMiddleware, compressor_class, send):
+        self.middleware = middleware
+        self.compressor_class = compressor_class
+        self.compressor = None
+        self._send = send
+        self.start = None
+        self.passthrough = False
+        # The chunks held back until the body reaches the minimum size.
+        self.held = []
+        self.held_size = 0
+        self.uncompressed = 0
+        self.compressed = 0
+        self.cpu = 0.0
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.start = message
+            self.passthrough = (
+                message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or "no-transform" in headers.get("cache-control", "")
+                or not compressible(headers.get("content-type", ""))
+            )
+            if not self.passthrough:
+                MutableHeaders(scope=message).add_vary_header("Accept-Encoding")
+                self.passthrough = self.compressor_class is None
+            if self.passthrough:
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            self.held.append(body)
+            self.held_size += len(body)
+            if more_body and self.held_size < self.middleware.minimum_size:
+                return
+            body = b"".join(self.held)
+            self.held = []
+            if self.held_size < self.middleware.minimum_size:
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            self.compressor = self.compressor_class()
+            if not more_body:
+                await self._send_whole(body)
+                return
+            self._set_headers(content_length=None)
+            await self._send(self.start)
+
+        if body or not more_body:
+            output = await self._compress(body, final=not more_body)
+            await self._send(
+                {"type": "http.response.body", "body": output, "more_body": more_body}
+            )
+        if not more_body:
+            self._record()
+
+    async def _send_whole(self, body: bytes):
+        output = await self._compress(body, final=True)
+        if len(output) >= len(body):
+            # Incompressible, the client gets the body as it is.
+            await self._send(self.start)
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        self._set_headers(content_length=len(output))
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": output})
+        self._record()
+
+    async def _compress(self, data: bytes, final: bool) -> bytes:
+        self.uncompressed += len(data)
+        if len(data) >= self.middleware.thread_threshold:
+            output = await run_in_threadpool(self._timed_compress, data, final)
+        else:
+            output = self._timed_compress(data, final)
+        self.compressed += len(output)
+        return output
+
+    def _timed_compress(self, data: bytes, final: bool) -> bytes:
+        # The CPU time of the running thread, whether it is the event loop or the threadpool.
+        started = time.thread_time()
+        try:
+            return self.compressor.compress(data, final)
+        finally:
+            self.cpu += time.thread_time() - started
+
+    def _set_headers(self, content_length: Optional[int]):
+        headers = MutableHeaders(scope=self.start)
+        headers["Content-Encoding"] = self.compressor.encoding
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    def _record(self):
+        encoding = self.compressor.encoding
+        COMPRESSION_RATIO.observe(self.compressed / max(self.uncompressed, 1), encoding)
+        COMPRESSION_CPU.observe(self.cpu, encoding)
+        UNCOMPRESSED_BYTES.inc(encoding, amount=self.uncompressed)
+        COMPRESSED_BYTES.inc(encoding, amount=self.compressed)
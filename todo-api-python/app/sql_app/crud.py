@@ -1,13 +1,102 @@
-import os
-import sys
+from typing import Optional
 
-path = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(path)
+from sqlalchemy import (
+    BigInteger,
+    any_,
+    bindparam,
+    column,
+    delete,
+    exc,
+    false,
+    func,
+    insert,
+    literal_column,
+    select,
+    table,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
 
+from . import models, schemas
 
-from sqlalchemy.orm import Session
+INSERT_CHUNK_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+
+try:
+    insert(models.ToDo.__table__).returning(models.ToDo.id, sort_by_parameter_order=True)
+    # SQLAlchemy 2.0.10 and later can return the rows of an INSERT in parameter order.
+    ORDERED_RETURNING = True
+except (exc.ArgumentError, TypeError):
+    ORDERED_RETURNING = False
+
+
+def _supports_returning(db: Session, statement: str) -> bool:
+    """
+    Checks whether the database behind the session supports RETURNING for a statement type.
+
+    Parameters:
+        db (Session): The database session.
+        statement (str): One of "insert", "update" or "delete".
+
+    Returns:
+        bool: True if the dialect can return rows from the statement.
+    """
+    dialect = db.get_bind().dialect
+    # SQLAlchemy 2.0 reports support per statement, 1.4 only has full_returning.
+    if hasattr(dialect, f"{statement}_returning"):
+        return getattr(dialect, f"{statement}_returning")
+    return getattr(dialect, "full_returning", False)
+
+
+def _insert_returning(db: Session, rows: list):
+    """
+    Builds an INSERT ... RETURNING of rows, whose result _in_given_order puts in order.
+
+    Neither Postgres nor SQLite promise to return the rows of a multi-row INSERT in the
+    order of its VALUES. On Postgres, SQLAlchemy matches them to the parameters where it
+    can, still with one statement per batch. It would insert row by row on SQLite.
+
+    Parameters:
+        db (Session): The database session.
+        rows (list[dict]): The rows to insert.
 
-import models, schemas
+    Returns:
+        tuple: The statement, and the parameters to execute it with.
+    """
+    table = models.ToDo.__table__
+    if ORDERED_RETURNING and db.get_bind().dialect.name == "postgresql":
+        return insert(table).returning(*table.c, sort_by_parameter_order=True), rows
+    return insert(table).values(rows).returning(*table.c), None
+
+
+def _in_given_order(result, parameters) -> list:
+    """
+    Returns the rows of an INSERT built by _insert_returning in the order they were given.
+
+    Parameters:
+        result (Result): The result of the INSERT.
+        parameters (list | None): The parameters the INSERT was executed with.
+    """
+    rows = list(result)
+    if parameters is not None:
+        return rows
+    # The IDs are drawn as the rows of VALUES are inserted, in order.
+    return sorted(rows, key=lambda row: row.id)
+
+
+def _to_schema(row) -> schemas.ToDo:
+    """
+    Converts a row returned by a Core statement into a ToDo schema.
+
+    Parameters:
+        row (Row): A row containing all columns of the todos table.
+
+    Returns:
+        schemas.ToDo: The todo item held by the row.
+    """
+    return schemas.ToDo(**row._mapping)
 
 
 def get_todo(db: Session, todo_id: int):
@@ -24,19 +113,192 @@ def get_todo(db: Session, todo_id: int):
     return db.query(models.ToDo).filter(models.ToDo.id == todo_id).first()
 
 
-def get_todos(db: Session, skip: int = 0, limit: int = 100):
+def get_todo_version(db: Session, todo_id: int):
+    """
+    Retrieves only the version of a todo item, to revalidate its ETag cheaply.
+
+    Parameters:
+        db (Session): The database session.
+        todo_id (int): The ID of the todo item.
+
+    Returns:
+        int | None: The version of the todo item, or None if not found.
+    """
+    return db.execute(
+        select(models.ToDo.version).where(models.ToDo.id == todo_id)
+    ).scalar()
+
+
+def get_table_version(db: Session) -> int:
+    """
+    Retrieves the modification counter of the todos table.
+
+    Parameters:
+        db (Session): The database session.
+
+    Returns:
+        int: A number that grows with every write to the todos table.
+    """
+    return db.execute(
+        select(func.coalesce(func.sum(models.TodoTableVersion.version), 0))
+    ).scalar()
+
+
+def _todo_filters(is_done: Optional[bool] = None, title_prefix: Optional[str] = None):
+    """
+    Builds the WHERE clauses of the list filters.
+
+    The status is compared with a literal rather than a bound parameter, so that the
+    planner can prove the partial index on open todos applies to the query.
+    """
+    filters = []
+    if is_done is not None:
+        filters.append(models.ToDo.is_done == (true() if is_done else false()))
+    if title_prefix:
+        filters.append(models.ToDo.title.startswith(title_prefix, autoescape=True))
+    return filters
+
+
+def get_todos(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    is_done: Optional[bool] = None,
+    title_prefix: Optional[str] = None,
+):
     """
     Retrieves a list of todos from the database based on the specified skip and limit parameters.
 
+    Todos are always returned in ascending ID order. When after_id is given, keyset
+    pagination is used instead of OFFSET: the primary key index seeks directly to the
+    first row after after_id, so the cost of a page does not grow with its depth.
+    Filtering on is_done keeps the same property through the (is_done, id) indexes.
+
     Parameters:
         db (Session): The database session.
-        skip (int): The number of todos to skip. Defaults to 0.
+        skip (int): The number of todos to skip. Ignored when after_id is given. Defaults to 0.
         limit (int): The maximum number of todos to retrieve. Defaults to 100.
+        after_id (int | None): Only return todos with an ID greater than this one. Defaults to None.
+        is_done (bool | None): Only return todos with this status. Defaults to None.
+        title_prefix (str | None): Only return todos whose title starts with this string. Defaults to None.
 
     Returns:
         list: The list of todos retrieved from the database.
     """
-    return db.query(models.ToDo).offset(skip).limit(limit).all()
+    query = (
+        db.query(models.ToDo)
+        .filter(*_todo_filters(is_done, title_prefix))
+        .order_by(models.ToDo.id)
+    )
+    if after_id is not None:
+        return query.filter(models.ToDo.id > after_id).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+
+def count_todos(
+    db: Session, is_done: Optional[bool] = None, title_prefix: Optional[str] = None
+) -> int:
+    """
+    Counts the todos matching the list filters, see get_todos.
+
+    Parameters:
+        db (Session): The database session.
+        is_done (bool | None): Only count todos with this status. Defaults to None.
+        title_prefix (str | None): Only count todos whose title starts with this string. Defaults to None.
+
+    Returns:
+        int: The number of matching todos.
+    """
+    query = select(func.count()).select_from(models.ToDo).where(
+        *_todo_filters(is_done, title_prefix)
+    )
+    return db.execute(query).scalar()
+
+
+def _fts5_query(text: str) -> str:
+    """
+    Quotes every word of a search so that FTS5 matches all of them literally.
+
+    Without quoting, words like AND or NEAR and characters like * or - would be parsed
+    as FTS5 query syntax, and unbalanced quotes would make the statement fail.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+def _search_statement(dialect: str, text: str, skip: int, limit: int):
+    """
+    Builds the ranked full-text search query for the dialect of the session.
+    """
+    if dialect == "postgresql":
+        vector = literal_column("todos.search_vector")
+        query = func.plainto_tsquery(models.SEARCH_CONFIG, text)
+        statement = (
+            select(models.ToDo)
+            .where(vector.op("@@")(query))
+            .order_by(func.ts_rank(vector, query).desc(), models.ToDo.id)
+        )
+    else:
+        fts = table("todos_fts", column("rowid"), column("rank"))
+        statement = (
+            select(models.ToDo)
+            .join(fts, fts.c.rowid == models.ToDo.id)
+            .where(literal_column("todos_fts").op("MATCH")(_fts5_query(text)))
+            # The FTS5 rank is the bm25 score, where lower means more relevant.
+            .order_by(fts.c.rank, models.ToDo.id)
+        )
+    return statement.offset(skip).limit(limit)
+
+
+def search_todos(db: Session, text: str, skip: int = 0, limit: int = 20):
+    """
+    Searches todos by the words of their title and description, most relevant first.
+
+    Uses the GIN-indexed search vector on Postgres and the FTS5 index on SQLite, so the
+    cost depends on the number of matches rather than on the size of the table. All
+    words must match, and words are stemmed, so "running" also finds "run".
+
+    Parameters:
+        db (Session): The database session.
+        text (str): The words to search for.
+        skip (int): The number of results to skip. Defaults to 0.
+        limit (int): The maximum number of results to retrieve. Defaults to 20.
+
+    Returns:
+        list: The matching todos, ordered by relevance.
+    """
+    if not text.split():
+        return []
+    dialect = db.get_bind().dialect.name
+    return db.scalars(_search_statement(dialect, text, skip, limit)).all()
+
+
+def stream_todos(db: Session, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    Streams all todos from the database in batches, ordered by ID.
+
+    The rows are read through a server-side cursor where the driver supports one, so
+    only one batch is held in memory at a time. They are returned as plain rows rather
+    than ORM objects so that the session's identity map does not grow either.
+
+    Parameters:
+        db (Session): The database session.
+        batch_size (int): The number of rows fetched per batch. Defaults to 1000.
+
+    Yields:
+        list[Row]: The next batch of todo rows.
+    """
+    table = models.ToDo.__table__
+    statement = (
+        select(table)
+        .order_by(table.c.id)
+        .execution_options(stream_results=True, yield_per=batch_size)
+    )
+    result = db.execute(statement)
+    try:
+        yield from result.partitions(batch_size)
+    finally:
+        result.close()
 
 
 def create_todo(db: Session, todo: schemas.ToDoCreate):
@@ -57,37 +319,231 @@ def create_todo(db: Session, todo: schemas.ToDoCreate):
     return db_todo
 
 
+def create_todos(
+    db: Session, todos: list[schemas.ToDoCreate], chunk_size: int = INSERT_CHUNK_SIZE
+):
+    """
+    Creates several todo items in the database within a single transaction.
+
+    The rows are written with multi-row INSERT ... RETURNING statements of at most
+    chunk_size rows each, so the generated IDs come back without extra round trips.
+
+    Parameters:
+        db (Session): The database session.
+        todos (list[schemas.ToDoCreate]): The todo items to be created.
+        chunk_size (int): The maximum number of rows per INSERT statement. Defaults to 500.
+
+    Returns:
+        list[schemas.ToDo]: The newly created todo items, in the order they were given.
+    """
+    rows = [
+        {"title": todo.title, "description": todo.description, "is_done": False}
+        for todo in todos
+    ]
+    if not _supports_returning(db, "insert"):
+        db_todos = [models.ToDo(**row) for row in rows]
+        db.add_all(db_todos)
+        db.flush()
+        created = [
+            schemas.ToDo(
+                id=db_todo.id,
+                title=db_todo.title,
+                description=db_todo.description,
+                is_done=db_todo.is_done,
+            )
+            for db_todo in db_todos
+        ]
+        db.commit()
+        return created
+
+    created = []
+    for start in range(0, len(rows), chunk_size):
+        statement, parameters = _insert_returning(db, rows[start : start + chunk_size])
+        result = db.execute(statement, parameters)
+        created.extend(_to_schema(row) for row in _in_given_order(result, parameters))
+    db.commit()
+    return created
+
+
+def _insert_rows(db: Session, rows: list) -> list:
+    """
+    Inserts rows with one multi-row INSERT ... RETURNING, without committing.
+
+    Returns:
+        list: The created rows, with all columns, in the order they were given.
+    """
+    table = models.ToDo.__table__
+    if _supports_returning(db, "insert"):
+        statement, parameters = _insert_returning(db, rows)
+        return _in_given_order(db.execute(statement, parameters), parameters)
+    db_todos = [models.ToDo(**row) for row in rows]
+    db.add_all(db_todos)
+    db.flush()
+    # Detached copies, as the committed objects are expired and their session closes.
+    return [
+        models.ToDo(**{column.name: getattr(db_todo, column.name) for column in table.c})
+        for db_todo in db_todos
+    ]
+
+
+# The errors a single bad row can cause: the database rejecting it, or the driver failing
+# to send it, such as psycopg2 raising ValueError for a NUL character in a string.
+ROW_ERRORS = (exc.DBAPIError, exc.StatementError, ValueError)
+
+
+def insert_todos(db: Session, todos: list[schemas.ToDoCreate]) -> list:
+    """
+    Creates the todo items of independent requests, isolating the rows that fail.
+
+    Used by the insert batcher. All rows are written with one INSERT in one transaction.
+    If it fails with one of ROW_ERRORS, the transaction is rolled back and every row is
+    written in a transaction of its own, so that a bad row only fails its own request.
+
+    Parameters:
+        db (Session): The database session.
+        todos (list[schemas.ToDoCreate]): The todo items to be created.
+
+    Returns:
+        list: For every todo item, in order, the created row or the error that prevented it.
+    """
+    rows = [
+        {"title": todo.title, "description": todo.description, "is_done": False}
+        for todo in todos
+    ]
+    try:
+        created = _insert_rows(db, rows)
+        db.commit()
+        return created
+    except ROW_ERRORS as error:
+        db.rollback()
+        # A lost connection fails every row, and a single row has nothing to isolate.
+        if getattr(error, "connection_invalidated", False) or len(rows) == 1:
+            return [error] * len(rows)
+    results = []
+    for row in rows:
+        try:
+            results.extend(_insert_rows(db, [row]))
+            db.commit()
+        except ROW_ERRORS as error:
+            db.rollback()
+            results.append(error)
+    return results
+
+
 def update_todo_status(db: Session, todo_id: int, is_done: bool):
     """
     Updates the status of a todo item in the database.
 
+    Uses a single UPDATE ... RETURNING statement where the database supports it.
+
     Parameters:
         - db (Session): The database session.
         - todo_id (int): The ID of the todo item to update.
         - is_done (bool): The new status of the todo item.
 
     Returns:
-        - models.ToDo: The updated todo item.
+        - schemas.ToDo | None: The updated todo item, or None if not found.
     """
-    db_todo = db.query(models.ToDo).filter(models.ToDo.id == todo_id).first()
-    db_todo.is_done = is_done
+    table = models.ToDo.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == todo_id)
+        .values(is_done=is_done, version=table.c.version + 1)
+    )
+    if _supports_returning(db, "update"):
+        row = db.execute(statement.returning(*table.c)).first()
+    elif db.execute(statement).rowcount:
+        row = db.execute(select(table).where(table.c.id == todo_id)).first()
+    else:
+        row = None
     db.commit()
-    db.refresh(db_todo)
-    return db_todo
+    return _to_schema(row) if row is not None else None
+
+
+def _id_in(dialect: str, todo_ids: list):
+    """
+    Builds the WHERE clause matching a list of IDs.
+
+    Postgres gets the IDs as one array parameter, id = ANY(:todo_ids), so the statement
+    text is the same for any number of IDs. Other databases get an expanding IN list.
+    """
+    id_column = models.ToDo.__table__.c.id
+    if dialect == "postgresql":
+        return id_column == any_(bindparam("todo_ids", todo_ids, type_=ARRAY(BigInteger)))
+    return id_column.in_(todo_ids)
+
+
+def _status_update_statements(dialect: str, updates: dict):
+    """
+    Groups status updates by their new status into one UPDATE statement per status.
+
+    Yields:
+        tuple[Update, list[int]]: The statement and the IDs it updates, sorted so that
+        concurrent batches lock the rows they share in the same order.
+    """
+    table = models.ToDo.__table__
+    by_status = {}
+    for todo_id, is_done in updates.items():
+        by_status.setdefault(is_done, []).append(todo_id)
+    for is_done, todo_ids in by_status.items():
+        todo_ids.sort()
+        statement = (
+            update(table)
+            .where(_id_in(dialect, todo_ids))
+            .values(is_done=is_done, version=table.c.version + 1)
+        )
+        yield statement, todo_ids
+
+
+def update_todos_status(db: Session, updates: dict) -> dict:
+    """
+    Updates the status of several todo items within a single transaction.
+
+    Used by the update coalescer to commit the updates of concurrent requests together,
+    with one UPDATE ... RETURNING statement per distinct status.
+
+    Parameters:
+        db (Session): The database session.
+        updates (dict[int, bool]): The new status by todo ID.
+
+    Returns:
+        dict[int, schemas.ToDo]: The updated todo items by ID. IDs that were not found are missing.
+    """
+    table = models.ToDo.__table__
+    dialect = db.get_bind().dialect.name
+    returning = _supports_returning(db, "update")
+    updated = {}
+    for statement, todo_ids in _status_update_statements(dialect, updates):
+        if returning:
+            rows = db.execute(statement.returning(*table.c))
+        else:
+            db.execute(statement)
+            rows = db.execute(select(table).where(_id_in(dialect, todo_ids)))
+        updated.update((row.id, _to_schema(row)) for row in rows)
+    db.commit()
+    return updated
 
 
 def delete_todo(db: Session, todo_id: int):
     """
     Deletes a todo item from the database based on the specified todo_id.
 
+    Uses a single DELETE ... RETURNING statement where the database supports it.
+
     Parameters:
         - db (Session): The database session.
         - todo_id (int): The ID of the todo item to delete.
 
     Returns:
-        - int: 1 if the deletion was successful.
+        - schemas.ToDo | None: The deleted todo item, or None if not found.
     """
-    db_todo = db.query(models.ToDo).filter(models.ToDo.id == todo_id).first()
-    db.delete(db_todo)
+    table = models.ToDo.__table__
+    statement = delete(table).where(table.c.id == todo_id)
+    if _supports_returning(db, "delete"):
+        row = db.execute(statement.returning(*table.c)).first()
+    else:
+        row = db.execute(select(table).where(table.c.id == todo_id)).first()
+        if row is not None:
+            db.execute(statement)
     db.commit()
-    return 1
+    return _to_schema(row) if row is not None else None
@@ -0,0 +1,64 @@
+from typing import Optional
+
+from starlette.responses import Response
+
+
+def todo_etag(todo_id: int, version: int) -> str:
+    """
+    Builds the strong ETag of a single todo item.
+
+    Parameters:
+        todo_id (int): The ID of the todo item.
+        version (int): The version of the todo item.
+
+    Returns:
+        str: The quoted entity tag.
+    """
+    return f'"t{todo_id}.{version}"'
+
+
+def list_etag(table_version: int) -> str:
+    """
+    Builds the strong ETag of a list of todos from the table modification counter.
+
+    Parameters:
+        table_version (int): The modification counter of the todos table.
+
+    Returns:
+        str: The quoted entity tag.
+    """
+    return f'"l{table_version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Checks an If-None-Match header against an entity tag.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match.
+
+    Parameters:
+        if_none_match (str | None): The value of the If-None-Match header.
+        etag (str): The current entity tag of the resource.
+
+    Returns:
+        bool: True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Builds a 304 Not Modified response.
+
+    Parameters:
+        etag (str): The current entity tag of the resource.
+
+    Returns:
+        Response: The empty response carrying the entity tag.
+    """
+    return Response(status_code=304, headers={"ETag": etag})
@@ -0,0 +1,348 @@
+"""
+Streams todos from JSON or NDJSON into the database, for POST /api/import and the command line:
+
+    cd app && python -m sql_app.importer todos.ndjson
+    cd app && python sql_app/importer.py todos.ndjson
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+import os
+import sys
+import time
+from typing import AsyncIterable, Awaitable, Callable, Iterable
+
+if __name__ == "__main__" and not __package__:
+    # Run as a script, the relative imports below need the package to import from.
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    __package__ = "sql_app"
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+IMPORT_BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 1 << 20
+MAX_ITEM_SIZE = 1 << 20
+
+
+class TodoStreamParser:
+    """
+    Incrementally parses todos from a JSON array or from newline-delimited JSON.
+
+    Bytes are fed in arbitrary chunks and every complete item is returned as soon as it
+    has been read, so only the unparsed tail of the input is kept in memory. The format
+    is detected from the first character: `[` starts a JSON array, anything else is
+    treated as NDJSON.
+
+    Attributes:
+        items (int): The number of items parsed so far.
+    """
+
+    def __init__(self, max_item_size: int = MAX_ITEM_SIZE):
+        self.items = 0
+        self._max_item_size = max_item_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._format = None
+        self._state = "first"
+
+    def feed(self, data: bytes) -> list:
+        """
+        Parses the next chunk of input.
+
+        Parameters:
+            data (bytes): The next chunk of the document.
+
+        Returns:
+            list[dict]: The rows of all items completed by this chunk.
+
+        Raises:
+            ValueError: If the input is not valid or an item is not a valid todo.
+        """
+        self._buffer += self._decoder.decode(data)
+        return self._parse(final=False)
+
+    def close(self) -> list:
+        """
+        Parses the rest of the input once all chunks have been fed.
+
+        Returns:
+            list[dict]: The rows of the remaining items.
+
+        Raises:
+            ValueError: If the document is incomplete or invalid.
+        """
+        self._buffer += self._decoder.decode(b"", final=True)
+        rows = self._parse(final=True)
+        if self._format == "array" and self._state != "done":
+            raise ValueError("Unexpected end of the JSON array")
+        return rows
+
+    def _parse(self, final: bool) -> list:
+        rows = []
+        buffer = self._buffer
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if self._format is None:
+                self._format = "array" if buffer[pos] == "[" else "ndjson"
+                if self._format == "array":
+                    pos += 1
+                continue
+
+            if self._format == "ndjson":
+                newline = buffer.find("\n", pos)
+                if newline == -1 and not final:
+                    if len(buffer) - pos > self._max_item_size:
+                        raise ValueError(f"Item {self.items} is too large")
+                    break
+                end = len(buffer) if newline == -1 else newline
+                try:
+                    value = json.loads(buffer[pos:end])
+                except json.JSONDecodeError as exc:
+                    raise ValueError(f"Item {self.items} is not valid JSON") from exc
+                rows.append(self._row(value))
+                pos = end + 1
+                continue
+
+            char = buffer[pos]
+            if self._state == "done":
+                raise ValueError("Unexpected data after the JSON array")
+            if self._state == "separator":
+                if char not in ",]":
+                    raise ValueError(f"Expected ',' or ']' after item {self.items - 1}")
+                self._state = "item" if char == "," else "done"
+                pos += 1
+                continue
+            if char == "]" and self._state == "first":
+                self._state = "done"
+                pos += 1
+                continue
+            try:
+                value, pos = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError as exc:
+                # Usually the item is just not complete yet, so wait for more input.
+                if final or len(buffer) - pos > self._max_item_size:
+                    raise ValueError(f"Item {self.items} is not valid JSON") from exc
+                break
+            rows.append(self._row(value))
+            self._state = "separator"
+        self._buffer = buffer[pos:]
+        return rows
+
+    def _row(self, value) -> dict:
+        if not isinstance(value, dict):
+            raise ValueError(f"Item {self.items} is not a JSON object")
+        try:
+            todo = schemas.ToDoCreate(**value)
+        except ValueError as exc:
+            raise ValueError(f"Item {self.items} is not a valid todo") from exc
+        self.items += 1
+        return {"title": todo.title, "description": todo.description, "is_done": False}
+
+
+def _copy_statement() -> str:
+    table = models.ToDo.__table__
+    return f"COPY {table.name} (title, description, is_done) FROM STDIN WITH (FORMAT csv)"
+
+
+def _csv_records(rows: list) -> io.StringIO:
+    buffer = io.StringIO()
+    # Quote every field, as an unquoted empty field means NULL to COPY.
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    writer.writerows((row["title"], row["description"], "f") for row in rows)
+    buffer.seek(0)
+    return buffer
+
+
+def load_batch(db: Session, rows: list):
+    """
+    Writes a batch of todo rows in the current transaction.
+
+    Uses COPY when the database is Postgres through psycopg2 and a single
+    executemany INSERT otherwise.
+
+    Parameters:
+        db (Session): The database session.
+        rows (list[dict]): The rows to insert.
+    """
+    if not rows:
+        return
+    connection = db.connection()
+    if connection.dialect.driver == "psycopg2":
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(_copy_statement(), _csv_records(rows))
+    else:
+        connection.execute(insert(models.ToDo.__table__), rows)
+
+
+async def load_batch_async(db: AsyncSession, rows: list):
+    """
+    Writes a batch of todo rows in the current transaction, see load_batch.
+
+    Uses asyncpg's binary COPY when the database is Postgres through asyncpg.
+
+    Parameters:
+        db (AsyncSession): The database session.
+        rows (list[dict]): The rows to insert.
+    """
+    if not rows:
+        return
+    connection = await db.connection()
+    if connection.dialect.driver == "asyncpg":
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            models.ToDo.__tablename__,
+            records=[(row["title"], row["description"], False) for row in rows],
+            columns=["title", "description", "is_done"],
+        )
+    else:
+        await connection.execute(insert(models.ToDo.__table__), rows)
+
+
+def import_report(rows: int, started: float) -> dict:
+    """
+    Builds the summary of a finished import.
+
+    Parameters:
+        rows (int): The number of imported rows.
+        started (float): The time.perf_counter() value when the import started.
+
+    Returns:
+        dict: The number of rows, the duration and the throughput of the import.
+    """
+    seconds = time.perf_counter() - started
+    return {
+        "imported": rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds) if seconds > 0 else rows,
+    }
+
+
+def import_chunks(
+    db: Session, chunks: Iterable[bytes], batch_size: int = IMPORT_BATCH_SIZE
+) -> dict:
+    """
+    Imports todos from a stream of byte chunks in a single transaction.
+
+    Parameters:
+        db (Session): The database session.
+        chunks (Iterable[bytes]): The JSON array or NDJSON document, in chunks.
+        batch_size (int): The number of rows written per batch. Defaults to 5000.
+
+    Returns:
+        dict: The import report, see import_report.
+
+    Raises:
+        ValueError: If the document is invalid. Nothing is imported in that case.
+    """
+    started = time.perf_counter()
+    parser = TodoStreamParser()
+    pending = []
+    try:
+        for chunk in chunks:
+            pending.extend(parser.feed(chunk))
+            if len(pending) >= batch_size:
+                load_batch(db, pending)
+                pending = []
+        pending.extend(parser.close())
+        load_batch(db, pending)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return import_report(parser.items, started)
+
+
+async def import_body(
+    chunks: AsyncIterable[bytes],
+    load: Callable[[list], Awaitable[None]],
+    commit: Callable[[], Awaitable[None]],
+    rollback: Callable[[], Awaitable[None]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> dict:
+    """
+    Imports todos from a request body stream in a single transaction.
+
+    Parameters:
+        chunks (AsyncIterable[bytes]): The request body, in chunks.
+        load (Callable): Coroutine function writing one batch of rows.
+        commit (Callable): Coroutine function committing the transaction.
+        rollback (Callable): Coroutine function rolling the transaction back.
+        batch_size (int): The number of rows written per batch. Defaults to 5000.
+
+    Returns:
+        dict: The import report, see import_report.
+
+    Raises:
+        ValueError: If the document is invalid. Nothing is imported in that case.
+    """
+    started = time.perf_counter()
+    parser = TodoStreamParser()
+    pending = []
+    try:
+        async for chunk in chunks:
+            pending.extend(parser.feed(chunk))
+            if len(pending) >= batch_size:
+                await load(pending)
+                pending = []
+        pending.extend(parser.close())
+        await load(pending)
+        await commit()
+    except Exception:
+        await rollback()
+        raise
+    return import_report(parser.items, started)
+
+
+def read_chunks(file, chunk_size: int = READ_CHUNK_SIZE):
+    """
+    Reads a binary file in chunks.
+
+    Parameters:
+        file (BinaryIO): The file to read.
+        chunk_size (int): The number of bytes per chunk. Defaults to 1 MiB.
+
+    Yields:
+        bytes: The next chunk of the file.
+    """
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import todos from a JSON array or NDJSON file."
+    )
+    parser.add_argument("file", help="the file to import, '-' for stdin")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.file == "-":
+            report = import_chunks(db, read_chunks(sys.stdin.buffer), args.batch_size)
+        else:
+            with open(args.file, "rb") as file:
+                report = import_chunks(db, read_chunks(file), args.batch_size)
+    finally:
+        db.close()
+    print(
+        f"Imported {report['imported']} todos in {report['seconds']}s "
+        f"({report['rows_per_second']} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
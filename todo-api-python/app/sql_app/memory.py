@@ -0,0 +1,244 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Optional
+
+from . import crud, schemas
+from .repository import TodoRepository
+
+WORD = re.compile(r"\w+")
+
+
+class TodoRecord:
+    """
+    A todo held by the in-memory backend.
+
+    Records are never changed once stored: an update stores a new record, so a record
+    handed to a request can be serialized without holding the lock.
+    """
+
+    __slots__ = ("id", "title", "description", "is_done", "version")
+
+    def __init__(
+        self, id: int, title: str, description: str, is_done: bool, version: int
+    ):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.is_done = is_done
+        self.version = version
+
+    def replace(self, is_done: bool) -> "TodoRecord":
+        return TodoRecord(self.id, self.title, self.description, is_done, self.version + 1)
+
+
+class TodoStore:
+    """
+    The todos of the in-memory backend, shared by all requests of the process.
+
+    Attributes:
+        todos (dict[int, TodoRecord]): The ID index, the records by ID.
+        ids (array): The IDs of all todos, sorted.
+        open_ids (array): The IDs of the todos that are not done, sorted.
+        next_id (int): The ID of the next todo. IDs are never reused.
+        version (int): The number of writes, the modification counter of the table.
+        lock (threading.Lock): Guards all of the above.
+    """
+
+    __slots__ = ("todos", "ids", "open_ids", "next_id", "version", "lock")
+
+    def __init__(self):
+        self.todos = {}
+        self.ids = array("q")
+        self.open_ids = array("q")
+        self.next_id = 1
+        self.version = 0
+        self.lock = threading.Lock()
+
+    def add(self, title: str, description: str) -> TodoRecord:
+        # IDs only grow, so appending keeps both indexes sorted.
+        record = TodoRecord(self.next_id, title, description, False, 1)
+        self.next_id += 1
+        self.todos[record.id] = record
+        self.ids.append(record.id)
+        self.open_ids.append(record.id)
+        self.version += 1
+        return record
+
+    def set_status(self, todo_id: int, is_done: bool) -> Optional[TodoRecord]:
+        record = self.todos.get(todo_id)
+        if record is None:
+            return None
+        if record.is_done != is_done:
+            if is_done:
+                del self.open_ids[bisect_left(self.open_ids, todo_id)]
+            else:
+                insort(self.open_ids, todo_id)
+        record = self.todos[todo_id] = record.replace(is_done)
+        self.version += 1
+        return record
+
+    def remove(self, todo_id: int) -> Optional[TodoRecord]:
+        record = self.todos.pop(todo_id, None)
+        if record is None:
+            return None
+        del self.ids[bisect_left(self.ids, todo_id)]
+        if not record.is_done:
+            del self.open_ids[bisect_left(self.open_ids, todo_id)]
+        self.version += 1
+        return record
+
+
+def _words(text: str) -> list:
+    return WORD.findall(text.lower())
+
+
+class InMemoryRepository(TodoRepository):
+    """
+    Keeps the todos in the memory of the process, without a database.
+
+    Lists seek into the sorted ID arrays like the primary key and open-todo indexes of
+    the database, so a page costs the same at any depth as long as no title prefix
+    has to be checked. Every operation holds the lock of the store while it runs.
+    Search matches whole words without stemming, ranked by the number of occurrences.
+
+    Meant for tests, caches at the edge and measuring the API without the cost of a
+    database. Nothing survives the process, and every worker process has its own todos.
+
+    Parameters:
+        store (TodoStore): The todos, shared with the repositories of other requests.
+    """
+
+    def __init__(self, store: TodoStore):
+        self.store = store
+        self._pending = []
+
+    def get_todo(self, todo_id: int) -> Optional[TodoRecord]:
+        with self.store.lock:
+            return self.store.todos.get(todo_id)
+
+    def get_todo_version(self, todo_id: int) -> Optional[int]:
+        record = self.get_todo(todo_id)
+        return record.version if record is not None else None
+
+    def get_table_version(self) -> int:
+        with self.store.lock:
+            return self.store.version
+
+    def get_todos(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        after_id: Optional[int] = None,
+        is_done: Optional[bool] = None,
+        title_prefix: Optional[str] = None,
+    ) -> list:
+        store = self.store
+        with store.lock:
+            ids = store.open_ids if is_done is False else store.ids
+            start = bisect_right(ids, after_id) if after_id is not None else 0
+            if after_id is not None:
+                skip = 0
+            if is_done is not True and not title_prefix:
+                page = ids[start + skip : start + skip + limit]
+                return [store.todos[todo_id] for todo_id in page]
+            todos = []
+            for index in range(start, len(ids)):
+                if len(todos) == limit:
+                    break
+                record = store.todos[ids[index]]
+                if (is_done and not record.is_done) or (
+                    title_prefix and not record.title.startswith(title_prefix)
+                ):
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                todos.append(record)
+            return todos
+
+    def count_todos(
+        self, is_done: Optional[bool] = None, title_prefix: Optional[str] = None
+    ) -> int:
+        store = self.store
+        with store.lock:
+            if not title_prefix:
+                if is_done is None:
+                    return len(store.ids)
+                done = len(store.ids) - len(store.open_ids)
+                return done if is_done else len(store.open_ids)
+            return sum(
+                1
+                for record in store.todos.values()
+                if record.title.startswith(title_prefix)
+                and (is_done is None or record.is_done == is_done)
+            )
+
+    def search_todos(self, text: str, skip: int = 0, limit: int = 20) -> list:
+        terms = set(_words(text))
+        if not terms:
+            return []
+        with self.store.lock:
+            records = list(self.store.todos.values())
+        ranked = []
+        for record in records:
+            words = _words(f"{record.title or ''} {record.description or ''}")
+            if terms.issubset(words):
+                score = sum(1 for word in words if word in terms)
+                ranked.append((-score, record.id, record))
+        ranked.sort(key=lambda match: match[:2])
+        return [record for _, _, record in ranked[skip : skip + limit]]
+
+    def stream_todos(self, batch_size: int = crud.EXPORT_BATCH_SIZE):
+        store = self.store
+        after_id = 0
+        while True:
+            # The lock is only held while a batch is taken, not while it is sent.
+            with store.lock:
+                start = bisect_right(store.ids, after_id)
+                page = store.ids[start : start + batch_size]
+                batch = [store.todos[todo_id] for todo_id in page]
+            if not batch:
+                return
+            yield batch
+            after_id = batch[-1].id
+
+    def create_todo(self, todo: schemas.ToDoCreate) -> TodoRecord:
+        with self.store.lock:
+            return self.store.add(todo.title, todo.description)
+
+    def create_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        with self.store.lock:
+            return [self.store.add(todo.title, todo.description) for todo in todos]
+
+    def insert_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        return self.create_todos(todos)
+
+    def update_todo_status(self, todo_id: int, is_done: bool) -> Optional[TodoRecord]:
+        with self.store.lock:
+            return self.store.set_status(todo_id, is_done)
+
+    def update_todos_status(self, updates: dict) -> dict:
+        with self.store.lock:
+            updated = {
+                todo_id: self.store.set_status(todo_id, is_done)
+                for todo_id, is_done in updates.items()
+            }
+        return {todo_id: record for todo_id, record in updated.items() if record is not None}
+
+    def delete_todo(self, todo_id: int) -> Optional[TodoRecord]:
+        with self.store.lock:
+            return self.store.remove(todo_id)
+
+    def load_batch(self, rows: list):
+        self._pending.extend(rows)
+
+    def commit(self):
+        with self.store.lock:
+            for row in self._pending:
+                self.store.add(row["title"], row["description"])
+        self._pending = []
+
+    def rollback(self):
+        self._pending = []
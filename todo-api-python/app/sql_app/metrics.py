@@ -0,0 +1,440 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ("true", "1", "t")
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+# With several worker processes, each writes its series to a file in this directory every
+# METRICS_WRITE_SECONDS, and /metrics adds up the files of all of them.
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or None
+METRICS_WRITE_SECONDS = float(os.getenv("METRICS_WRITE_SECONDS", "1"))
+# The file of METRICS_MULTIPROC_DIR keeping the totals of the workers that exited.
+EXITED_FILE = "exited.json"
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# Requests that match no route share one label, so scanners cannot blow up the series count.
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _add(total, value):
+    # Histogram series are lists of bucket counts, sum and count.
+    if isinstance(total, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Base class of the metrics, holding one series per combination of label values.
+
+    Attributes:
+        name (str): The metric name.
+        help (str): The description shown in the exposition.
+        labels (tuple[str]): The names of the labels.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def clear(self):
+        """
+        Removes all series.
+        """
+        with self._lock:
+            self._series.clear()
+
+    def state(self) -> list:
+        """
+        Returns the series as [label values, value] pairs, for another process to add up.
+        """
+        with self._lock:
+            return [
+                [list(key), list(value) if isinstance(value, list) else value]
+                for key, value in self._series.items()
+            ]
+
+    def render(self, series: Optional[dict] = None) -> list:
+        """
+        Renders the metric in the Prometheus text format.
+
+        Parameters:
+            series (dict, optional): The series to render instead of those of this process.
+
+        Returns:
+            list[str]: The HELP, TYPE and sample lines of the metric.
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        if series is not None:
+            lines.extend(self._samples(sorted(series.items())))
+            return lines
+        with self._lock:
+            lines.extend(self._samples(sorted(self._series.items())))
+        return lines
+
+    def _samples(self, series: list) -> list:
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in series
+        ]
+
+
+class Counter(_Metric):
+    """
+    A value that only goes up, such as the number of requests served.
+    """
+
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down, such as the number of requests in flight.
+    """
+
+    type = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """
+    Counts observations into cumulative buckets, like a Prometheus histogram.
+
+    Each series keeps one count per bucket rather than the observations themselves, so
+    memory stays constant and an observation costs a binary search and an addition.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Bucket counts followed by the sum and the count of the observations.
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def _samples(self, series: list) -> list:
+        lines = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    The set of metrics exposed together on the metrics endpoint.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def clear(self):
+        """
+        Removes the series of all metrics.
+        """
+        for metric in self._metrics:
+            metric.clear()
+
+    def render(self, directory: Optional[str] = None) -> bytes:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Parameters:
+            directory (str, optional): The METRICS_MULTIPROC_DIR of the worker processes.
+                The series of this process are written to it first, then those of all
+                processes, exited ones included, are added up.
+
+        Returns:
+            bytes: The UTF-8 encoded exposition, served as PROMETHEUS_CONTENT_TYPE.
+        """
+        merged = None
+        if directory is not None:
+            self.write(directory)
+            merged = _read_states(glob.glob(os.path.join(directory, "*.json")))
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(None if merged is None else merged.get(metric.name, {})))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    def state(self) -> dict:
+        """
+        Returns the series of all metrics, by metric name, see _Metric.state.
+        """
+        return {metric.name: metric.state() for metric in self._metrics}
+
+    def write(self, directory: str, pid: Optional[int] = None):
+        """
+        Writes the series of this process to <pid>.json in directory, replacing the last write.
+
+        Parameters:
+            directory (str): The METRICS_MULTIPROC_DIR.
+            pid (int, optional): The process to write as. Defaults to this one.
+        """
+        _write_state(os.path.join(directory, f"{pid or os.getpid()}.json"), self.state())
+
+    def start_writing(self, directory: str, interval: float = METRICS_WRITE_SECONDS):
+        """
+        Writes the series of this process every interval seconds, from a daemon thread.
+
+        A scrape served by another worker sees the series of this one at most that old.
+        """
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write(directory)
+                except OSError:
+                    pass
+
+        threading.Thread(target=run, name="metrics-writer", daemon=True).start()
+
+    def collect_exited(self, directory: str, pid: int):
+        """
+        Adds the counters and histograms of an exited worker to the EXITED_FILE of directory.
+
+        The totals then keep growing when a worker is replaced, instead of dropping back.
+        Its gauges are dropped, as the requests it was serving are gone with it. Called
+        by the gunicorn master, which is the only process writing EXITED_FILE.
+
+        Parameters:
+            directory (str): The METRICS_MULTIPROC_DIR.
+            pid (int): The process ID of the worker.
+        """
+        path = os.path.join(directory, f"{pid}.json")
+        exited_path = os.path.join(directory, EXITED_FILE)
+        gauges = {metric.name for metric in self._metrics if metric.type == "gauge"}
+        merged = _read_states([exited_path, path], skip=gauges)
+        _write_state(
+            exited_path,
+            {
+                name: [[list(key), value] for key, value in series.items()]
+                for name, series in merged.items()
+            },
+        )
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _write_state(path: str, state: dict):
+    # Written aside and renamed, so that a scrape never reads half a file.
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
+
+
+def _read_states(paths: list, skip: frozenset = frozenset()) -> dict:
+    merged = {}
+    for path in paths:
+        try:
+            with open(path) as file:
+                state = json.load(file)
+        except (FileNotFoundError, ValueError):
+            # A worker that exited in the meantime, or a file still being replaced.
+            continue
+        for name, pairs in state.items():
+            if name in skip:
+                continue
+            series = merged.setdefault(name, {})
+            for labels, value in pairs:
+                key = tuple(labels)
+                series[key] = _add(series[key], value) if key in series else value
+    return merged
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from receiving a request to sending the last byte of its response.",
+        ("method", "route"),
+    )
+)
+REQUESTS = registry.register(
+    Counter(
+        "http_requests_total",
+        "Requests served, by response status.",
+        ("method", "route", "status"),
+    )
+)
+REQUESTS_IN_FLIGHT = registry.register(
+    Gauge("http_requests_in_flight", "Requests currently being served.", ("method",))
+)
+REQUEST_STATEMENTS = registry.register(
+    Histogram(
+        "http_request_db_statements",
+        "SQL statements executed while serving a request.",
+        ("method", "route"),
+        buckets=STATEMENT_BUCKETS,
+    )
+)
+REQUEST_DB_DURATION = registry.register(
+    Histogram(
+        "http_request_db_duration_seconds",
+        "Time spent executing SQL statements while serving a request.",
+        ("method", "route"),
+    )
+)
+STATEMENT_DURATION = registry.register(
+    Histogram(
+        "db_statement_duration_seconds",
+        "Time to execute a single SQL statement, including outside of requests.",
+    )
+)
+
+# The SQL counters of the request being served: [statements, seconds].
+_request_db: ContextVar[Optional[list]] = ContextVar("request_db", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    STATEMENT_DURATION.observe(elapsed)
+    counters = _request_db.get()
+    if counters is not None:
+        counters[0] += 1
+        counters[1] += elapsed
+
+
+def instrument_engine(engine):
+    """
+    Records the count and duration of the SQL statements executed through an engine.
+
+    Statements executed while a request is served are also added to the counters of
+    that request. The sync handlers run in the threadpool with a copy of the request's
+    context, so they find the same counters as the middleware.
+
+    Parameters:
+        engine (Engine): The engine to instrument, the sync_engine of an AsyncEngine.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the latency, status and SQL work of every request.
+
+    Requests are labelled with the template of the matched route, such as
+    /api/todo/{todo_id}, so the number of series stays bounded. The duration covers
+    the whole response, including the body of streaming responses.
+
+    Parameters:
+        app (ASGIApp): The application to wrap.
+        enabled (bool): Whether to record anything. Defaults to METRICS_ENABLED.
+    """
+
+    def __init__(self, app, enabled: bool = METRICS_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        counters = [0, 0.0]
+        token = _request_db.set(counters)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec(method)
+            _request_db.reset(token)
+            route = _route_of(scope)
+            REQUEST_DURATION.observe(elapsed, method, route)
+            REQUESTS.inc(method, route, str(status_code))
+            REQUEST_STATEMENTS.observe(counters[0], method, route)
+            REQUEST_DB_DURATION.observe(counters[1], method, route)
@@ -1,14 +1,13 @@
-import os
-import sys
-
-path = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(path)
-
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import DDL, BigInteger, Boolean, Column, Index, Integer, String, event, text
 
 Base = declarative_base()
 
+# Writers bump one of several counter rows at random, so they rarely wait on each other's row lock.
+TABLE_VERSION_SLOTS = 8
+# The text search configuration used to build and query the search vector on Postgres.
+SEARCH_CONFIG = "english"
+
 
 class ToDo(Base):
     """
@@ -19,11 +18,155 @@ class ToDo(Base):
         title (str): The title of the ToDo item.
         description (str): A more detailed description of the ToDo item.
         is_done (bool): A boolean flag indicating whether the ToDo item has been completed.
+        version (int): Incremented on every update of the ToDo item, used for its ETag.
     """
 
     __tablename__ = "todos"
+    __table_args__ = (
+        # Keyset pages filtered on the status seek straight to (is_done, id).
+        Index("ix_todos_is_done_id", "is_done", "id"),
+        # Most lists only show open todos, which stay a small part of the table.
+        Index(
+            "ix_todos_open",
+            "id",
+            postgresql_where=text("is_done = false"),
+            sqlite_where=text("is_done = 0"),
+        ),
+        # LIKE 'prefix%' can only use a btree index with C ordering on Postgres.
+        Index(
+            "ix_todos_title",
+            "title",
+            postgresql_ops={"title": "text_pattern_ops"},
+        ),
+        # Never reuse the ID of a deleted row on SQLite, so that (id, version) stays unique.
+        {"sqlite_autoincrement": True},
+    )
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    # 64 bits, as shard n hands out the IDs from n << sharding.SHARD_ID_BITS on. SQLite
+    # only autoincrements a column declared INTEGER, which holds 64 bits there anyway.
+    id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        index=True,
+        autoincrement=True,
+    )
     title = Column(String)
     description = Column(String)
     is_done = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+
+class TodoTableVersion(Base):
+    """
+    A slot of the modification counter of the todos table.
+
+    Database triggers add one to a random slot for every write to the todos table.
+    The sum over all slots only ever grows, so it changes whenever the table does.
+
+    Attributes:
+        slot (int): The number of the slot.
+        version (int): The number of writes counted in this slot.
+    """
+
+    __tablename__ = "todos_version"
+
+    slot = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class SchemaRevision(Base):
+    """
+    A revision of the schema the database was migrated to, see schema.migrate.
+
+    Attributes:
+        revision (int): The value of schema.SCHEMA_REVISION when the migration ran.
+    """
+
+    __tablename__ = "schema_revision"
+
+    revision = Column(Integer, primary_key=True, autoincrement=False)
+
+
+_seed_slots = ", ".join(f"({slot}, 0)" for slot in range(TABLE_VERSION_SLOTS))
+
+# The statements are idempotent, as the metadata event fires on every create_all.
+TABLE_VERSION_DDL = [
+    DDL(
+        f"INSERT INTO todos_version (slot, version) VALUES {_seed_slots} "
+        "ON CONFLICT DO NOTHING"
+    ),
+    *(
+        DDL(
+            f"CREATE TRIGGER IF NOT EXISTS todos_version_{operation.lower()} "
+            f"AFTER {operation} ON todos BEGIN "
+            "UPDATE todos_version SET version = version + 1 "
+            f"WHERE slot = (random() & {TABLE_VERSION_SLOTS - 1}); END"
+        ).execute_if(dialect="sqlite")
+        for operation in ("INSERT", "UPDATE", "DELETE")
+    ),
+    # The slot is picked once: in the WHERE clause, Postgres would call random() again for
+    # every row it scans, and bump no slot or several.
+    DDL(
+        "CREATE OR REPLACE FUNCTION bump_todos_version() RETURNS trigger AS $$ "
+        f"DECLARE picked int := floor(random() * {TABLE_VERSION_SLOTS})::int; BEGIN "
+        "UPDATE todos_version SET version = version + 1 WHERE slot = picked; "
+        "RETURN NULL; END; $$ LANGUAGE plpgsql"
+    ).execute_if(dialect="postgresql"),
+    DDL(
+        "CREATE OR REPLACE TRIGGER todos_version_bump "
+        "AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON todos "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_todos_version()"
+    ).execute_if(dialect="postgresql"),
+]
+
+for _ddl in TABLE_VERSION_DDL:
+    event.listen(Base.metadata, "after_create", _ddl)
+
+
+# Postgres keeps the search vector in a generated column, SQLite in an FTS5 index that
+# the triggers below keep in step with the todos table. Both are updated by the database
+# itself, so every write path, bulk imports included, keeps the index current.
+SEARCH_DDL = [
+    DDL(
+        "ALTER TABLE todos ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', "
+        "coalesce(title, '') || ' ' || coalesce(description, ''))) STORED"
+    ).execute_if(dialect="postgresql"),
+    DDL(
+        "CREATE INDEX IF NOT EXISTS ix_todos_search ON todos USING gin (search_vector)"
+    ).execute_if(dialect="postgresql"),
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS todos_fts USING fts5("
+        "title, description, content='todos', content_rowid='id', "
+        "tokenize='porter unicode61')"
+    ).execute_if(dialect="sqlite"),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS todos_fts_insert AFTER INSERT ON todos BEGIN "
+        "INSERT INTO todos_fts (rowid, title, description) "
+        "VALUES (new.id, new.title, new.description); END"
+    ).execute_if(dialect="sqlite"),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS todos_fts_delete AFTER DELETE ON todos BEGIN "
+        "INSERT INTO todos_fts (todos_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); END"
+    ).execute_if(dialect="sqlite"),
+    # Status changes do not touch the text, so they do not rewrite the index either.
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS todos_fts_update "
+        "AFTER UPDATE OF title, description ON todos BEGIN "
+        "INSERT INTO todos_fts (todos_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO todos_fts (rowid, title, description) "
+        "VALUES (new.id, new.title, new.description); END"
+    ).execute_if(dialect="sqlite"),
+]
+
+for _ddl in SEARCH_DDL:
+    event.listen(Base.metadata, "after_create", _ddl)
+
+# The FTS5 table is not part of the metadata, so drop it with the table it indexes.
+event.listen(
+    Base.metadata,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS todos_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,41 @@
+import base64
+import binascii
+
+CURSOR_PREFIX = "id:"
+
+
+def encode_cursor(todo_id: int) -> str:
+    """
+    Encodes the ID of the last todo on a page into an opaque cursor.
+
+    Parameters:
+        todo_id (int): The ID of the last todo item returned on the page.
+
+    Returns:
+        str: A URL-safe cursor that can be passed back as the `after` parameter.
+    """
+    raw = f"{CURSOR_PREFIX}{todo_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decodes a cursor produced by encode_cursor back into a todo ID.
+
+    Parameters:
+        cursor (str): The opaque cursor received from a previous page.
+
+    Returns:
+        int: The ID after which the next page starts.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not raw.startswith(CURSOR_PREFIX) or not raw[len(CURSOR_PREFIX):].isdigit():
+        raise ValueError("Invalid cursor")
+    return int(raw[len(CURSOR_PREFIX):])
@@ -0,0 +1,187 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolStats:
+    """
+    Collects connection pool telemetry for an engine.
+
+    Attributes:
+        checkouts (int): The number of connections handed out by the pool.
+        timeouts (int): The number of checkouts that gave up after pool_timeout.
+        wait_total (float): The total seconds spent waiting for a connection.
+        wait_max (float): The longest wait for a connection, in seconds.
+        connects (int): The number of new database connections opened.
+        connect_total (float): The total seconds spent opening connections.
+        connect_max (float): The slowest connection open, in seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Sets all counters back to zero.
+        """
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.connects = 0
+            self.connect_total = 0.0
+            self.connect_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self.connects += 1
+            self.connect_total += seconds
+            self.connect_max = max(self.connect_max, seconds)
+
+    def snapshot(self, pool) -> dict:
+        """
+        Combines the counters with the current state of the pool.
+
+        Parameters:
+            pool (Pool): The pool the counters were collected for.
+
+        Returns:
+            dict: The pool state, wait times and connect latencies, times in milliseconds.
+        """
+        with self._lock:
+            stats = {
+                "pool": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_ms_total": self.wait_total * 1000,
+                "wait_ms_max": self.wait_max * 1000,
+                "wait_ms_avg": self.wait_total * 1000 / max(self.checkouts, 1),
+                "connects": self.connects,
+                "connect_ms_total": self.connect_total * 1000,
+                "connect_ms_max": self.connect_max * 1000,
+                "connect_ms_avg": self.connect_total * 1000 / max(self.connects, 1),
+            }
+        if isinstance(pool, QueuePool):
+            stats.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+            )
+        return stats
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long each checkout waited for a free connection.
+
+    The wait includes opening a new connection when the pool is allowed to grow.
+    """
+
+    stats: PoolStats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """
+    The pool of asyncio engines, recording checkout waits like InstrumentedQueuePool.
+    """
+
+
+def instrument(engine, stats: PoolStats):
+    """
+    Attaches pool telemetry to an engine.
+
+    Connect latency is recorded for every engine, checkout waits only for engines
+    using InstrumentedQueuePool or InstrumentedAsyncAdaptedQueuePool.
+
+    Parameters:
+        engine (Engine): The engine to instrument.
+        stats (PoolStats): The collector to record into.
+    """
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    @event.listens_for(engine, "do_connect")
+    def timed_connect(dialect, conn_rec, cargs, cparams):
+        start = time.perf_counter()
+        connection = dialect.connect(*cargs, **cparams)
+        stats.record_connect(time.perf_counter() - start)
+        return connection
+
+
+class PoolMonitor:
+    """
+    Keeps the telemetry of the pool of every engine, by the role the engine plays.
+
+    Every engine records into PoolStats of its own, so that the waits on a replica or a
+    shard are not mixed up with those on the primary.
+    """
+
+    def __init__(self):
+        self._engines = {}
+
+    def instrument(self, role: str, engine) -> PoolStats:
+        """
+        Attaches pool telemetry of its own to an engine, see instrument.
+
+        Parameters:
+            role (str): The name to report the pool under, such as primary or shard:<name>.
+            engine (Engine | AsyncEngine): The engine to instrument.
+
+        Returns:
+            PoolStats: The collector of the engine.
+        """
+        engine = getattr(engine, "sync_engine", engine)
+        stats = PoolStats()
+        instrument(engine, stats)
+        self._engines[role] = (engine, stats)
+        return stats
+
+    def reset(self):
+        """
+        Sets the counters of every engine back to zero.
+        """
+        for _, stats in self._engines.values():
+            stats.reset()
+
+    def snapshot(self) -> dict:
+        """
+        Returns the snapshot of every engine, see PoolStats.snapshot.
+
+        Returns:
+            dict[str, dict]: The snapshots by role, in the order the engines were instrumented.
+        """
+        return {
+            role: stats.snapshot(engine.pool) for role, (engine, stats) in self._engines.items()
+        }
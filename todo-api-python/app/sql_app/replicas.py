@@ -0,0 +1,243 @@
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import exc
+
+ROUND_ROBIN = "round_robin"
+LEAST_CONNECTIONS = "least_connections"
+STRATEGIES = (ROUND_ROBIN, LEAST_CONNECTIONS)
+
+# Set on write responses, so that the next reads of the client go to the primary.
+LAST_WRITE_COOKIE = "todo_last_write"
+
+# Session.info key holding the name of the replica a session reads from.
+REPLICA_INFO_KEY = "replica"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class Replica:
+    """
+    A read replica and its state in the ReplicaSet.
+
+    Attributes:
+        name (str): The name shown in the statistics, such as the host of the replica.
+        session_factory (sessionmaker): Creates sessions bound to the replica.
+        engine (Engine | AsyncEngine | None): The engine of the replica.
+        in_flight (int): The number of requests currently reading from the replica.
+        reads (int): The number of requests that read from the replica.
+        failures (int): The number of times the replica could not be connected to.
+        unhealthy_until (float): The monotonic time before which the replica is skipped.
+        last_error (str | None): The last connection error of the replica.
+    """
+
+    def __init__(self, name: str, session_factory, engine=None):
+        self.name = name
+        self.session_factory = session_factory
+        self.engine = engine
+        self.in_flight = 0
+        self.reads = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+        self.last_error = None
+
+
+class ReplicaSet:
+    """
+    Spreads the reads of the API over read replicas.
+
+    A replica that cannot be connected to is skipped for retry_after seconds, and
+    reads go to the primary while no replica is healthy. A client that wrote within
+    the last read_your_writes seconds reads from the primary, which the replicas may
+    not have caught up with yet.
+
+    Attributes:
+        replicas (list[Replica]): The replicas, none to read from the primary only.
+        strategy (str): ROUND_ROBIN or LEAST_CONNECTIONS.
+        read_your_writes (float): The seconds after a write during which a client reads from the primary.
+        retry_after (float): The seconds an unhealthy replica is skipped for.
+        fallbacks (int): The number of reads sent to the primary because of unhealthy replicas.
+    """
+
+    def __init__(
+        self,
+        replicas: list,
+        strategy: str = ROUND_ROBIN,
+        read_your_writes: float = 5.0,
+        retry_after: float = 10.0,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                f"Unknown replica strategy {strategy!r}, expected one of {', '.join(STRATEGIES)}"
+            )
+        self.replicas = replicas
+        self.strategy = strategy
+        self.read_your_writes = read_your_writes
+        self.retry_after = retry_after
+        self.fallbacks = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wrote_recently(self, last_write: Optional[str]) -> bool:
+        """
+        Checks whether a client wrote within the read-your-writes window.
+
+        Parameters:
+            last_write (str | None): The LAST_WRITE_COOKIE of the client, a Unix time.
+
+        Returns:
+            bool: True if the client has to read from the primary.
+        """
+        try:
+            return time.time() - float(last_write) < self.read_your_writes
+        except (TypeError, ValueError):
+            return False
+
+    def acquire(self) -> Optional[Replica]:
+        """
+        Picks a healthy replica for a read and counts the read as in flight.
+
+        Returns:
+            Replica | None: The replica, or None if no replica is healthy.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [
+                replica for replica in self.replicas if replica.unhealthy_until <= now
+            ]
+            if not healthy:
+                self.fallbacks += 1
+                return None
+            if self.strategy == LEAST_CONNECTIONS:
+                replica = min(healthy, key=lambda replica: replica.in_flight)
+            else:
+                replica = healthy[self._next % len(healthy)]
+                self._next += 1
+            replica.in_flight += 1
+            replica.reads += 1
+            return replica
+
+    def release(self, replica: Replica):
+        with self._lock:
+            replica.in_flight -= 1
+
+    def mark_unhealthy(self, replica: Replica, error: Exception):
+        with self._lock:
+            # The read that noticed the failure goes to the primary.
+            self.fallbacks += 1
+            replica.failures += 1
+            replica.unhealthy_until = time.monotonic() + self.retry_after
+            replica.last_error = str(error)
+
+    def connect(self, replica: Replica):
+        """
+        Opens a session on a replica, marking the replica unhealthy if it cannot be reached.
+
+        The connection is made before the request handler runs, so that an unreachable
+        replica costs a fallback to the primary rather than a failed request.
+
+        Returns:
+            Session | None: The connected session, or None if the replica is unhealthy.
+        """
+        db = replica.session_factory()
+        try:
+            db.connection()
+        except exc.DBAPIError as error:
+            db.close()
+            self.mark_unhealthy(replica, error)
+            return None
+        db.info[REPLICA_INFO_KEY] = replica.name
+        return db
+
+    async def connect_async(self, replica: Replica):
+        """
+        Opens an AsyncSession on a replica, see connect.
+
+        Returns:
+            AsyncSession | None: The connected session, or None if the replica is unhealthy.
+        """
+        db = replica.session_factory()
+        try:
+            await db.connection()
+        except exc.DBAPIError as error:
+            await db.close()
+            self.mark_unhealthy(replica, error)
+            return None
+        db.info[REPLICA_INFO_KEY] = replica.name
+        return db
+
+    def stats(self) -> dict:
+        """
+        Returns the routing settings and the state of every replica.
+
+        Returns:
+            dict: The strategy, windows, fallbacks and the reads, in-flight requests and health per replica.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "read_your_writes_seconds": self.read_your_writes,
+                "retry_after_seconds": self.retry_after,
+                "fallbacks": self.fallbacks,
+                "replicas": [
+                    {
+                        "name": replica.name,
+                        "healthy": replica.unhealthy_until <= now,
+                        "in_flight": replica.in_flight,
+                        "reads": replica.reads,
+                        "failures": replica.failures,
+                        "last_error": replica.last_error,
+                    }
+                    for replica in self.replicas
+                ],
+            }
+
+
+def reads_from_replica(db) -> bool:
+    """
+    Checks whether a session reads from a replica, which may lag behind the primary.
+    """
+    return REPLICA_INFO_KEY in getattr(db, "info", {})
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware setting LAST_WRITE_COOKIE on the successful writes of a client.
+
+    The cookie carries the time of the write, so any worker process can send the
+    following reads of the client to the primary. Nothing is set while the replica
+    set has no replicas.
+
+    Parameters:
+        app (ASGIApp): The application to wrap.
+        replica_set (ReplicaSet): The replica set whose read-your-writes window is used.
+    """
+
+    def __init__(self, app, replica_set: ReplicaSet):
+        self.app = app
+        self.replica_set = replica_set
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or not self.replica_set.replicas
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{LAST_WRITE_COOKIE}={time.time():.3f}; "
+                    f"Max-Age={int(self.replica_set.read_your_writes) + 1}; Path=/; "
+                    "HttpOnly; SameSite=Lax"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
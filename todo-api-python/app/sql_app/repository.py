@@ -0,0 +1,183 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud, importer, schemas
+from .replicas import reads_from_replica
+
+
+class TodoRepository(ABC):
+    """
+    The storage of the todos, as used by the request handlers of the sync router.
+
+    A repository lives for one request. The implementations are SQLAlchemyRepository,
+    running the queries of crud on a session, InMemoryRepository of memory.py and
+    ShardedRepository of sharding.py. Todos are returned as objects with the id, title,
+    description, is_done and version attributes of models.ToDo; the write methods may
+    return them without the version.
+    """
+
+    # Whether the reads may come from a replica that lags behind the primary.
+    reads_from_replica = False
+
+    @abstractmethod
+    def get_todo(self, todo_id: int):
+        """See crud.get_todo."""
+
+    @abstractmethod
+    def get_todo_version(self, todo_id: int) -> Optional[int]:
+        """See crud.get_todo_version."""
+
+    @abstractmethod
+    def get_table_version(self) -> int:
+        """See crud.get_table_version."""
+
+    @abstractmethod
+    def get_todos(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        after_id: Optional[int] = None,
+        is_done: Optional[bool] = None,
+        title_prefix: Optional[str] = None,
+    ) -> list:
+        """See crud.get_todos."""
+
+    @abstractmethod
+    def count_todos(
+        self, is_done: Optional[bool] = None, title_prefix: Optional[str] = None
+    ) -> int:
+        """See crud.count_todos."""
+
+    @abstractmethod
+    def search_todos(self, text: str, skip: int = 0, limit: int = 20) -> list:
+        """See crud.search_todos."""
+
+    @abstractmethod
+    def stream_todos(self, batch_size: int = crud.EXPORT_BATCH_SIZE):
+        """See crud.stream_todos."""
+
+    @abstractmethod
+    def create_todo(self, todo: schemas.ToDoCreate):
+        """See crud.create_todo."""
+
+    @abstractmethod
+    def create_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        """See crud.create_todos."""
+
+    @abstractmethod
+    def insert_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        """See crud.insert_todos."""
+
+    @abstractmethod
+    def update_todo_status(self, todo_id: int, is_done: bool):
+        """See crud.update_todo_status."""
+
+    @abstractmethod
+    def update_todos_status(self, updates: dict) -> dict:
+        """See crud.update_todos_status."""
+
+    @abstractmethod
+    def delete_todo(self, todo_id: int):
+        """See crud.delete_todo."""
+
+    @abstractmethod
+    def load_batch(self, rows: list):
+        """
+        Writes a batch of imported rows, which only become visible on commit.
+
+        Parameters:
+            rows (list[dict]): The rows to insert, with a title and a description.
+        """
+
+    @abstractmethod
+    def commit(self):
+        """Makes the rows loaded since the last commit or rollback visible."""
+
+    @abstractmethod
+    def rollback(self):
+        """Discards the rows loaded since the last commit or rollback."""
+
+    def close(self):
+        """Releases what the repository holds once the request is over."""
+
+
+class SQLAlchemyRepository(TodoRepository):
+    """
+    Runs the queries of crud on a database session.
+
+    Parameters:
+        db (Session): The session of the request, on the primary or a read replica.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @property
+    def reads_from_replica(self) -> bool:
+        return reads_from_replica(self.db)
+
+    def get_todo(self, todo_id: int):
+        return crud.get_todo(self.db, todo_id=todo_id)
+
+    def get_todo_version(self, todo_id: int) -> Optional[int]:
+        return crud.get_todo_version(self.db, todo_id=todo_id)
+
+    def get_table_version(self) -> int:
+        return crud.get_table_version(self.db)
+
+    def get_todos(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        after_id: Optional[int] = None,
+        is_done: Optional[bool] = None,
+        title_prefix: Optional[str] = None,
+    ) -> list:
+        return crud.get_todos(
+            self.db,
+            skip=skip,
+            limit=limit,
+            after_id=after_id,
+            is_done=is_done,
+            title_prefix=title_prefix,
+        )
+
+    def count_todos(
+        self, is_done: Optional[bool] = None, title_prefix: Optional[str] = None
+    ) -> int:
+        return crud.count_todos(self.db, is_done=is_done, title_prefix=title_prefix)
+
+    def search_todos(self, text: str, skip: int = 0, limit: int = 20) -> list:
+        return crud.search_todos(self.db, text, skip=skip, limit=limit)
+
+    def stream_todos(self, batch_size: int = crud.EXPORT_BATCH_SIZE):
+        return crud.stream_todos(self.db, batch_size=batch_size)
+
+    def create_todo(self, todo: schemas.ToDoCreate):
+        return crud.create_todo(self.db, todo=todo)
+
+    def create_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        return crud.create_todos(self.db, todos=todos)
+
+    def insert_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        return crud.insert_todos(self.db, todos)
+
+    def update_todo_status(self, todo_id: int, is_done: bool):
+        return crud.update_todo_status(self.db, todo_id=todo_id, is_done=is_done)
+
+    def update_todos_status(self, updates: dict) -> dict:
+        return crud.update_todos_status(self.db, updates)
+
+    def delete_todo(self, todo_id: int):
+        return crud.delete_todo(self.db, todo_id=todo_id)
+
+    def load_batch(self, rows: list):
+        importer.load_batch(self.db, rows)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
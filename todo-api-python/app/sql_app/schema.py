@@ -0,0 +1,120 @@
+from typing import Optional
+
+from sqlalchemy import func, inspect, insert, select, text
+
+from . import models
+
+# Bump whenever models.py changes a table, an index or the DDL run after create_all, so
+# that the next migration brings existing databases up to date.
+SCHEMA_REVISION = 3
+
+# The key of the Postgres advisory lock that lets a single process migrate at a time.
+MIGRATION_LOCK_ID = 7_270_451
+
+
+def _upgrade_first_todos(connection):
+    # A todos table created before the revisions lacks the version column and the indexes
+    # added since, which create_all does not add to a table that exists.
+    columns = {column["name"] for column in inspect(connection).get_columns("todos")}
+    if "version" not in columns:
+        connection.execute(
+            text("ALTER TABLE todos ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        )
+    for index in models.ToDo.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    for ddl in [*models.TABLE_VERSION_DDL, *models.SEARCH_DDL]:
+        ddl(models.Base.metadata, connection)
+    if connection.dialect.name == "sqlite":
+        # The triggers only index the rows written from now on.
+        connection.execute(text("INSERT INTO todos_fts (todos_fts) VALUES ('rebuild')"))
+
+
+def _widen_todo_ids(connection):
+    # Shards hand out IDs from 2 ** 40 on, beyond the integer column and serial sequence
+    # Postgres creates for an Integer primary key.
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text("ALTER TABLE todos ALTER COLUMN id TYPE bigint"))
+    sequence = connection.execute(
+        text("SELECT pg_get_serial_sequence('todos', 'id')")
+    ).scalar()
+    if sequence is not None:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} AS bigint"))
+
+
+# The changes create_all does not make to existing tables, by the revision introducing them.
+# Revision 3 replaced the bump_todos_version function, which create_all does by itself.
+MIGRATIONS = {1: _upgrade_first_todos, 2: _widen_todo_ids}
+
+
+def schema_revision(connection) -> Optional[int]:
+    """
+    Returns the revision of the schema of a database.
+
+    Parameters:
+        connection (Connection): A connection to the database.
+
+    Returns:
+        int | None: The last revision migrated to, or None if the database was never migrated.
+    """
+    if not inspect(connection).has_table(models.SchemaRevision.__tablename__):
+        return None
+    return connection.execute(select(func.max(models.SchemaRevision.revision))).scalar()
+
+
+def migrate(engine) -> bool:
+    """
+    Brings the schema of a database up to SCHEMA_REVISION.
+
+    Creating the tables runs DDL that locks the todos table on Postgres, so it is done
+    once per revision instead of on every start: a database already at the revision
+    costs a single query. Existing tables are then altered by the MIGRATIONS of the
+    revisions they are missing. Concurrent migrations of the same Postgres database wait for
+    each other, and all but the first find nothing left to do.
+
+    Parameters:
+        engine (Engine): The engine of the database.
+
+    Returns:
+        bool: Whether the schema was changed.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_ID}
+            )
+        current = schema_revision(connection) or 0
+        if current >= SCHEMA_REVISION:
+            return False
+        models.Base.metadata.create_all(bind=connection)
+        for revision in range(current + 1, SCHEMA_REVISION + 1):
+            if revision in MIGRATIONS:
+                MIGRATIONS[revision](connection)
+        connection.execute(
+            insert(models.SchemaRevision).values(revision=SCHEMA_REVISION)
+        )
+    return True
+
+
+def migrate_databases() -> list:
+    """
+    Migrates the databases the app writes to: the primary, or every shard.
+
+    Read replicas receive the schema from their primary.
+
+    Returns:
+        list[str]: The names of the databases whose schema was changed.
+    """
+    # Imported here, as the database module imports this one through sharding.
+    from .database import MEMORY_BACKEND, STORAGE_BACKEND, engine, replica_name, shard_set
+
+    if shard_set.shards:
+        return [shard.name for shard in shard_set.prepare()]
+    if STORAGE_BACKEND == MEMORY_BACKEND:
+        return []
+    return [replica_name(str(engine.url))] if migrate(engine) else []
+
+
+if __name__ == "__main__":
+    migrated = migrate_databases()
+    print(f"Migrated {', '.join(migrated)}" if migrated else "The schema is up to date")
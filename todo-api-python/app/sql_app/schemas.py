@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -29,3 +31,16 @@ class ToDo(ToDoBase):
 
     class Config:
         from_attributes = True
+
+
+class ToDoPage(BaseModel):
+    """
+    Represents one page of todos returned by cursor-based pagination.
+
+    Attributes:
+        items (list[ToDo]): The todo items on this page, ordered by ID.
+        next_cursor (str | None): Cursor for the next page, or None if this is the last page.
+    """
+
+    items: list[ToDo]
+    next_cursor: Optional[str] = None
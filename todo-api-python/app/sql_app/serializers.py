@@ -0,0 +1,98 @@
+import json
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in the requirements
+    orjson = None
+
+
+def todo_to_dict(todo) -> dict:
+    """
+    Converts a todo item into the dict sent over the wire.
+
+    Reads the four columns directly instead of walking the object generically like
+    jsonable_encoder does, which is where most of the time of a list response went.
+
+    Parameters:
+        todo (models.ToDo | schemas.ToDo): The todo item to convert.
+
+    Returns:
+        dict: The todo item with its id, title, description and is_done fields.
+    """
+    return {
+        "id": todo.id,
+        "title": todo.title,
+        "description": todo.description,
+        "is_done": todo.is_done,
+    }
+
+
+def dumps(content) -> bytes:
+    """
+    Serializes JSON-compatible content to the same bytes JSONResponse would produce.
+
+    Parameters:
+        content: The dicts, lists and scalars to serialize.
+
+    Returns:
+        bytes: The compact UTF-8 encoded JSON document.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def serialize_todo(todo) -> bytes:
+    """
+    Serializes a single todo item.
+
+    Parameters:
+        todo (models.ToDo | schemas.ToDo): The todo item to serialize.
+
+    Returns:
+        bytes: The JSON document of the todo item.
+    """
+    return dumps(todo_to_dict(todo))
+
+
+def serialize_todos(todos) -> bytes:
+    """
+    Serializes a list of todo items.
+
+    Parameters:
+        todos (list): The todo items to serialize.
+
+    Returns:
+        bytes: The JSON array of the todo items.
+    """
+    return dumps([todo_to_dict(todo) for todo in todos])
+
+
+def serialize_ndjson(todos) -> bytes:
+    """
+    Serializes todo items as newline-delimited JSON, one document per line.
+
+    Parameters:
+        todos (list): The todo items or rows to serialize.
+
+    Returns:
+        bytes: The NDJSON lines, each terminated by a newline.
+    """
+    return b"".join(dumps(todo_to_dict(todo)) + b"\n" for todo in todos)
+
+
+class FastJSONResponse(Response):
+    """
+    A JSON response that accepts pre-serialized bytes or serializes content with dumps.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
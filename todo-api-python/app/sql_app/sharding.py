@@ -0,0 +1,390 @@
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from typing import Optional
+
+from sqlalchemy import func, select, text
+
+from . import crud, importer, models, schemas
+from .repository import TodoRepository
+from .schema import migrate
+
+# The shard of a todo is kept in the bits of its ID above the lowest SHARD_ID_BITS, so
+# shard n hands out the IDs from n << SHARD_ID_BITS on. IDs stay below 2 ** 53, which
+# JSON clients can represent exactly, for up to 8192 shards of a trillion todos each.
+SHARD_ID_BITS = 40
+
+
+def shard_of(todo_id: int) -> int:
+    """
+    Returns the index of the shard holding a todo, decoded from its ID.
+    """
+    return todo_id >> SHARD_ID_BITS
+
+
+def first_id(index: int) -> int:
+    """
+    Returns the lowest ID a shard can hand out.
+    """
+    return max(index << SHARD_ID_BITS, 1)
+
+
+class Shard:
+    """
+    A database holding a part of the todos table.
+
+    Attributes:
+        name (str): The name shown in the statistics, such as the host of the database.
+        session_factory (sessionmaker): Creates sessions bound to the shard.
+        engine (Engine | None): The engine of the shard.
+        reads (int): The number of sessions opened to read from the shard.
+        writes (int): The number of sessions opened to write to the shard.
+    """
+
+    def __init__(self, name: str, session_factory, engine=None):
+        self.name = name
+        self.session_factory = session_factory
+        self.engine = engine
+        self.reads = 0
+        self.writes = 0
+
+
+class ShardSet:
+    """
+    Spreads the todos table over several databases by ID.
+
+    The position of a shard in the list is encoded in the IDs it hands out, see
+    SHARD_ID_BITS, so shards can be added at the end but never reordered or removed.
+    A todo is read, updated and deleted on the shard its ID names. New todos go to the
+    shards in turn. Lists are read from all shards at once and merged in ID order.
+
+    Attributes:
+        shards (list[Shard]): The shards, none to store the todos in a single database.
+        fanout (int): The most shard queries run at once by scatter.
+    """
+
+    def __init__(self, shards: list, fanout: int = 32):
+        self.shards = shards
+        self.fanout = fanout
+        self._next = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def shard_for(self, todo_id: int) -> Optional[Shard]:
+        """
+        Returns the shard holding a todo.
+
+        Returns:
+            Shard | None: The shard, or None if the ID belongs to no shard.
+        """
+        index = shard_of(todo_id)
+        return self.shards[index] if 0 <= index < len(self.shards) else None
+
+    def next_shard(self) -> Shard:
+        """
+        Picks the shard for new todos, taking the shards in turn.
+        """
+        with self._lock:
+            shard = self.shards[self._next % len(self.shards)]
+            self._next += 1
+        return shard
+
+    def connect(self, shard: Shard, write: bool = False):
+        """
+        Opens a session on a shard, which the caller has to close.
+
+        Returns:
+            Session: The database session of the shard.
+        """
+        with self._lock:
+            if write:
+                shard.writes += 1
+            else:
+                shard.reads += 1
+        return shard.session_factory()
+
+    @contextmanager
+    def session(self, shard: Shard, write: bool = False):
+        """
+        Opens a session on a shard for the duration of the with block.
+
+        Yields:
+            Session: The database session of the shard.
+        """
+        db = self.connect(shard, write=write)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def scatter(self, query, shards: Optional[list] = None) -> list:
+        """
+        Runs a query on several shards at once, each in its own session.
+
+        Parameters:
+            query: The function to run, called as query(db) with the session of a shard.
+            shards (list[Shard], optional): The shards to query. Defaults to all of them.
+
+        Returns:
+            list: The result of every shard, in the order of the shards.
+        """
+        shards = self.shards if shards is None else shards
+
+        def run(shard):
+            with self.session(shard) as db:
+                return query(db)
+
+        if len(shards) <= 1:
+            return [run(shard) for shard in shards]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.fanout, thread_name_prefix="shard"
+                )
+        return list(self._executor.map(run, shards))
+
+    def prepare(self) -> list:
+        """
+        Migrates the schema of every shard and moves its ID sequence into its ID range.
+
+        Returns:
+            list[Shard]: The shards whose schema was changed.
+        """
+        migrated = []
+        for index, shard in enumerate(self.shards):
+            if migrate(shard.engine):
+                migrated.append(shard)
+            with shard.engine.begin() as connection:
+                reserve_id_range(connection, index)
+        return migrated
+
+    def stats(self) -> dict:
+        """
+        Returns the shards with their ID ranges and the sessions opened on them.
+
+        Returns:
+            dict: The fan-out limit and the name, first ID, reads and writes of every shard.
+        """
+        with self._lock:
+            return {
+                "fanout": self.fanout,
+                "shards": [
+                    {
+                        "name": shard.name,
+                        "first_id": first_id(index),
+                        "reads": shard.reads,
+                        "writes": shard.writes,
+                    }
+                    for index, shard in enumerate(self.shards)
+                ],
+            }
+
+
+def reserve_id_range(connection, index: int):
+    """
+    Makes the autoincrement of a shard continue in the ID range of the shard.
+
+    The sequence is only ever moved forward, so preparing a shard again is harmless.
+
+    Parameters:
+        connection (Connection): A connection to the shard, in a transaction.
+        index (int): The position of the shard in the ShardSet.
+    """
+    table = models.ToDo.__table__
+    last_id = connection.execute(select(func.max(table.c.id))).scalar() or 0
+    start = max(first_id(index) - 1, last_id)
+    if connection.dialect.name == "postgresql":
+        connection.execute(
+            text("SELECT setval(pg_get_serial_sequence('todos', 'id'), :next, false)"),
+            {"next": start + 1},
+        )
+        return
+    # SQLite keeps the last AUTOINCREMENT value of every table in sqlite_sequence.
+    current = connection.execute(
+        text("SELECT seq FROM sqlite_sequence WHERE name = 'todos'")
+    ).scalar()
+    if current is None:
+        connection.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES ('todos', :start)"),
+            {"start": start},
+        )
+    elif current < start:
+        connection.execute(
+            text("UPDATE sqlite_sequence SET seq = :start WHERE name = 'todos'"),
+            {"start": start},
+        )
+
+
+class ShardedRepository(TodoRepository):
+    """
+    Stores the todos on the shards of a ShardSet.
+
+    A todo is read, updated and deleted on the shard its ID names. Batches, including
+    a whole import, are written to a single shard, so that they are still created or
+    rejected as a whole. Lists, counts and searches query all shards at once.
+
+    Parameters:
+        shards (ShardSet): The shards.
+    """
+
+    def __init__(self, shards: ShardSet):
+        self.shards = shards
+        # The session of an import in progress, which stays on one shard.
+        self._import = None
+
+    @contextmanager
+    def _session_for(self, todo_id: int, write: bool = False):
+        shard = self.shards.shard_for(todo_id)
+        if shard is None:
+            yield None
+            return
+        with self.shards.session(shard, write=write) as db:
+            yield db
+
+    def get_todo(self, todo_id: int):
+        with self._session_for(todo_id) as db:
+            return crud.get_todo(db, todo_id=todo_id) if db is not None else None
+
+    def get_todo_version(self, todo_id: int) -> Optional[int]:
+        with self._session_for(todo_id) as db:
+            return crud.get_todo_version(db, todo_id=todo_id) if db is not None else None
+
+    def get_table_version(self) -> int:
+        """
+        Returns the sum of the modification counters of all shards.
+
+        Every counter only ever grows, so the sum changes whenever any shard does.
+        """
+        return sum(self.shards.scatter(crud.get_table_version))
+
+    def get_todos(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        after_id: Optional[int] = None,
+        is_done: Optional[bool] = None,
+        title_prefix: Optional[str] = None,
+    ) -> list:
+        """
+        Retrieves todos from all shards in ascending ID order, see crud.get_todos.
+
+        Every shard returns its first skip + limit matching todos, or its first limit
+        todos after after_id, and the sorted lists are merged by ID. Shards whose whole
+        ID range lies before after_id are not queried, so cursor pages stay as cheap as
+        on a single database while deep OFFSET pages cost skip + limit rows per shard.
+        """
+        filters = {"is_done": is_done, "title_prefix": title_prefix}
+        if after_id is not None:
+            skip = 0
+            candidates = [
+                shard
+                for index, shard in enumerate(self.shards.shards)
+                if first_id(index + 1) - 1 > after_id
+            ]
+        else:
+            candidates = self.shards.shards
+        results = self.shards.scatter(
+            lambda db: crud.get_todos(db, limit=skip + limit, after_id=after_id, **filters),
+            candidates,
+        )
+        merged = heapq.merge(*results, key=lambda todo: todo.id)
+        return list(islice(merged, skip, skip + limit))
+
+    def count_todos(
+        self, is_done: Optional[bool] = None, title_prefix: Optional[str] = None
+    ) -> int:
+        return sum(
+            self.shards.scatter(
+                lambda db: crud.count_todos(db, is_done=is_done, title_prefix=title_prefix)
+            )
+        )
+
+    def search_todos(self, text: str, skip: int = 0, limit: int = 20) -> list:
+        """
+        Searches the todos of all shards, see crud.search_todos.
+
+        The relevance scores of different databases are not comparable, so the ranked
+        results of the shards are interleaved: the best match of every shard comes
+        first, then the second best of every shard, and so on.
+        """
+        results = self.shards.scatter(
+            lambda db: crud.search_todos(db, text, skip=0, limit=skip + limit)
+        )
+        longest = max(map(len, results), default=0)
+        interleaved = [
+            result[rank]
+            for rank in range(longest)
+            for result in results
+            if rank < len(result)
+        ]
+        return interleaved[skip : skip + limit]
+
+    def stream_todos(self, batch_size: int = crud.EXPORT_BATCH_SIZE):
+        """
+        Streams the todos of all shards in batches, ordered by ID, see crud.stream_todos.
+
+        The ID ranges of the shards follow each other, so reading the shards one after
+        the other keeps the ID order and holds a single cursor open at a time.
+        """
+        for shard in self.shards.shards:
+            with self.shards.session(shard) as db:
+                yield from crud.stream_todos(db, batch_size=batch_size)
+
+    def create_todo(self, todo: schemas.ToDoCreate):
+        with self.shards.session(self.shards.next_shard(), write=True) as db:
+            return crud.create_todo(db, todo=todo)
+
+    def create_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        with self.shards.session(self.shards.next_shard(), write=True) as db:
+            return crud.create_todos(db, todos=todos)
+
+    def insert_todos(self, todos: list[schemas.ToDoCreate]) -> list:
+        with self.shards.session(self.shards.next_shard(), write=True) as db:
+            return crud.insert_todos(db, todos)
+
+    def update_todo_status(self, todo_id: int, is_done: bool):
+        with self._session_for(todo_id, write=True) as db:
+            if db is None:
+                return None
+            return crud.update_todo_status(db, todo_id=todo_id, is_done=is_done)
+
+    def update_todos_status(self, updates: dict) -> dict:
+        """
+        Updates the status of several todos, in one transaction per shard.
+        """
+        by_shard = {}
+        for todo_id, is_done in updates.items():
+            shard = self.shards.shard_for(todo_id)
+            if shard is not None:
+                by_shard.setdefault(shard, {})[todo_id] = is_done
+        updated = {}
+        for shard, shard_updates in by_shard.items():
+            with self.shards.session(shard, write=True) as db:
+                updated.update(crud.update_todos_status(db, shard_updates))
+        return updated
+
+    def delete_todo(self, todo_id: int):
+        with self._session_for(todo_id, write=True) as db:
+            return crud.delete_todo(db, todo_id=todo_id) if db is not None else None
+
+    def load_batch(self, rows: list):
+        if self._import is None:
+            self._import = self.shards.connect(self.shards.next_shard(), write=True)
+        importer.load_batch(self._import, rows)
+
+    def commit(self):
+        if self._import is not None:
+            self._import.commit()
+            self.close()
+
+    def rollback(self):
+        if self._import is not None:
+            self._import.rollback()
+            self.close()
+
+    def close(self):
+        if self._import is not None:
+            self._import.close()
+            self._import = None
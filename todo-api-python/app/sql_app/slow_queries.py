@@ -0,0 +1,211 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger("sql_app.slow_queries")
+
+# Passed as an execution option to keep the EXPLAIN statements out of the log.
+SKIP_OPTION = "skip_slow_query_log"
+
+# Plans are only captured for these statements, as EXPLAIN ANALYZE runs the statement.
+READ_ONLY_PREFIXES = ("select", "with")
+
+
+def parameters_shape(parameters, executemany: bool = False):
+    """
+    Describes the parameters of a statement by their types instead of their values.
+
+    Parameters:
+        parameters: The DBAPI parameters, a dict or a sequence, or a list of them for executemany.
+        executemany (bool): Whether the statement was executed once per parameter set.
+
+    Returns:
+        The parameter names or positions mapped to type names, and the number of rows for executemany.
+    """
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "row": parameters_shape(rows[0]) if rows else None}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if parameters:
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def explain_statement(dialect: str, statement: str) -> Optional[str]:
+    """
+    Prefixes a statement with the EXPLAIN syntax of the dialect.
+
+    Parameters:
+        dialect (str): The name of the SQLAlchemy dialect.
+        statement (str): The SQL statement as sent to the driver.
+
+    Returns:
+        str | None: The EXPLAIN statement, or None if plans are not captured for the dialect.
+    """
+    if dialect == "postgresql":
+        return f"EXPLAIN (ANALYZE, BUFFERS) {statement}"
+    if dialect == "sqlite":
+        return f"EXPLAIN QUERY PLAN {statement}"
+    return None
+
+
+class SlowQueryLog:
+    """
+    Records statements slower than a threshold into a bounded ring buffer.
+
+    A sample of the recorded statements is explained on a background thread, with the
+    same parameters and in a transaction that is rolled back, and the plan is attached
+    to the entry once it is ready. Only read-only statements are explained, and samples
+    are dropped rather than queued while the explain thread is busy.
+
+    Attributes:
+        threshold (float): The duration in seconds above which a statement is recorded.
+        sample_rate (float): The fraction of recorded statements that are explained.
+        route (ContextVar): The route template of the request being served, set by the app.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        sample_rate: float = 0.1,
+        size: int = 100,
+        max_pending: int = 4,
+    ):
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.route: ContextVar[Optional[str]] = ContextVar("slow_query_route", default=None)
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._max_pending = max_pending
+        self._pending = 0
+        self._executor = None
+
+    def record(self, conn, statement: str, parameters, executemany: bool, seconds: float):
+        """
+        Adds a slow statement to the log and schedules the capture of its plan if sampled.
+
+        Parameters:
+            conn (Connection): The connection that executed the statement.
+            statement (str): The SQL statement as sent to the driver.
+            parameters: The DBAPI parameters of the statement.
+            executemany (bool): Whether the statement was executed once per parameter set.
+            seconds (float): The execution time of the statement.
+        """
+        entry = {
+            "statement": statement,
+            "parameters": parameters_shape(parameters, executemany),
+            "duration_ms": round(seconds * 1000, 3),
+            "route": self.route.get(),
+            "recorded_at": time.time(),
+            "plan": None,
+        }
+        logger.warning(
+            "Slow query took %.1f ms in process %d on route %s: %s (parameters %s)",
+            entry["duration_ms"],
+            os.getpid(),
+            entry["route"],
+            statement,
+            entry["parameters"],
+        )
+        with self._lock:
+            self._entries.append(entry)
+        if self._should_explain(conn, statement, executemany):
+            self._submit(conn.engine, entry, statement, parameters)
+
+    def _should_explain(self, conn, statement: str, executemany: bool) -> bool:
+        return (
+            not executemany
+            # The engine of an async connection cannot be used from the explain thread.
+            and not conn.dialect.is_async
+            and statement.lstrip().lower().startswith(READ_ONLY_PREFIXES)
+            and explain_statement(conn.dialect.name, statement) is not None
+            and random.random() < self.sample_rate
+        )
+
+    def _submit(self, engine, entry: dict, statement: str, parameters):
+        with self._lock:
+            if self._pending >= self._max_pending:
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="slow-query-explain"
+                )
+        self._executor.submit(self._explain, engine, entry, statement, parameters)
+
+    def _explain(self, engine, entry: dict, statement: str, parameters):
+        try:
+            explain = explain_statement(engine.dialect.name, statement)
+            with engine.connect() as conn:
+                transaction = conn.begin()
+                try:
+                    rows = conn.exec_driver_sql(
+                        explain, parameters, execution_options={SKIP_OPTION: True}
+                    ).all()
+                finally:
+                    transaction.rollback()
+            entry["plan"] = [" ".join(str(value) for value in row) for row in rows]
+        except Exception as exc:
+            entry["plan"] = [f"EXPLAIN failed: {exc}"]
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def entries(self) -> list:
+        """
+        Returns the recorded statements, the most recent first.
+
+        Returns:
+            list[dict]: The statement, parameter shape, duration, route and plan of each entry.
+        """
+        with self._lock:
+            return [dict(entry) for entry in reversed(self._entries)]
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def wait(self):
+        """
+        Blocks until the plans scheduled so far have been captured.
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+
+
+def instrument_slow_queries(engine, log: SlowQueryLog):
+    """
+    Records the statements of an engine that take longer than the threshold of the log.
+
+    Parameters:
+        engine (Engine): The engine to instrument, the sync_engine of an AsyncEngine.
+        log (SlowQueryLog): The log to record into.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def check_duration(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None or context.execution_options.get(SKIP_OPTION):
+            return
+        seconds = time.perf_counter() - started
+        if seconds >= log.threshold:
+            log.record(conn, statement, parameters, executemany, seconds)
@@ -0,0 +1,181 @@
+import math
+import os
+from typing import MutableMapping, NamedTuple, Optional
+
+# The threadpool size anyio gives the sync handlers when nothing else is configured.
+DEFAULT_THREADS = 40
+
+
+class ServerPlan(NamedTuple):
+    """
+    The number of worker processes and the resources of each.
+
+    Attributes:
+        workers (int): The number of worker processes.
+        threads (int): The size of the threadpool running the sync handlers of a worker.
+        pool_size (int): The connections a worker keeps open to each database server.
+        max_overflow (int): The connections a worker may open beyond pool_size.
+    """
+
+    workers: int
+    threads: int
+    pool_size: int
+    max_overflow: int
+
+    @property
+    def connections(self) -> int:
+        """The most connections all workers together open to one database server."""
+        return self.workers * (self.pool_size + self.max_overflow)
+
+
+def cgroup_cpu_quota(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """
+    Reads the CPU quota of the cgroup of the process, as set by docker run --cpus.
+
+    Both cgroup v2 (cpu.max) and v1 (cpu.cfs_quota_us) are understood.
+
+    Parameters:
+        root (str): The mount point of the cgroup file system.
+
+    Returns:
+        float | None: The number of CPUs the quota allows, or None if there is no quota.
+    """
+    try:
+        with open(os.path.join(root, "cpu.max")) as file:
+            quota, period = file.read().split()[:2]
+        return int(quota) / int(period) if quota != "max" else None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as file:
+            quota = int(file.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as file:
+            period = int(file.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 and period > 0 else None
+
+
+def available_cpus(root: str = "/sys/fs/cgroup") -> float:
+    """
+    Returns the number of CPUs the process can use.
+
+    This is the number of CPUs it may be scheduled on, lowered to the cgroup quota if
+    there is one, as os.cpu_count() reports the CPUs of the host even in a container.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on macOS
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota(root)
+    return min(cpus, quota) if quota else cpus
+
+
+def default_workers(cpus: float) -> int:
+    """
+    Returns one worker process per available CPU, counting a partial CPU as one.
+    """
+    return max(1, math.ceil(cpus))
+
+
+def plan_server(
+    workers: int,
+    max_connections: int,
+    reserved_connections: int = 10,
+    threads: Optional[int] = None,
+) -> ServerPlan:
+    """
+    Sizes the threadpool and the connection pool of every worker process.
+
+    The connections the database accepts, minus those reserved for administration and
+    migrations, are split evenly between the workers. Each worker gets a pool of that
+    size without overflow, at most one connection per thread, and unless threads is
+    given as many threads, at most DEFAULT_THREADS: more threads than connections
+    would only wait for a connection. The sizes apply to each engine, so read replicas
+    and shards, being other servers, get as many connections as the primary.
+
+    Parameters:
+        workers (int): The number of worker processes.
+        max_connections (int): The max_connections setting of the database.
+        reserved_connections (int): The connections left for other clients. Defaults to 10.
+        threads (int, optional): The threadpool size of a worker. Defaults to its connections.
+
+    Returns:
+        ServerPlan: The sizes of every worker.
+
+    Raises:
+        ValueError: If the database does not accept one connection per worker.
+    """
+    if workers < 1:
+        raise ValueError(f"The server needs at least one worker, got {workers}")
+    budget = max_connections - reserved_connections
+    per_worker = budget // workers
+    if per_worker < 1:
+        raise ValueError(
+            f"{workers} workers need at least {workers} database connections, "
+            f"but only {max(budget, 0)} of {max_connections} are available"
+        )
+    pool_size = min(per_worker, threads or DEFAULT_THREADS)
+    return ServerPlan(
+        workers=workers,
+        threads=threads or pool_size,
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+
+
+def worker_environment(plan: ServerPlan) -> dict:
+    """
+    Returns the environment variables that configure the app in every worker process.
+
+    Besides the sizes of the plan, the todo cache is turned off when there is more than
+    one worker: every process keeps its own copy, so after a write served by one worker
+    the others would serve the old todo, with its old ETag, until the entry expires.
+
+    Parameters:
+        plan (ServerPlan): The sizes of every worker.
+
+    Returns:
+        dict[str, str]: The variables, read by sql_app.database and sql_app.cache.
+    """
+    environment = {
+        "THREADPOOL_SIZE": str(plan.threads),
+        "DB_POOL_SIZE": str(plan.pool_size),
+        "DB_MAX_OVERFLOW": str(plan.max_overflow),
+    }
+    if plan.workers > 1:
+        environment["TODO_CACHE_ENABLED"] = "false"
+    return environment
+
+
+# The settings of worker_environment that win over the operator's, as a different value
+# would serve wrong responses rather than slow ones.
+FORCED_SETTINGS = ("TODO_CACHE_ENABLED",)
+
+
+def apply_worker_environment(plan: ServerPlan, environ: MutableMapping[str, str]) -> list:
+    """
+    Sets the variables of worker_environment that the operator left unset.
+
+    Sizes set explicitly are kept, the FORCED_SETTINGS are set regardless.
+
+    Parameters:
+        plan (ServerPlan): The sizes of every worker.
+        environ (MutableMapping[str, str]): The environment to update, usually os.environ.
+
+    Returns:
+        list[str]: A message for every explicit setting that differs from the plan, to be logged.
+    """
+    messages = []
+    for name, value in worker_environment(plan).items():
+        current = environ.get(name)
+        if current is None:
+            environ[name] = value
+        elif current.lower() == value:
+            continue
+        elif name in FORCED_SETTINGS:
+            environ[name] = value
+            messages.append(f"{name}={current} was overridden with {value}")
+        else:
+            messages.append(f"{name}={current} was kept instead of the planned {value}")
+    return messages
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.pool import QueuePool
+
+from . import async_crud
+from .repository import TodoRepository
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "False").lower() in ("true", "1", "t")
+
+logger = logging.getLogger(__name__)
+
+# The read queries of the request handlers, as method names and keyword arguments of
+# the repository and async_crud. Each variant compiles to a statement of its own.
+HOT_QUERIES = [
+    ("get_todo", {"todo_id": 1}),
+    ("get_todo_version", {"todo_id": 1}),
+    ("get_table_version", {}),
+    ("get_todos", {}),
+    ("get_todos", {"after_id": 0}),
+    ("get_todos", {"after_id": 0, "is_done": False}),
+    ("get_todos", {"after_id": 0, "title_prefix": "a"}),
+    ("count_todos", {}),
+    ("count_todos", {"is_done": False}),
+    ("search_todos", {"text": "todo"}),
+]
+
+
+class Warmup:
+    """
+    Warms up a worker process before it reports ready.
+
+    The first requests of a fresh process pay for connecting to the database and for
+    compiling every statement. The warmup opens the connections of the pools and runs
+    each hot query once in the background, while the readiness probe keeps the load
+    balancer away. A failed warmup is logged and the process becomes ready regardless,
+    as the requests would only repeat what failed.
+
+    Attributes:
+        enabled (bool): Whether to warm up, or be ready as soon as the app started.
+        ready (bool): Whether the warmup is over.
+        connections (int): The connections opened by the warmup.
+        queries (int): The queries run by the warmup.
+        seconds (float | None): How long the warmup took, once it is over.
+        error (str | None): Why the warmup failed, if it did.
+    """
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.ready = False
+        self.connections = 0
+        self.queries = 0
+        self.seconds = None
+        self.error = None
+        self._task = None
+
+    def start(self, warm_up: Callable[["Warmup"], Awaitable[None]]):
+        """
+        Starts the warmup in the background, from the startup event of the app.
+
+        Parameters:
+            warm_up: The coroutine function doing the work, called with this Warmup to count on.
+        """
+        if not self.enabled:
+            self.ready = True
+            return
+        self._task = asyncio.ensure_future(self._run(warm_up))
+
+    async def _run(self, warm_up):
+        start = time.perf_counter()
+        try:
+            await warm_up(self)
+        except Exception as error:
+            self.error = repr(error)
+            logger.warning("The warmup failed: %s", self.error)
+        finally:
+            self.seconds = round(time.perf_counter() - start, 3)
+            self.ready = True
+
+    def stats(self) -> dict:
+        """
+        Returns the state of the warmup.
+
+        Returns:
+            dict: Whether the process is ready and what the warmup did, in how long.
+        """
+        return {
+            "ready": self.ready,
+            "warmup": self.enabled,
+            "connections": self.connections,
+            "queries": self.queries,
+            "seconds": self.seconds,
+            "error": self.error,
+        }
+
+
+def pool_size(engine) -> int:
+    """
+    Returns the number of connections the pool of an engine keeps open.
+    """
+    pool = engine.pool
+    return pool.size() if isinstance(pool, QueuePool) else 1
+
+
+def open_connections(engine, count: Optional[int] = None) -> int:
+    """
+    Fills the pool of an engine by holding count connections at once, then returning them.
+
+    Parameters:
+        engine (Engine): The engine.
+        count (int, optional): The connections to open. Defaults to the pool size.
+
+    Returns:
+        int: The number of connections opened.
+    """
+    count = pool_size(engine) if count is None else count
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+    return count
+
+
+async def open_async_connections(engine, count: Optional[int] = None) -> int:
+    """
+    Fills the pool of an asyncio engine, see open_connections.
+    """
+    count = pool_size(engine.sync_engine) if count is None else count
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(await engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+    return count
+
+
+def run_hot_queries(repository: TodoRepository) -> int:
+    """
+    Runs each of HOT_QUERIES once on a repository, discarding the results.
+
+    Returns:
+        int: The number of queries run.
+    """
+    for name, arguments in HOT_QUERIES:
+        getattr(repository, name)(**arguments)
+    return len(HOT_QUERIES)
+
+
+async def run_async_hot_queries(db) -> int:
+    """
+    Runs each of HOT_QUERIES once with async_crud on an asyncio session, see run_hot_queries.
+    """
+    for name, arguments in HOT_QUERIES:
+        await getattr(async_crud, name)(db, **arguments)
+    return len(HOT_QUERIES)
+
+
+warmup = Warmup(enabled=WARMUP_ENABLED)
@@ -0,0 +1,43 @@
+from sql_app.cache import TodoCache
+
+
+def test_get_miss_and_hit():
+    cache = TodoCache(maxsize=2)
+    assert cache.get(1) is None
+    cache.set(1, {"id": 1})
+    assert cache.get(1) == {"id": 1}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used():
+    cache = TodoCache(maxsize=2)
+    cache.set(1, {"id": 1})
+    cache.set(2, {"id": 2})
+    cache.get(1)
+    cache.set(3, {"id": 3})
+    assert cache.get(2) is None
+    assert cache.get(1) == {"id": 1}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_dropped():
+    cache = TodoCache(maxsize=2, ttl=-1)
+    cache.set(1, {"id": 1})
+    assert cache.get(1) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_fill_is_skipped_after_a_write():
+    cache = TodoCache(maxsize=2)
+    token = cache.token()
+    cache.invalidate(1)
+    cache.fill(1, {"id": 1, "is_done": False}, token)
+    assert cache.get(1) is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = TodoCache(maxsize=2, enabled=False)
+    cache.set(1, {"id": 1})
+    assert cache.get(1) is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+
+import pytest
+
+from sql_app.coalescer import AsyncCoalescer, Coalescer, InsertBatch, StatusBatch
+
+
+class RecordingFlush:
+    """Returns the new status as the row of every existing todo and records the batches."""
+
+    def __init__(self, existing=(1, 2, 3, 4)):
+        self.existing = set(existing)
+        self.batches = []
+        self.sessions = []
+
+    def __call__(self, db, updates):
+        self.batches.append(dict(updates))
+        self.sessions.append(db)
+        return {
+            todo_id: is_done
+            for todo_id, is_done in updates.items()
+            if todo_id in self.existing
+        }
+
+
+def run_concurrently(coalescer, updates):
+    results = {}
+    barrier = threading.Barrier(len(updates))
+
+    def update(db, todo_id, is_done):
+        barrier.wait()
+        results[db] = coalescer.submit(db, (todo_id, is_done))
+
+    threads = [
+        threading.Thread(target=update, args=(f"session {index}", todo_id, is_done))
+        for index, (todo_id, is_done) in enumerate(updates)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_updates_share_one_flush():
+    flush = RecordingFlush()
+    coalescer = Coalescer(flush, StatusBatch, window=0.5, max_batch=3)
+    results = run_concurrently(coalescer, [(1, True), (2, True), (9, True)])
+    assert flush.batches == [{1: True, 2: True, 9: True}]
+    assert sorted(results.values(), key=str) == [None, True, True]
+    assert coalescer.stats()["batches"] == 1
+    assert coalescer.stats()["largest_batch"] == 3
+
+
+def test_full_batch_is_flushed_before_the_window_ends():
+    flush = RecordingFlush()
+    coalescer = Coalescer(flush, StatusBatch, window=30, max_batch=2)
+    run_concurrently(coalescer, [(1, True), (2, True)])
+    assert flush.batches == [{1: True, 2: True}]
+
+
+def test_conflicting_update_starts_a_new_batch():
+    flush = RecordingFlush()
+    coalescer = Coalescer(flush, StatusBatch, window=0.05)
+    run_concurrently(coalescer, [(1, True), (1, False)])
+    assert sorted(flush.batches, key=lambda batch: batch[1]) == [{1: False}, {1: True}]
+
+
+def test_flush_error_is_raised_in_every_request():
+    def failing_flush(db, updates):
+        raise RuntimeError("database is down")
+
+    coalescer = Coalescer(failing_flush, StatusBatch, window=0.05, max_batch=2)
+    errors = []
+
+    def update(todo_id):
+        try:
+            coalescer.submit(None, (todo_id, True))
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=update, args=(todo_id,)) for todo_id in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 2
+    assert coalescer.stats()["batches"] == 0
+
+
+def test_insert_batch_isolates_a_failed_row():
+    def flush(db, todos):
+        return [ValueError(todo) if todo == "bad" else f"row {todo}" for todo in todos]
+
+    coalescer = Coalescer(flush, InsertBatch, window=0.5, max_batch=3)
+    results = {}
+    barrier = threading.Barrier(3)
+
+    def create(todo):
+        barrier.wait()
+        try:
+            results[todo] = coalescer.submit(None, todo)
+        except ValueError as exc:
+            results[todo] = exc
+
+    threads = [threading.Thread(target=create, args=(todo,)) for todo in ("a", "bad", "b")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results["a"] == "row a"
+    assert results["b"] == "row b"
+    assert isinstance(results["bad"], ValueError)
+    assert coalescer.stats()["batches"] == 1
+
+
+def test_async_concurrent_updates_share_one_flush():
+    batches = []
+
+    async def flush(db, updates):
+        batches.append(dict(updates))
+        return {todo_id: is_done for todo_id, is_done in updates.items() if todo_id != 9}
+
+    coalescer = AsyncCoalescer(flush, StatusBatch, window=0.5, max_batch=3)
+
+    async def main():
+        return await asyncio.gather(
+            coalescer.submit(None, (1, True)),
+            coalescer.submit(None, (2, True)),
+            coalescer.submit(None, (9, True)),
+        )
+
+    assert asyncio.run(main()) == [True, True, None]
+    assert batches == [{1: True, 2: True, 9: True}]
+
+
+def test_async_cancelled_leader_fails_the_batch():
+    async def flush(db, updates):
+        await asyncio.sleep(10)
+
+    coalescer = AsyncCoalescer(flush, StatusBatch, window=0.01)
+
+    async def main():
+        leader = asyncio.create_task(coalescer.submit(None, (1, True)))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(coalescer.submit(None, (2, True)))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(follower, 1)
+
+    asyncio.run(main())
@@ -0,0 +1,217 @@
+import gzip
+import json
+import random
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from sql_app.compression import (
+    COMPRESSORS,
+    CompressionMiddleware,
+    GzipCompressor,
+    compressible,
+    negotiate,
+    registry,
+)
+
+BODY = json.dumps(
+    [
+        {"id": i, "title": f"Todo {i}", "description": "Buy milk", "is_done": False}
+        for i in range(200)
+    ]
+).encode()
+RANDOM = random.Random(0).randbytes(5000)
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding",
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, deflate, br", "br"),
+        ("gzip, br, zstd", "zstd"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("zstd;q=0, br;q=0, gzip;q=0", None),
+        ("*", "zstd"),
+        ("*;q=0.1, gzip;q=0.5", "gzip"),
+        ("GZIP;Q=1", "gzip"),
+        ("gzip;q=bad", None),
+    ],
+)
+def test_negotiate(accept_encoding, encoding):
+    assert negotiate(accept_encoding, ("zstd", "br", "gzip")) == encoding
+
+
+def test_negotiate_uses_installed_codings_only():
+    assert negotiate("br, zstd", ("gzip",)) is None
+
+
+@pytest.mark.parametrize(
+    "content_type, expected",
+    [
+        ("application/json", True),
+        ("application/x-ndjson", True),
+        ("text/plain; version=0.0.4", True),
+        ("application/problem+json", True),
+        ("image/png", False),
+        ("", False),
+    ],
+)
+def test_compressible(content_type, expected):
+    assert compressible(content_type) is expected
+
+
+def decompress(encoding, data):
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        import brotli
+
+        return brotli.decompress(data)
+    import zstandard
+
+    return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_compressors_stream_in_chunks(encoding):
+    if encoding not in COMPRESSORS:
+        pytest.skip(f"{encoding} is not installed")
+    compressor = COMPRESSORS[encoding]()
+    chunks = [BODY[:1000], BODY[1000:5000], BODY[5000:]]
+    output = b"".join(
+        compressor.compress(chunk, final=index == len(chunks) - 1)
+        for index, chunk in enumerate(chunks)
+    )
+    assert decompress(encoding, output) == BODY
+
+
+def test_flushed_chunks_decompress_before_the_end():
+    compressor = GzipCompressor()
+    first = compressor.compress(BODY[:1000], final=False)
+    assert zlib.decompressobj(zlib.MAX_WBITS | 16).decompress(first) == BODY[:1000]
+
+
+def make_client(**options):
+    app = FastAPI()
+
+    @app.get("/json")
+    def json_body(size: int = len(BODY)):
+        return Response(BODY[:size], media_type="application/json", headers={"ETag": '"l1"'})
+
+    @app.get("/random")
+    def random_body():
+        return Response(RANDOM, media_type="application/json")
+
+    @app.get("/png")
+    def png():
+        return Response(BODY, media_type="image/png")
+
+    @app.get("/encoded")
+    def encoded():
+        return Response(
+            gzip.compress(BODY), media_type="application/json", headers={"Content-Encoding": "gzip"}
+        )
+
+    @app.get("/stream")
+    def stream(chunk: int = 100):
+        return StreamingResponse(
+            (BODY[start : start + chunk] for start in range(0, len(BODY), chunk)),
+            media_type="application/x-ndjson",
+        )
+
+    app.add_middleware(CompressionMiddleware, **options)
+    return TestClient(app)
+
+
+def test_compresses_large_bodies():
+    response = make_client().get("/json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"l1"'
+    assert int(response.headers["Content-Length"]) < len(BODY) / 4
+    assert response.content == BODY
+
+
+def test_small_bodies_are_sent_as_they_are():
+    response = make_client().get("/json?size=500", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == '"l1"'
+    assert response.content == BODY[:500]
+
+
+def test_incompressible_bodies_are_sent_as_they_are():
+    response = make_client().get("/random", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.content == RANDOM
+
+
+def test_bodies_vary_for_clients_accepting_no_coding():
+    response = make_client().get("/json", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == '"l1"'
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize(
+    "path, headers",
+    [
+        ("/png", {"Accept-Encoding": "gzip"}),
+        ("/encoded", {"Accept-Encoding": "gzip"}),
+    ],
+)
+def test_passes_through(path, headers):
+    response = make_client().get(path, headers=headers)
+    assert "Vary" not in response.headers
+    assert response.content == BODY
+
+
+def test_disabled():
+    response = make_client(enabled=False).get("/json", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize("chunk", [100, 5000])
+def test_compresses_streams(chunk):
+    response = make_client().get(f"/stream?chunk={chunk}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert response.content == BODY
+
+
+def test_short_streams_are_sent_as_they_are():
+    client = make_client(minimum_size=len(BODY) + 1)
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.content == BODY
+
+
+def test_compresses_large_bodies_in_the_threadpool(monkeypatch):
+    calls = []
+
+    async def run_in_threadpool(func, *args):
+        calls.append(len(args[0]))
+        return func(*args)
+
+    monkeypatch.setattr("sql_app.compression.run_in_threadpool", run_in_threadpool)
+    client = make_client(thread_threshold=2000)
+    assert client.get("/json", headers={"Accept-Encoding": "gzip"}).content == BODY
+    assert client.get("/json?size=1500", headers={"Accept-Encoding": "gzip"}).content == BODY[:1500]
+    assert calls == [len(BODY)]
+
+
+def test_records_ratio_and_cpu_time():
+    registry.clear()
+    make_client().get("/json", headers={"Accept-Encoding": "gzip"})
+    exposition = registry.render().decode()
+    assert 'http_response_compression_ratio_count{encoding="gzip"} 1' in exposition
+    assert 'http_response_compression_cpu_seconds_count{encoding="gzip"} 1' in exposition
+    assert f'http_response_uncompressed_bytes_total{{encoding="gzip"}} {len(BODY)}' in exposition
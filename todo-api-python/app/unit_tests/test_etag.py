@@ -0,0 +1,29 @@
+from sql_app.etag import etag_matches, list_etag, not_modified, todo_etag
+
+
+def test_todo_etag_includes_id_and_version():
+    assert todo_etag(3, 7) == '"t3.7"'
+    assert todo_etag(3, 7) != todo_etag(3, 8)
+
+
+def test_list_etag():
+    assert list_etag(12) == '"l12"'
+
+
+def test_etag_matches():
+    etag = todo_etag(1, 2)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"x", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"t1.1"', etag)
+
+
+def test_not_modified():
+    response = not_modified('"l1"')
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == '"l1"'
@@ -0,0 +1,63 @@
+import json
+import pytest
+from sql_app.importer import TodoStreamParser
+
+TODOS = [
+    {"title": f"Gym – Day {i}", "description": f"Workout for {i} minutes"}
+    for i in range(20)
+]
+
+
+def parse(document: bytes, chunk_size: int) -> list:
+    parser = TodoStreamParser()
+    rows = []
+    for start in range(0, len(document), chunk_size):
+        rows.extend(parser.feed(document[start : start + chunk_size]))
+    rows.extend(parser.close())
+    return rows
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 100000])
+def test_parses_json_array_in_any_chunking(chunk_size):
+    document = json.dumps(TODOS, indent=2, ensure_ascii=False).encode()
+    rows = parse(document, chunk_size)
+    assert [row["title"] for row in rows] == [todo["title"] for todo in TODOS]
+    assert all(row["is_done"] is False for row in rows)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 13, 100000])
+def test_parses_ndjson(chunk_size):
+    document = "\n".join(json.dumps(todo) for todo in TODOS).encode()
+    assert len(parse(document, chunk_size)) == 20
+
+
+def test_parses_empty_array():
+    assert parse(b" [ ] ", 2) == []
+
+
+def test_returns_items_before_the_end():
+    parser = TodoStreamParser()
+    rows = parser.feed(b'[{"title": "a", "description": "b"}, {"title"')
+    assert rows == [{"title": "a", "description": "b", "is_done": False}]
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        b'[{"title": "a", "description": "b"}',
+        b'[{"title": "a", "description": "b"} {"title": "c"}]',
+        b'[{"title": "a"}]',
+        b"[1, 2]",
+        b'[{"title": "a", "description": "b"}] []',
+        b'{"title": "a", "description": "b"}\n{"title": ',
+    ],
+)
+def test_rejects_invalid_documents(document):
+    with pytest.raises(ValueError):
+        parse(document, 5)
+
+
+def test_rejects_oversized_items():
+    parser = TodoStreamParser(max_item_size=10)
+    with pytest.raises(ValueError):
+        parser.feed(b'[{"title": "' + b"x" * 20)
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from sql_app import schemas
+from sql_app.memory import InMemoryRepository, TodoRecord, TodoStore
+
+
+def new(title, description="Description"):
+    return schemas.ToDoCreate(title=title, description=description)
+
+
+@pytest.fixture
+def repository():
+    repository = InMemoryRepository(TodoStore())
+    repository.create_todos([new(f"Todo {index}") for index in range(10)])
+    return repository
+
+
+def ids(todos):
+    return [todo.id for todo in todos]
+
+
+def test_records_have_no_instance_dict():
+    record = TodoRecord(1, "Title", "Description", False, 1)
+    assert not hasattr(record, "__dict__")
+
+
+def test_open_index_follows_status_changes(repository):
+    repository.update_todo_status(3, True)
+    repository.update_todo_status(5, True)
+    repository.update_todo_status(3, False)
+    assert list(repository.store.open_ids) == [1, 2, 3, 4, 6, 7, 8, 9, 10]
+    assert ids(repository.get_todos(is_done=True)) == [5]
+    assert repository.count_todos(is_done=False) == 9
+
+
+def test_updates_store_new_records(repository):
+    before = repository.get_todo(4)
+    after = repository.update_todo_status(4, True)
+    assert (before.is_done, before.version) == (False, 1)
+    assert (after.is_done, after.version) == (True, 2)
+    assert repository.get_todo_version(4) == 2
+
+
+def test_delete_removes_the_todo_from_both_indexes(repository):
+    repository.update_todo_status(2, True)
+    assert repository.delete_todo(2).id == 2
+    assert repository.delete_todo(7).id == 7
+    assert repository.delete_todo(7) is None
+    assert 2 not in repository.store.ids and 7 not in repository.store.open_ids
+    # IDs of deleted todos are never handed out again.
+    assert repository.create_todo(new("Next")).id == 11
+
+
+def test_pages_in_both_modes(repository):
+    assert ids(repository.get_todos(skip=3, limit=4)) == [4, 5, 6, 7]
+    assert ids(repository.get_todos(after_id=7, limit=10)) == [8, 9, 10]
+    repository.update_todo_status(9, True)
+    assert ids(repository.get_todos(after_id=7, limit=10, is_done=False)) == [8, 10]
+    assert ids(repository.get_todos(after_id=3, limit=2, title_prefix="Todo 9")) == [10]
+
+
+def test_table_version_counts_writes(repository):
+    version = repository.get_table_version()
+    repository.update_todo_status(1, True)
+    repository.delete_todo(1)
+    assert repository.get_table_version() == version + 2
+
+
+def test_search_ranks_by_occurrences(repository):
+    repository.create_todo(new("Garden", "garden fence"))
+    repository.create_todo(new("Call", "about the garden"))
+    assert [todo.title for todo in repository.search_todos("GARDEN")] == ["Garden", "Call"]
+    assert repository.search_todos("garden fence")[0].title == "Garden"
+    assert repository.search_todos("  ") == []
+
+
+def test_stream_in_batches(repository):
+    assert [ids(batch) for batch in repository.stream_todos(batch_size=4)] == [
+        [1, 2, 3, 4],
+        [5, 6, 7, 8],
+        [9, 10],
+    ]
+
+
+def test_import_is_visible_only_after_commit(repository):
+    repository.load_batch([{"title": "Imported", "description": "D"}])
+    assert repository.count_todos() == 10
+    repository.rollback()
+    repository.commit()
+    assert repository.count_todos() == 10
+    repository.load_batch([{"title": "Imported", "description": "D"}])
+    repository.commit()
+    assert repository.get_todo(11).title == "Imported"
+
+
+def test_concurrent_writes_keep_the_indexes_consistent():
+    store = TodoStore()
+
+    def work(worker):
+        repository = InMemoryRepository(store)
+        for index in range(200):
+            todo = repository.create_todo(new(f"{worker}-{index}"))
+            if index % 2:
+                repository.update_todo_status(todo.id, True)
+            if index % 5 == 0:
+                repository.delete_todo(todo.id)
+
+    threads = [threading.Thread(target=work, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert list(store.ids) == sorted(store.todos)
+    assert list(store.open_ids) == sorted(
+        todo_id for todo_id, record in store.todos.items() if not record.is_done
+    )
+    assert len(store.ids) == 8 * 160
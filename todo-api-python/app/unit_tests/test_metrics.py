@@ -0,0 +1,103 @@
+from sql_app.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "/api")
+
+    lines = histogram.render()
+
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert lines[2:] == [
+        'latency_seconds_bucket{route="/api",le="0.1"} 2',
+        'latency_seconds_bucket{route="/api",le="1.0"} 3',
+        'latency_seconds_bucket{route="/api",le="+Inf"} 4',
+        'latency_seconds_sum{route="/api"} 2.65',
+        'latency_seconds_count{route="/api"} 4',
+    ]
+
+
+def test_counter_and_gauge():
+    counter = Counter("requests_total", "Requests.", ("status",))
+    counter.inc("200")
+    counter.inc("200")
+    gauge = Gauge("in_flight", "In flight.")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    assert counter.render()[2:] == ['requests_total{status="200"} 2']
+    assert gauge.render()[2:] == ["in_flight 1"]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("requests_total", "Requests.", ("route",))
+    counter.inc('/a"b\\c\n')
+
+    assert counter.render()[2] == 'requests_total{route="/a\\"b\\\\c\\n"} 1'
+
+
+def test_registry_renders_and_clears_all_metrics():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("a_total", "A."))
+    gauge = registry.register(Gauge("b", "B."))
+    counter.inc()
+    gauge.inc()
+
+    assert registry.render() == (
+        b"# HELP a_total A.\n# TYPE a_total counter\na_total 1\n"
+        b"# HELP b B.\n# TYPE b gauge\nb 1\n"
+    )
+
+    registry.clear()
+    assert b"a_total 1" not in registry.render()
+
+
+def worker_registry():
+    registry = MetricsRegistry()
+    counter = registry.register(Counter("requests_total", "Requests.", ("status",)))
+    gauge = registry.register(Gauge("in_flight", "In flight."))
+    histogram = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1,)))
+    return registry, counter, gauge, histogram
+
+
+def test_registry_adds_up_the_metrics_of_all_workers(tmp_path):
+    other, counter, gauge, histogram = worker_registry()
+    counter.inc("200")
+    counter.inc("500")
+    gauge.inc()
+    histogram.observe(0.05)
+    other.write(str(tmp_path), pid=1)
+    registry, counter, gauge, histogram = worker_registry()
+    counter.inc("200")
+    gauge.inc()
+    histogram.observe(0.5)
+
+    rendered = registry.render(str(tmp_path)).decode()
+
+    assert 'requests_total{status="200"} 2' in rendered
+    assert 'requests_total{status="500"} 1' in rendered
+    assert "in_flight 2" in rendered
+    assert 'latency_seconds_bucket{le="0.1"} 1' in rendered
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in rendered
+    assert "latency_seconds_count 2" in rendered
+    assert b'status="500"' not in registry.render()
+
+
+def test_registry_keeps_the_counters_of_exited_workers(tmp_path):
+    for pid in (1, 2):
+        registry, counter, gauge, histogram = worker_registry()
+        counter.inc("200")
+        gauge.inc()
+        histogram.observe(0.05)
+        registry.write(str(tmp_path), pid=pid)
+        registry.collect_exited(str(tmp_path), pid)
+    registry, _, _, _ = worker_registry()
+
+    rendered = registry.render(str(tmp_path)).decode()
+
+    assert not (tmp_path / "1.json").exists()
+    assert 'requests_total{status="200"} 2' in rendered
+    assert "latency_seconds_count 2" in rendered
+    assert "\nin_flight " not in rendered
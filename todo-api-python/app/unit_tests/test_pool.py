@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.main import app
+from sql_app.database import engine_options
+from sql_app.pool import (
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+    PoolMonitor,
+    PoolStats,
+    instrument,
+)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_engine_options_for_postgres():
+    options = engine_options("postgresql://user:password@db/todos")
+    assert {"pool_size", "max_overflow", "pool_timeout", "pool_recycle"} <= set(options)
+
+
+def test_engine_options_for_sqlite():
+    assert set(engine_options("sqlite://")) == {"pool_pre_ping"}
+
+
+def test_records_checkouts_and_connects(engine):
+    stats = PoolStats()
+    instrument(engine, stats)
+    with engine.connect():
+        snapshot = stats.snapshot(engine.pool)
+        assert snapshot["checked_out"] == 1
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["checkouts"] == 1
+    assert snapshot["connects"] == 1
+    assert snapshot["checked_out"] == 0
+
+
+def test_records_timeouts(engine):
+    stats = PoolStats()
+    instrument(engine, stats)
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+    snapshot = stats.snapshot(engine.pool)
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_ms_max"] >= 50
+
+
+def test_records_async_checkouts_and_timeouts(tmp_path):
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    stats = PoolStats()
+    instrument(async_engine.sync_engine, stats)
+
+    async def check_out():
+        async with async_engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                await async_engine.connect()
+        await async_engine.dispose()
+
+    asyncio.run(check_out())
+    snapshot = stats.snapshot(async_engine.sync_engine.pool)
+    assert snapshot["checkouts"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["size"] == 1
+
+
+def test_monitor_keeps_the_stats_of_every_engine(engine, tmp_path):
+    other = create_engine(
+        f"sqlite:///{tmp_path / 'other.db'}", poolclass=InstrumentedQueuePool, pool_size=3
+    )
+    monitor = PoolMonitor()
+    monitor.instrument("primary", engine)
+    monitor.instrument("shard:other", other)
+    with engine.connect():
+        pass
+    snapshots = monitor.snapshot()
+    assert list(snapshots) == ["primary", "shard:other"]
+    assert snapshots["primary"]["checkouts"] == 1
+    assert snapshots["shard:other"]["checkouts"] == 0
+    assert snapshots["shard:other"]["size"] == 3
+    monitor.reset()
+    assert monitor.snapshot()["primary"]["checkouts"] == 0
+    other.dispose()
+
+
+def test_pool_endpoint():
+    with TestClient(app) as client:
+        response = client.get("/internal/pool")
+    assert response.status_code == 200
+    stats = response.json()
+    assert {"pool", "checkouts", "wait_ms_max", "connect_ms_avg"} <= set(stats)
+    assert "primary" in stats["engines"]
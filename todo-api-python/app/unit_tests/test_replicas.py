@@ -0,0 +1,90 @@
+import time
+
+import pytest
+from sqlalchemy import exc
+
+from sql_app.database import replica_name
+from sql_app.replicas import LEAST_CONNECTIONS, Replica, ReplicaSet
+
+
+def make_set(strategy="round_robin", count=2):
+    replicas = [Replica(f"replica-{index}", None) for index in range(count)]
+    return ReplicaSet(replicas, strategy=strategy, read_your_writes=5, retry_after=60)
+
+
+def test_round_robin_alternates():
+    replica_set = make_set()
+    names = []
+    for _ in range(4):
+        replica = replica_set.acquire()
+        names.append(replica.name)
+        replica_set.release(replica)
+    assert names == ["replica-0", "replica-1", "replica-0", "replica-1"]
+
+
+def test_least_connections_picks_the_idlest_replica():
+    replica_set = make_set(LEAST_CONNECTIONS, count=3)
+    busy = replica_set.acquire()
+    second = replica_set.acquire()
+    assert second is not busy
+    replica_set.release(busy)
+    assert replica_set.acquire() is busy
+
+
+def test_unhealthy_replica_is_skipped_until_retry():
+    replica_set = make_set()
+    first, second = replica_set.replicas
+    replica_set.mark_unhealthy(first, RuntimeError("connection refused"))
+    assert {replica_set.acquire().name for _ in range(3)} == {"replica-1"}
+    replica_set.mark_unhealthy(second, RuntimeError("connection refused"))
+    assert replica_set.acquire() is None
+    assert replica_set.stats()["fallbacks"] == 3
+    first.unhealthy_until = time.monotonic()
+    assert replica_set.acquire() is first
+
+
+def test_connect_failure_marks_the_replica_unhealthy():
+    class UnreachableSession:
+        info = {}
+
+        def connection(self):
+            raise exc.OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+        def close(self):
+            pass
+
+    replica = Replica("down", UnreachableSession)
+    replica_set = ReplicaSet([replica])
+    assert replica_set.connect(replica) is None
+    assert replica_set.stats()["replicas"][0]["healthy"] is False
+    assert replica_set.stats()["replicas"][0]["failures"] == 1
+
+
+@pytest.mark.parametrize("age, recent", [(1, True), (60, False)])
+def test_wrote_recently(age, recent):
+    assert make_set().wrote_recently(str(time.time() - age)) is recent
+
+
+@pytest.mark.parametrize("last_write", [None, "garbage"])
+def test_wrote_recently_without_a_valid_cookie(last_write):
+    assert make_set().wrote_recently(last_write) is False
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        ReplicaSet([], strategy="random")
+
+
+@pytest.mark.parametrize(
+    "url, name",
+    [
+        ("postgresql://todo:secret@db:5433/todos", "db:5433/todos"),
+        ("postgresql://todo:secret@db:5434/todos", "db:5434/todos"),
+        ("postgresql://todo@db/todos_replica", "db/todos_replica"),
+        ("postgresql://db", "db"),
+        ("sqlite:///./replica.db", "./replica.db"),
+        ("sqlite://", "sqlite"),
+    ],
+)
+def test_replica_name(url, name):
+    assert replica_name(url) == name
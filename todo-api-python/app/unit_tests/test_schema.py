@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    inspect,
+    text,
+)
+
+from sql_app import models
+from sql_app.schema import SCHEMA_REVISION, migrate, schema_revision
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    yield engine
+    engine.dispose()
+
+
+def revision(engine):
+    with engine.connect() as connection:
+        return schema_revision(connection)
+
+
+def test_migrates_a_new_database_once(engine):
+    assert revision(engine) is None
+    assert migrate(engine) is True
+    assert {"todos", "todos_version", "todos_fts"} <= set(inspect(engine).get_table_names())
+    assert revision(engine) == SCHEMA_REVISION
+    assert migrate(engine) is False
+
+
+def test_migrates_a_database_created_before_revisions(engine):
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO todos (title, description) VALUES ('a', 'b')"))
+    assert migrate(engine) is True
+    assert revision(engine) == SCHEMA_REVISION
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM todos")).scalar() == 1
+
+
+def create_first_todos(engine):
+    """Creates the todos table of the first release, before revisions and ETags."""
+    metadata = MetaData()
+    Table(
+        "todos",
+        metadata,
+        Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+        Column("title", String),
+        Column("description", String),
+        Column("is_done", Boolean, default=False),
+    )
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO todos (title, description) VALUES ('Go running', 'In the park')")
+        )
+
+
+def test_upgrades_the_todos_table_of_the_first_release(engine):
+    create_first_todos(engine)
+    assert migrate(engine) is True
+
+    inspector = inspect(engine)
+    assert "version" in {column["name"] for column in inspector.get_columns("todos")}
+    indexes = {index["name"] for index in inspector.get_indexes("todos")}
+    assert {"ix_todos_is_done_id", "ix_todos_open", "ix_todos_title"} <= indexes
+    with engine.begin() as connection:
+        assert connection.execute(text("SELECT version FROM todos")).scalar() == 1
+        assert connection.execute(
+            text("SELECT rowid FROM todos_fts WHERE todos_fts MATCH 'running'")
+        ).all() == [(1,)]
+        before = connection.execute(text("SELECT sum(version) FROM todos_version")).scalar()
+        connection.execute(text("UPDATE todos SET is_done = 1"))
+        after = connection.execute(text("SELECT sum(version) FROM todos_version")).scalar()
+    assert after == before + 1
+
+
+def test_migrates_again_after_a_new_revision(engine, monkeypatch):
+    migrate(engine)
+    monkeypatch.setattr("sql_app.schema.SCHEMA_REVISION", SCHEMA_REVISION + 1)
+    assert migrate(engine) is True
+    assert revision(engine) == SCHEMA_REVISION + 1
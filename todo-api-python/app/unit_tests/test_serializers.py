@@ -0,0 +1,38 @@
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sql_app import serializers
+from sql_app.models import ToDo
+from sql_app.serializers import FastJSONResponse, serialize_todo, serialize_todos
+
+
+def make_todos():
+    return [
+        ToDo(id=i, title=f"Tödo {i}", description="Beschreibung €", is_done=i % 2 == 0)
+        for i in range(3)
+    ]
+
+
+def test_serialize_todo_matches_jsonable_encoder():
+    todo = make_todos()[0]
+    assert json.loads(serialize_todo(todo)) == jsonable_encoder(todo)
+
+
+def test_serialize_todos_matches_json_response():
+    todos = make_todos()
+    expected = JSONResponse(content=[serializers.todo_to_dict(t) for t in todos]).body
+    assert serialize_todos(todos) == expected
+
+
+def test_stdlib_fallback_produces_same_bytes(monkeypatch):
+    todos = make_todos()
+    fast = serialize_todos(todos)
+    monkeypatch.setattr(serializers, "orjson", None)
+    assert serialize_todos(todos) == fast
+
+
+def test_fast_json_response_passes_bytes_through():
+    response = FastJSONResponse(content=b'{"id":1}', status_code=201)
+    assert response.body == b'{"id":1}'
+    assert response.headers["content-type"] == "application/json"
+    assert FastJSONResponse(content={"id": 1}).body == b'{"id":1}'
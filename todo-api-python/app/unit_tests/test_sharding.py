@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import BigInteger, create_engine, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from sql_app import crud, models
+from sql_app.schema import MIGRATIONS
+from sql_app.sharding import SHARD_ID_BITS, Shard, ShardSet, first_id, reserve_id_range, shard_of
+
+
+def make_set(count=3):
+    return ShardSet([Shard(f"shard-{index}", None) for index in range(count)], fanout=4)
+
+
+@pytest.mark.parametrize(
+    "todo_id, index",
+    [(1, 0), ((1 << SHARD_ID_BITS) - 1, 0), (1 << SHARD_ID_BITS, 1), (first_id(5) + 42, 5)],
+)
+def test_shard_of_decodes_the_id(todo_id, index):
+    assert shard_of(todo_id) == index
+
+
+def test_ids_stay_exact_in_json_numbers():
+    assert first_id(8192) - 1 < 2**53
+
+
+def test_shard_for_unknown_ids():
+    shards = make_set()
+    assert shards.shard_for(first_id(2)).name == "shard-2"
+    assert shards.shard_for(first_id(3)) is None
+    assert shards.shard_for(-1) is None
+
+
+def test_new_todos_take_the_shards_in_turn():
+    shards = make_set()
+    assert [shards.next_shard().name for _ in range(4)] == [
+        "shard-0",
+        "shard-1",
+        "shard-2",
+        "shard-0",
+    ]
+
+
+def test_scatter_keeps_the_order_of_the_shards():
+    shards = ShardSet(
+        [Shard(f"shard-{index}", lambda index=index: FakeSession(index)) for index in range(5)]
+    )
+    assert shards.scatter(lambda db: db.index) == [0, 1, 2, 3, 4]
+    assert [shard["reads"] for shard in shards.stats()["shards"]] == [1] * 5
+
+
+def test_reserve_id_range_only_moves_forward():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        reserve_id_range(connection, 2)
+        connection.execute(text("INSERT INTO todos (title, version) VALUES ('a', 1)"))
+        reserve_id_range(connection, 2)
+        connection.execute(text("INSERT INTO todos (title, version) VALUES ('b', 1)"))
+        ids = connection.execute(text("SELECT id FROM todos ORDER BY id")).scalars().all()
+    assert ids == [first_id(2), first_id(2) + 1]
+
+
+class FakeSession:
+    def __init__(self, index):
+        self.index = index
+
+    def close(self):
+        pass
+
+
+def test_shard_ids_fit_the_postgres_schema():
+    dialect = postgresql.dialect()
+    ddl = str(CreateTable(models.ToDo.__table__).compile(dialect=dialect))
+    assert "id BIGSERIAL NOT NULL" in ddl
+    statement = update(models.ToDo.__table__).where(crud._id_in("postgresql", [first_id(1)]))
+    compiled = statement.compile(dialect=dialect)
+    bind = compiled.binds["todo_ids"]
+    assert isinstance(bind.type.item_type, BigInteger)
+    assert bind.value == [1 << SHARD_ID_BITS]
+
+
+class RecordingConnection:
+    dialect = postgresql.dialect()
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, parameters=None):
+        self.statements.append(str(statement))
+        return self
+
+    def scalar(self):
+        return "public.todos_id_seq"
+
+
+def test_migration_widens_existing_postgres_ids():
+    connection = RecordingConnection()
+    MIGRATIONS[2](connection)
+    assert "ALTER TABLE todos ALTER COLUMN id TYPE bigint" in connection.statements
+    assert "ALTER SEQUENCE public.todos_id_seq AS bigint" in connection.statements
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds an import of the app may take, in a fresh interpreter. It takes well under
+# half of that on a laptop, the rest is headroom for slow CI machines.
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.5"))
+
+MEASURE = """
+import json, sys, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+package = sys.modules["sql_app"].__path__[0]
+flat = sorted(
+    name for name, module in sys.modules.items()
+    if "." not in name and name != "sql_app"
+    and (getattr(module, "__file__", None) or "").startswith(package)
+)
+print(json.dumps({"seconds": seconds, "flat": flat}))
+"""
+
+
+@pytest.fixture(scope="module")
+def imports(tmp_path_factory):
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmp_path_factory.mktemp('startup') / 'todos.db'}",
+    )
+    runs = []
+    # The best of three runs, so that a busy machine does not fail the budget.
+    for _ in range(3):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE],
+            cwd=APP_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output))
+    return min(runs, key=lambda run: run["seconds"])
+
+
+def test_import_time_budget(imports):
+    assert imports["seconds"] < IMPORT_TIME_BUDGET
+
+
+def test_package_modules_are_imported_once(imports):
+    # A module imported both as sql_app.crud and as crud is loaded and run twice.
+    assert imports["flat"] == []
+
+
+@pytest.mark.parametrize(
+    "command",
+    [["sql_app/importer.py"], ["-m", "sql_app.importer"]],
+    ids=["script", "module"],
+)
+def test_importer_runs_from_the_command_line(tmp_path, command):
+    document = tmp_path / "todos.json"
+    document.write_text(json.dumps([{"title": "Imported", "description": ""}]))
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'todos.db'}")
+    subprocess.run(
+        [sys.executable, "-m", "sql_app.schema"],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        check=True,
+    )
+    output = subprocess.run(
+        [sys.executable, *command, str(document)],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.startswith("Imported 1 todos")
@@ -0,0 +1,124 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from sql_app.tuning import (
+    DEFAULT_THREADS,
+    apply_worker_environment,
+    cgroup_cpu_quota,
+    default_workers,
+    plan_server,
+    worker_environment,
+)
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+@pytest.mark.parametrize(
+    "files, quota",
+    [
+        ({"cpu.max": "150000 100000\n"}, 1.5),
+        ({"cpu.max": "max 100000\n"}, None),
+        ({"cpu/cpu.cfs_quota_us": "200000\n", "cpu/cpu.cfs_period_us": "100000\n"}, 2.0),
+        ({"cpu/cpu.cfs_quota_us": "-1\n", "cpu/cpu.cfs_period_us": "100000\n"}, None),
+        ({}, None),
+    ],
+)
+def test_cgroup_cpu_quota(tmp_path, files, quota):
+    for name, content in files.items():
+        write(tmp_path / name, content)
+    assert cgroup_cpu_quota(str(tmp_path)) == quota
+
+
+@pytest.mark.parametrize("cpus, workers", [(0.5, 1), (1, 1), (1.5, 2), (8, 8)])
+def test_default_workers(cpus, workers):
+    assert default_workers(cpus) == workers
+
+
+def test_connections_are_split_between_workers():
+    plan = plan_server(workers=4, max_connections=100, reserved_connections=10)
+    assert (plan.pool_size, plan.max_overflow, plan.threads) == (22, 0, 22)
+    assert plan.connections == 88
+
+
+def test_pool_is_capped_at_the_threadpool():
+    plan = plan_server(workers=1, max_connections=500)
+    assert plan.pool_size == plan.threads == DEFAULT_THREADS
+    plan = plan_server(workers=2, max_connections=100, threads=8)
+    assert (plan.pool_size, plan.threads) == (8, 8)
+
+
+def test_too_many_workers_for_the_database():
+    with pytest.raises(ValueError, match="need at least 20 database connections"):
+        plan_server(workers=20, max_connections=25, reserved_connections=10)
+
+
+def test_worker_environment_sizes_the_pools():
+    plan = plan_server(workers=1, max_connections=30, reserved_connections=10)
+    assert worker_environment(plan) == {
+        "THREADPOOL_SIZE": "20",
+        "DB_POOL_SIZE": "20",
+        "DB_MAX_OVERFLOW": "0",
+    }
+
+
+def test_worker_environment_turns_off_the_cache_of_several_workers():
+    plan = plan_server(workers=2, max_connections=100)
+    assert worker_environment(plan)["TODO_CACHE_ENABLED"] == "false"
+
+
+def test_apply_worker_environment_fills_unset_sizes():
+    plan = plan_server(workers=1, max_connections=30, reserved_connections=10)
+    environ = {}
+    assert apply_worker_environment(plan, environ) == []
+    assert environ == worker_environment(plan)
+
+
+def test_apply_worker_environment_keeps_explicit_sizes():
+    plan = plan_server(workers=1, max_connections=30, reserved_connections=10)
+    environ = {"DB_POOL_SIZE": "5", "DB_MAX_OVERFLOW": "0"}
+    messages = apply_worker_environment(plan, environ)
+    assert environ["DB_POOL_SIZE"] == "5"
+    assert messages == ["DB_POOL_SIZE=5 was kept instead of the planned 20"]
+
+
+def test_apply_worker_environment_forces_the_cache_off():
+    plan = plan_server(workers=2, max_connections=100)
+    environ = {"TODO_CACHE_ENABLED": "True"}
+    messages = apply_worker_environment(plan, environ)
+    assert environ["TODO_CACHE_ENABLED"] == "false"
+    assert messages == ["TODO_CACHE_ENABLED=True was overridden with false"]
+
+
+CACHE_OF_WORKERS = """
+import runpy
+runpy.run_path("gunicorn.conf.py")
+from sql_app.cache import todo_cache
+print(todo_cache.enabled)
+"""
+
+
+@pytest.mark.parametrize("workers, enabled", [("1", "True"), ("2", "False")])
+def test_gunicorn_workers_share_no_cache(tmp_path, workers, enabled):
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=workers,
+        DATABASE_URL=f"sqlite:///{tmp_path / 'todos.db'}",
+    )
+    env.pop("TODO_CACHE_ENABLED", None)
+    output = subprocess.run(
+        [sys.executable, "-c", CACHE_OF_WORKERS],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    assert output.strip() == enabled
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+
+from sql_app import schemas
+from sql_app.memory import InMemoryRepository, TodoStore
+from sql_app.warmup import HOT_QUERIES, Warmup, open_connections, run_hot_queries
+
+
+def run(warmup, warm_up):
+    async def main():
+        warmup.start(warm_up)
+        while not warmup.ready:
+            await asyncio.sleep(0)
+
+    asyncio.run(main())
+
+
+async def count(progress):
+    progress.connections += 2
+    progress.queries += 3
+
+
+async def fail(progress):
+    raise RuntimeError("the database is down")
+
+
+def test_disabled_warmup_is_ready_at_once():
+    warmup = Warmup(enabled=False)
+    warmup.start(count)
+    assert warmup.ready
+    assert warmup.stats()["connections"] == 0
+
+
+def test_warmup_becomes_ready_when_done():
+    warmup = Warmup(enabled=True)
+    assert not warmup.ready
+    run(warmup, count)
+    stats = warmup.stats()
+    assert stats["ready"] and stats["error"] is None
+    assert (stats["connections"], stats["queries"]) == (2, 3)
+    assert stats["seconds"] >= 0
+
+
+def test_failed_warmup_becomes_ready_with_the_error():
+    warmup = Warmup(enabled=True)
+    run(warmup, fail)
+    assert warmup.ready
+    assert "the database is down" in warmup.stats()["error"]
+
+
+@pytest.mark.parametrize("count, checked_in", [(None, 3), (2, 2)])
+def test_open_connections_fills_the_pool(tmp_path, count, checked_in):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", pool_size=3)
+    assert engine.pool.checkedin() == 0
+    assert open_connections(engine, count) == checked_in
+    assert engine.pool.checkedin() == checked_in
+    assert engine.pool.checkedout() == 0
+    engine.dispose()
+
+
+def test_hot_queries_leave_the_todos_unchanged():
+    store = TodoStore()
+    repository = InMemoryRepository(store)
+    repository.create_todo(schemas.ToDoCreate(title="Todo", description="D"))
+    assert run_hot_queries(repository) == len(HOT_QUERIES)
+    assert store.version == 1
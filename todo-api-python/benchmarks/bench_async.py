@@ -0,0 +1,137 @@
+"""
+Compares the sync (threadpool) and async request paths at high concurrency.
+
+Both apps are driven in-process through their ASGI interface, so the numbers
+show the cost of the request path itself and of the threadpool hand-off, not
+network overhead.
+
+Usage:
+    python benchmarks/bench_async.py [--rows 10000] [--concurrency 200] [--requests 5000]
+
+Set BENCH_DATABASE_URL to run against Postgres instead of a temporary SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.append(os.path.abspath(path))
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from main import async_router, router
+from sql_app import models
+from sql_app.database import get_async_db, get_db, to_async_url
+
+
+def seed(engine, rows: int):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    batch = [
+        {"title": f"Todo {i}", "description": f"Description {i}", "is_done": False}
+        for i in range(rows)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.ToDo), batch)
+
+
+def sync_app(url: str, pool_size: int) -> FastAPI:
+    engine = create_engine(
+        url, poolclass=QueuePool, pool_size=pool_size, max_overflow=0
+    )
+    session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = override_get_db
+    app.state.dispose = lambda: engine.dispose()
+    return app
+
+
+def async_app(url: str, pool_size: int) -> FastAPI:
+    engine = create_async_engine(
+        to_async_url(url),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    session_local = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_local() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(async_router)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.state.dispose = engine.dispose
+    return app
+
+
+async def drive(app: FastAPI, rows: int, concurrency: int, requests: int) -> list:
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def worker(client):
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(f"/api/todo/{random.randint(1, rows)}")
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    # The async engine's connections must be closed on the loop that opened them.
+    disposed = app.state.dispose()
+    if asyncio.iscoroutine(disposed):
+        await disposed
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--pool-size", type=int, default=20)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/bench_async.db"
+    seed(create_engine(url), args.rows)
+
+    print(f"{'mode':>6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode, factory in (("sync", sync_app), ("async", async_app)):
+        app = factory(url, args.pool_size)
+        start = time.perf_counter()
+        latencies = asyncio.run(
+            drive(app, args.rows, args.concurrency, args.requests)
+        )
+        elapsed = time.perf_counter() - start
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(
+            f"{mode:>6} {len(latencies) / elapsed:>9.0f} "
+            f"{quantiles[49] * 1000:>8.2f} {quantiles[98] * 1000:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
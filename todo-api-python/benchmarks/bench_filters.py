@@ -0,0 +1,105 @@
+"""
+Times the filtered list queries and counts with and without the status indexes.
+
+Usage:
+    python benchmarks/bench_filters.py [--rows 500000] [--open-ratio 0.05] [--limit 100]
+
+Set BENCH_DATABASE_URL to run against Postgres instead of a temporary SQLite file.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.append(os.path.abspath(path))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from sql_app import crud, models
+
+STATUS_INDEXES = ["ix_todos_is_done_id", "ix_todos_open"]
+REPEAT = 5
+
+
+def seed(engine, rows: int, open_ratio: float):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    every = max(round(1 / open_ratio), 1) if open_ratio else rows + 1
+    batch = [
+        {
+            "title": f"Todo {i}",
+            "description": f"Description {i}",
+            "is_done": i % every != 0,
+        }
+        for i in range(rows)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.ToDo), batch)
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run_cases(db, limit: int) -> dict:
+    # Start the second page from the middle of the table, as a cursor deep into a list would.
+    middle = crud.count_todos(db) // 2
+    cases = {
+        "open, first page": lambda: crud.get_todos(db, limit=limit, is_done=False),
+        "open, deep page": lambda: crud.get_todos(
+            db, limit=limit, after_id=middle, is_done=False
+        ),
+        "done, deep page": lambda: crud.get_todos(
+            db, limit=limit, after_id=middle, is_done=True
+        ),
+        "count open": lambda: crud.count_todos(db, is_done=False),
+        "count title prefix": lambda: crud.count_todos(db, title_prefix="Todo 12"),
+    }
+    results = {}
+    for name, case in cases.items():
+        results[name] = timed(case)
+        db.expunge_all()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--open-ratio", type=float, default=0.05)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/bench_filters.db"
+    engine = create_engine(url)
+    seed(engine, args.rows, args.open_ratio)
+    db = sessionmaker(bind=engine)()
+
+    indexed = run_cases(db, args.limit)
+    db.close()
+    with engine.begin() as conn:
+        for name in STATUS_INDEXES:
+            conn.execute(text(f"DROP INDEX {name}"))
+    db = sessionmaker(bind=engine)()
+    unindexed = run_cases(db, args.limit)
+
+    print(f"{'case':>20} {'no index ms':>12} {'indexed ms':>11}")
+    for name, indexed_ms in indexed.items():
+        print(f"{name:>20} {unindexed[name]:>12.2f} {indexed_ms:>11.2f}")
+
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
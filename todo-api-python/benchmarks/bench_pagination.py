@@ -0,0 +1,79 @@
+"""
+Compares OFFSET pagination with keyset (cursor) pagination at growing page depths.
+
+Usage:
+    python benchmarks/bench_pagination.py [--rows 200000] [--limit 100]
+
+Set BENCH_DATABASE_URL to run against Postgres instead of a temporary SQLite file.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.append(os.path.abspath(path))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from sql_app import crud, models
+
+DEPTHS = [1, 10, 100, 1000, 5000]
+REPEAT = 5
+
+
+def seed(engine, rows: int):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    batch = [
+        {"title": f"Todo {i}", "description": f"Description {i}", "is_done": False}
+        for i in range(rows)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.ToDo), batch)
+
+
+def timed(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/bench_pagination.db"
+    engine = create_engine(url)
+    seed(engine, args.rows)
+    db = sessionmaker(bind=engine)()
+
+    print(f"{'page':>6} {'offset ms':>10} {'keyset ms':>10}")
+    for page in DEPTHS:
+        skip = (page - 1) * args.limit
+        if skip >= args.rows:
+            break
+        # The last id of the previous page is exactly what the cursor would carry.
+        after_id = crud.get_todos(db, skip=skip - 1, limit=1)[0].id if skip else 0
+        offset_ms = timed(lambda: crud.get_todos(db, skip=skip, limit=args.limit))
+        keyset_ms = timed(
+            lambda: crud.get_todos(db, limit=args.limit, after_id=after_id)
+        )
+        db.expunge_all()
+        print(f"{page:>6} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Compares jsonable_encoder + JSONResponse with the dedicated todo serializer.
+
+Usage:
+    python benchmarks/bench_serialization.py [--items 100] [--number 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.append(os.path.abspath(path))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from sql_app import models
+from sql_app.serializers import FastJSONResponse, serialize_todo, serialize_todos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    todos = [
+        models.ToDo(
+            id=i,
+            title=f"Go to the gym - Day {i}",
+            description=f"Workout for {i} minutes",
+            is_done=i % 3 == 0,
+        )
+        for i in range(args.items)
+    ]
+    cases = {
+        f"list of {args.items}": (
+            lambda: JSONResponse(content=jsonable_encoder(todos)),
+            lambda: FastJSONResponse(content=serialize_todos(todos)),
+        ),
+        "single todo": (
+            lambda: JSONResponse(content=jsonable_encoder(todos[0])),
+            lambda: FastJSONResponse(content=serialize_todo(todos[0])),
+        ),
+    }
+
+    print(f"{'case':>14} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for name, (before, after) in cases.items():
+        before_us = min(timeit.repeat(before, number=args.number, repeat=5))
+        after_us = min(timeit.repeat(after, number=args.number, repeat=5))
+        before_us, after_us = (t / args.number * 1e6 for t in (before_us, after_us))
+        print(
+            f"{name:>14} {before_us:>10.1f} {after_us:>10.1f} "
+            f"{before_us / after_us:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
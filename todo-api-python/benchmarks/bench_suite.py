@@ -0,0 +1,552 @@
+"""
+Benchmarks every crud function at several table sizes and every route of the app.
+
+Routes are driven in-process through the ASGI interface of main.app, middleware
+included. The benchmarks take turns in rounds, see measure. Results are compared
+with a JSON baseline and the command exits with status 1 when a benchmark is slower
+than the baseline by more than the threshold, beyond the drift of the whole run, see
+compare. A warning is printed for every crud function and route without a benchmark.
+
+Usage:
+    python benchmarks/bench_suite.py --save-baseline       # record the baseline
+    python benchmarks/bench_suite.py                       # compare with it
+    python benchmarks/bench_suite.py --sizes 1000 --iterations 50 --output results.json
+
+Set BENCH_DATABASE_URL to run against Postgres instead of a temporary SQLite file,
+and USE_ASYNC_DB=true to benchmark the async routes. With --storage memory only the
+routes are benchmarked, on the in-memory backend, which leaves the cost of the
+framework, middleware and serialization without any database time. Baselines are
+kept per backend in benchmarks/baselines/ unless --baseline is given.
+"""
+import argparse
+import asyncio
+import inspect
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+here = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.abspath(os.path.join(here, "..", "app")))
+
+import httpx
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from sql_app import crud, models, schemas
+from sql_app.cache import todo_cache
+from sql_app.database import (
+    get_async_db,
+    get_db,
+    get_read_repository,
+    get_repository,
+    to_async_url,
+)
+from sql_app.memory import InMemoryRepository, TodoStore
+from sql_app.metrics import instrument_engine
+from sql_app.pagination import encode_cursor
+
+BASELINE_DIR = os.path.join(here, "baselines")
+WORDS = ["gym", "milk", "report", "garden", "call", "invoice", "laundry", "dentist"]
+BATCH = 100
+ROUNDS = 9
+# Iterations of a benchmark in every round, at least, so that the median of a round is not
+# that of one or two calls.
+ROUND_ITERATIONS = 3
+
+
+def seed(engine, rows: int):
+    models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    batch = [
+        {
+            "title": f"Todo {i}",
+            "description": f"{WORDS[i % 8]} {WORDS[i // 8 % 8]} {i}",
+            "is_done": i % 4 != 0,
+        }
+        for i in range(rows)
+    ]
+    with engine.begin() as conn:
+        for start in range(0, rows, 10_000):
+            conn.execute(insert(models.ToDo), batch[start : start + 10_000])
+
+
+def seed_memory(rows: int) -> TodoStore:
+    """
+    Fills an in-memory store with the same todos as seed.
+    """
+    store = TodoStore()
+    for i in range(rows):
+        record = store.add(f"Todo {i}", f"{WORDS[i % 8]} {WORDS[i // 8 % 8]} {i}")
+        if i % 4 != 0:
+            store.set_status(record.id, True)
+    return store
+
+
+def new_todos(count: int) -> list:
+    return [
+        schemas.ToDoCreate(title=f"New {i}", description=f"{WORDS[i % 8]} new")
+        for i in range(count)
+    ]
+
+
+def summarize(rounds: list) -> dict:
+    """
+    Reduces the durations of several rounds of a benchmark to its statistics.
+
+    The median is the median of the medians of the rounds, so that a burst of background
+    work on the machine during a few rounds does not read as a regression. The fastest
+    and slowest round medians are kept for compare.
+    """
+    durations = sorted(duration for durations in rounds for duration in durations)
+    medians = sorted(statistics.median(r) for r in rounds)
+    return {
+        "median_us": round(statistics.median(medians) * 1e6, 2),
+        "round_medians_us": [round(medians[0] * 1e6, 2), round(medians[-1] * 1e6, 2)],
+        "p95_us": round(durations[max(int(len(durations) * 0.95) - 1, 0)] * 1e6, 2),
+        "iterations": len(durations),
+    }
+
+
+def measure(benchmarks: dict, rounds: int = ROUNDS) -> dict:
+    """
+    Measures several benchmarks, which take turns at every round.
+
+    The speed of a shared machine drifts over a run. As every benchmark runs a round in
+    turn, each one sees all phases of the run instead of a few seeing only a slow one.
+
+    Parameters:
+        benchmarks (dict): name -> (function of the iteration number, iterations).
+        rounds (int): The number of rounds the iterations are split into.
+
+    Returns:
+        dict: The statistics of every benchmark, see summarize.
+    """
+    calls = {name: itertools.count() for name in benchmarks}
+    for name, (fn, iterations) in benchmarks.items():
+        for _ in range(max(iterations // 10, 1)):
+            fn(next(calls[name]))
+    results = {name: [] for name in benchmarks}
+    for _ in range(rounds):
+        for name, (fn, iterations) in benchmarks.items():
+            durations = []
+            for _ in range(max(iterations // rounds, ROUND_ITERATIONS)):
+                i = next(calls[name])
+                start = time.perf_counter()
+                fn(i)
+                durations.append(time.perf_counter() - start)
+            results[name].append(durations)
+    return {name: summarize(durations) for name, durations in results.items()}
+
+
+async def measure_async(benchmarks: dict, rounds: int = ROUNDS) -> dict:
+    """
+    Measures several benchmarks of coroutine functions, see measure.
+    """
+    calls = {name: itertools.count() for name in benchmarks}
+    for name, (fn, iterations) in benchmarks.items():
+        for _ in range(max(iterations // 10, 1)):
+            await fn(next(calls[name]))
+    results = {name: [] for name in benchmarks}
+    for _ in range(rounds):
+        for name, (fn, iterations) in benchmarks.items():
+            durations = []
+            for _ in range(max(iterations // rounds, ROUND_ITERATIONS)):
+                i = next(calls[name])
+                start = time.perf_counter()
+                await fn(i)
+                durations.append(time.perf_counter() - start)
+            results[name].append(durations)
+    return {name: summarize(durations) for name, durations in results.items()}
+
+
+def crud_cases(rows: int) -> dict:
+    """
+    Returns the crud benchmarks as name -> (function of session and iteration, weight).
+
+    The weight divides the number of iterations for benchmarks that read the whole table.
+    """
+    middle = rows // 2
+
+    def todo_id(i):
+        return i * 7919 % rows + 1
+
+    def stream(db, i):
+        for _ in crud.stream_todos(db):
+            pass
+
+    return {
+        "get_todo": (lambda db, i: crud.get_todo(db, todo_id(i)), 1),
+        "get_todo_version": (lambda db, i: crud.get_todo_version(db, todo_id(i)), 1),
+        "get_table_version": (lambda db, i: crud.get_table_version(db), 1),
+        "get_todos first page": (lambda db, i: crud.get_todos(db, limit=100), 1),
+        "get_todos offset deep": (
+            lambda db, i: crud.get_todos(db, skip=middle, limit=100),
+            1,
+        ),
+        "get_todos keyset deep": (
+            lambda db, i: crud.get_todos(db, limit=100, after_id=middle),
+            1,
+        ),
+        "get_todos open keyset": (
+            lambda db, i: crud.get_todos(db, limit=100, after_id=middle, is_done=False),
+            1,
+        ),
+        "count_todos open": (lambda db, i: crud.count_todos(db, is_done=False), 1),
+        "count_todos title prefix": (
+            lambda db, i: crud.count_todos(db, title_prefix="Todo 12"),
+            1,
+        ),
+        "search_todos": (lambda db, i: crud.search_todos(db, "garden invoice"), 1),
+        "stream_todos": (stream, 20),
+        "create_todo": (lambda db, i: crud.create_todo(db, new_todos(1)[0]), 1),
+        "create_todos": (lambda db, i: crud.create_todos(db, new_todos(BATCH)), 5),
+        "insert_todos": (lambda db, i: crud.insert_todos(db, new_todos(BATCH)), 5),
+        "update_todo_status": (
+            lambda db, i: crud.update_todo_status(db, todo_id(i), i % 2 == 0),
+            1,
+        ),
+        "update_todos_status": (
+            lambda db, i: crud.update_todos_status(
+                db, {todo_id(i * BATCH + k): k % 2 == 0 for k in range(BATCH)}
+            ),
+            5,
+        ),
+        # Deletes walk up from the first id the creates above added, so every call removes
+        # a row and the seeded rows the other benchmarks read stay in place.
+        "delete_todo": (lambda db, i: crud.delete_todo(db, rows + i + 1), 1),
+    }
+
+
+def check_crud_coverage(cases: dict):
+    covered = {name.split()[0] for name in cases}
+    for name, fn in vars(crud).items():
+        if (
+            inspect.isfunction(fn)
+            and fn.__module__ == crud.__name__
+            and not name.startswith("_")
+            and name not in covered
+        ):
+            print(f"warning: crud.{name} is not benchmarked", file=sys.stderr)
+
+
+def run_crud(url: str, sizes: list, iterations: int) -> dict:
+    results = {}
+    for rows in sizes:
+        engine = create_engine(url)
+        seed(engine, rows)
+        session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        cases = crud_cases(rows)
+        check_crud_coverage(cases)
+        benchmarks = {}
+        for name, (case, weight) in cases.items():
+
+            def call(i, case=case):
+                with session_local() as db:
+                    case(db, i)
+
+            benchmarks[f"crud {name} [{rows}]"] = (call, max(iterations // weight, 3))
+        results.update(measure(benchmarks))
+        engine.dispose()
+    return results
+
+
+def route_cases(rows: int) -> dict:
+    """
+    Returns the route benchmarks as name -> (method, route path, request builder, weight).
+
+    The request builder turns the iteration number into the keyword arguments of
+    httpx.AsyncClient.request.
+    """
+    middle = rows // 2
+    ndjson = "".join(
+        json.dumps({"title": f"Imported {i}", "description": "import"}) + "\n"
+        for i in range(1000)
+    ).encode()
+
+    def todo_id(i):
+        return i * 7919 % rows + 1
+
+    def new_todo(i):
+        return {"json": {"title": f"New {i}", "description": "new"}}
+
+    return {
+        "create todo": ("POST", "/api/new_todo", new_todo, 1),
+        "create todos": (
+            "POST",
+            "/api/new_todos",
+            lambda i: {"json": [new_todo(i)["json"]] * BATCH},
+            5,
+        ),
+        "list todos": ("GET", "/api", lambda i: {"params": {"limit": 100}}, 1),
+        "list todos cursor": (
+            "GET",
+            "/api",
+            lambda i: {"params": {"limit": 100, "after": encode_cursor(middle)}},
+            1,
+        ),
+        "list open todos with total": (
+            "GET",
+            "/api",
+            lambda i: {"params": {"is_done": "false", "limit": 100, "total": "true"}},
+            1,
+        ),
+        "search todos": ("GET", "/api/search", lambda i: {"params": {"q": "garden"}}, 1),
+        "export todos": ("GET", "/api/export", lambda i: {}, 20),
+        "import todos": (
+            "POST",
+            "/api/import",
+            lambda i: {
+                "content": ndjson,
+                "headers": {"content-type": "application/x-ndjson"},
+            },
+            10,
+        ),
+        "get todo cached": ("GET", "/api/todo/{todo_id}", lambda i: {"url": "/api/todo/1"}, 1),
+        "get todo uncached": (
+            "GET",
+            "/api/todo/{todo_id}",
+            lambda i: {"url": f"/api/todo/{todo_id(i)}", "uncached": True},
+            1,
+        ),
+        "mark todo done": (
+            "PUT",
+            "/api/{todo_id}",
+            lambda i: {"url": f"/api/{todo_id(i)}"},
+            1,
+        ),
+        "ready": ("GET", "/ready", lambda i: {}, 1),
+        "cache stats": ("GET", "/internal/cache", lambda i: {}, 1),
+        "pool stats": ("GET", "/internal/pool", lambda i: {}, 1),
+        "coalescer stats": ("GET", "/internal/coalescer", lambda i: {}, 1),
+        "replica stats": ("GET", "/internal/replicas", lambda i: {}, 1),
+        "shard stats": ("GET", "/internal/shards", lambda i: {}, 1),
+        "slow queries": ("GET", "/internal/slow_queries", lambda i: {}, 1),
+        "metrics": ("GET", "/metrics", lambda i: {}, 1),
+        # Deletes walk up from the first id the creates above added, so every call removes
+        # a row and the seeded rows the other routes read stay in place.
+        "delete todo": (
+            "DELETE",
+            "/api/delete/{todo_id}",
+            lambda i: {"url": f"/api/delete/{rows + i + 1}"},
+            1,
+        ),
+    }
+
+
+def check_coverage(cases: dict):
+    covered = {(method, path) for method, path, _, _ in cases.values()}
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or not route.include_in_schema:
+            continue
+        for method in route.methods:
+            if (method, route.path) not in covered:
+                print(f"warning: {method} {route.path} is not benchmarked", file=sys.stderr)
+
+
+async def drive_routes(rows: int, iterations: int) -> dict:
+    cases = route_cases(rows)
+    check_coverage(cases)
+    benchmarks = {}
+    # The client does not send the lifespan events, which make the app ready.
+    await app.router.startup()
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        for name, (method, path, build, weight) in cases.items():
+
+            async def call(i, name=name, method=method, path=path, build=build):
+                kwargs = {"url": path, **build(i)}
+                if kwargs.pop("uncached", False):
+                    todo_cache.clear()
+                response = await client.request(method, **kwargs)
+                assert response.status_code < 400, (name, response.status_code)
+
+            benchmarks[f"route {name}"] = (call, max(iterations // weight, 3))
+        try:
+            return await measure_async(benchmarks)
+        finally:
+            await app.router.shutdown()
+
+
+def run_memory_routes(rows: int, iterations: int) -> dict:
+    store = seed_memory(rows)
+
+    def override_get_repository():
+        yield InMemoryRepository(store)
+
+    app.dependency_overrides[get_repository] = override_get_repository
+    app.dependency_overrides[get_read_repository] = override_get_repository
+    todo_cache.clear()
+    try:
+        return asyncio.run(drive_routes(rows, iterations))
+    finally:
+        app.dependency_overrides.clear()
+
+
+def run_routes(url: str, rows: int, iterations: int) -> dict:
+    engine = create_engine(url)
+    seed(engine, rows)
+    instrument_engine(engine)
+    session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(to_async_url(url))
+    async_session_local = sessionmaker(
+        async_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    def override_get_db():
+        db = session_local()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with async_session_local() as db:
+            yield db
+
+    async def run():
+        try:
+            return await drive_routes(rows, iterations)
+        finally:
+            # The async engine's connections must be closed on the loop that opened them.
+            await async_engine.dispose()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    todo_cache.clear()
+    try:
+        return asyncio.run(run())
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+
+def compare(baseline: dict, results: dict, threshold: float, min_delta_us: float) -> list:
+    """
+    Compares the median of every benchmark with its baseline.
+
+    The speed of a shared machine varies by tens of percent from one run to the next, for
+    all benchmarks alike. The medians are therefore compared after dividing them by the
+    drift of the run, the median ratio of all benchmarks to their baseline, which is
+    printed. A benchmark regresses when it is slower than the rest of the run by more
+    than the threshold and min_delta_us, and even its fastest round is slower than the
+    slowest round of the baseline: runs whose rounds overlap are within the noise.
+    A regression of every benchmark alike shows in the drift only.
+
+    Parameters:
+        baseline (dict): The results of the baseline run.
+        results (dict): The results of the current run.
+        threshold (float): The relative slowdown tolerated, 0.25 for 25%.
+        min_delta_us (float): Slowdowns smaller than this many microseconds are ignored as noise.
+
+    Returns:
+        list[str]: The names of the benchmarks that regressed.
+    """
+    ratios = [
+        result["median_us"] / baseline[name]["median_us"]
+        for name, result in results.items()
+        if name in baseline
+    ]
+    drift = statistics.median(ratios) if ratios else 1.0
+    print(f"The medians of the run are {drift:.2f} times those of the baseline overall")
+    regressions = []
+    print(f"{'benchmark':<44} {'base us':>10} {'now us':>10} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<44} {'-':>10} {result['median_us']:>10.1f} {'new':>8}")
+            continue
+        expected = before["median_us"] * drift
+        change = result["median_us"] / expected - 1
+        fastest = result.get("round_medians_us", [result["median_us"]])[0]
+        slowest = before.get("round_medians_us", [before["median_us"]])[-1] * drift
+        regressed = (
+            change > threshold
+            and result["median_us"] - expected > min_delta_us
+            and fastest > slowest
+        )
+        marker = "  REGRESSED" if regressed else ""
+        print(
+            f"{name:<44} {before['median_us']:>10.1f} {result['median_us']:>10.1f} "
+            f"{change:>+7.0%}{marker}"
+        )
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--route-rows", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--baseline", help="the baseline file to compare with or save")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--min-delta-us", type=float, default=20.0)
+    parser.add_argument("--skip-routes", action="store_true")
+    parser.add_argument("--storage", choices=("sqlalchemy", "memory"), default="sqlalchemy")
+    args = parser.parse_args(argv)
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/bench_suite.db"
+    backend = make_url(url).get_backend_name() if args.storage == "sqlalchemy" else "memory"
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{backend}.json")
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    if backend == "memory":
+        results = run_memory_routes(args.route_rows, args.iterations)
+    else:
+        results = run_crud(url, sizes, args.iterations)
+        if not args.skip_routes:
+            results.update(run_routes(url, args.route_rows, args.iterations))
+    report = {
+        "meta": {
+            "backend": backend,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sizes": sizes,
+            "route_rows": args.route_rows,
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Saved {len(results)} benchmarks to {baseline_path}")
+        return 0
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}, run with --save-baseline first")
+        return 1
+
+    with open(baseline_path) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(baseline, results, args.threshold, args.min_delta_us)
+    if regressions:
+        print(f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}")
+        return 1
+    print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
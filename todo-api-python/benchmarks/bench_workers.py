@@ -0,0 +1,181 @@
+"""
+Measures the throughput of the production server against its number of workers.
+
+For every worker count, gunicorn is started with app/gunicorn.conf.py on a local
+port and the read endpoints are driven over HTTP for a fixed duration, so the
+numbers include the network stack, the process model and the connection pools as
+sized by tuning.plan_server.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--duration 10] [--concurrency 64] [--output results.json]
+
+Set BENCH_DATABASE_URL to run against Postgres instead of a temporary SQLite file,
+and DB_MAX_CONNECTIONS to its max_connections setting.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(os.path.abspath(root), "app"))
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+from sql_app import models
+from sql_app.pagination import encode_cursor
+from sql_app.schema import migrate
+
+
+def seed(engine, rows: int):
+    models.Base.metadata.drop_all(engine)
+    migrate(engine)
+    batch = [
+        {"title": f"Todo {i}", "description": f"Description {i}", "is_done": i % 2 == 0}
+        for i in range(rows)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(models.ToDo), batch)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(url: str, workers: int, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=url,
+        WEB_CONCURRENCY=str(workers),
+        WARMUP_ENABLED="true",
+        BIND=f"127.0.0.1:{port}",
+    )
+    env.pop("ACCESS_LOG", None)
+    return subprocess.Popen(
+        ["gunicorn", "-c", "app/gunicorn.conf.py", "app.main:app"],
+        cwd=os.path.abspath(root),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def wait_until_serving(base_url: str, server: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/ready").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not answer within {timeout} seconds")
+
+
+def stop_server(server: subprocess.Popen):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def read_request(rows: int) -> str:
+    kind = random.random()
+    if kind < 0.6:
+        return f"/api/todo/{random.randint(1, rows)}"
+    if kind < 0.9:
+        return f"/api?after={encode_cursor(random.randint(1, rows))}&limit=20"
+    return "/api?after=&is_done=false&limit=20"
+
+
+async def drive(base_url: str, rows: int, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client):
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(read_request(rows))
+                failed = response.status_code != 200
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if url is None:
+        url = f"sqlite:///{tempfile.mkdtemp()}/bench_workers.db"
+    seed(create_engine(url), args.rows)
+
+    results = []
+    print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in args.workers:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(url, workers, port)
+        try:
+            wait_until_serving(base_url, server)
+            result = asyncio.run(drive(base_url, args.rows, args.concurrency, args.duration))
+        finally:
+            stop_server(server)
+        results.append({"workers": workers, **result})
+        print(
+            f"{workers:>7} {result['rps']:>9.0f} {result['p50_ms']:>8.2f} "
+            f"{result['p99_ms']:>8.2f} {result['errors']:>7}"
+        )
+
+    if args.output:
+        report = {
+            "rows": args.rows,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "results": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()